@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+"""
+Decoding throughput benchmarks.
+
+Times every stage of STAGES over every synthetic corpus of
+corpora.CORPORA and reports MB of TWKB and vertices processed per second,
+taking the best of several runs.  Results are written as JSON, and a
+previous results file can be given with --compare to flag regressions:
+
+    python benchmarks/bench.py --output base.json
+    (change things)
+    python benchmarks/bench.py --compare base.json
+
+The exit status is 1 when a stage got slower than --threshold allows.
+"""
+import sys
+import os
+import argparse
+import io
+import json
+import platform
+import time
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import twkbpy
+from twkbpy import Decoder, Encoder, OgrTransform, Twkb, CoordTransform, Simplify, TO_LONLAT
+from twkbpy.context import BufferDecoderContext
+from twkbpy.geojson_transforms import JsonFormatter
+from twkbpy.read_buffer import read_header, read_body
+
+from corpora import CORPORA, Corpus, generate_corpus
+
+
+def stage_read_buffer(corpus : Corpus, shapes):
+    ta_struct = BufferDecoderContext(corpus.data)
+    while not ta_struct.at_eof():
+        read_header(ta_struct)
+        read_body(ta_struct)
+
+def stage_json_formatter(corpus : Corpus, shapes):
+    for shape in shapes:
+        JsonFormatter(shape).obj
+
+def stage_ogr_transform(corpus : Corpus, shapes):
+    xform = OgrTransform()
+    for shape in shapes:
+        xform.convert(shape)
+
+def stage_encode(corpus : Corpus, shapes):
+    encoder = Encoder()
+    for shape in shapes:
+        encoder.encode(shape)
+
+def stage_decode(corpus : Corpus, shapes):
+    for blob in corpus.blobs:
+        twkbpy.decode(blob)
+
+def stage_iter_decode(corpus : Corpus, shapes):
+    for shape in twkbpy.iter_decode(corpus.data):
+        pass
+
+def stage_iter_decode_int(corpus : Corpus, shapes):
+    for shape in Decoder(coord_type='q').iter_decode(corpus.data):
+        pass
+
+def stage_iter_decode_lonlat(corpus : Corpus, shapes):
+    transform = CoordTransform.tile(12, 2200, 1343, project=TO_LONLAT)
+    for shape in Decoder(transform=transform).iter_decode(corpus.data):
+        pass
+
+def stage_iter_decode_lod(corpus : Corpus, shapes):
+    for shape in Decoder(simplify=Simplify(1.0)).iter_decode(corpus.data):
+        pass
+
+def stage_to_geojson(corpus : Corpus, shapes):
+    for blob in corpus.blobs:
+        twkbpy.to_geojson(blob)
+
+def stage_write_geojson(corpus : Corpus, shapes):
+    twkbpy.write_geojson(corpus.data, io.StringIO(), seq=True)
+
+def stage_to_ogr(corpus : Corpus, shapes):
+    for blob in corpus.blobs:
+        twkbpy.to_ogr(blob)
+
+def stage_twkb_to_geojson(corpus : Corpus, shapes):
+    for blob in corpus.blobs:
+        Twkb.from_binary(blob).to_geojson()
+
+def stage_twkb_to_ogr(corpus : Corpus, shapes):
+    for blob in corpus.blobs:
+        Twkb.from_binary(blob).to_ogr()
+
+# stages get the corpus and its records decoded beforehand, for the ones
+# that time a transform on its own
+STAGES : Dict[str, Callable[[Corpus, list], None]] = {
+    'read_buffer': stage_read_buffer,
+    'JsonFormatter': stage_json_formatter,
+    'OgrTransform': stage_ogr_transform,
+    'Encoder': stage_encode,
+    'decode': stage_decode,
+    'iter_decode': stage_iter_decode,
+    'iter_decode[q]': stage_iter_decode_int,
+    'iter_decode[lonlat]': stage_iter_decode_lonlat,
+    'iter_decode[lod]': stage_iter_decode_lod,
+    'to_geojson': stage_to_geojson,
+    'write_geojson': stage_write_geojson,
+    'to_ogr': stage_to_ogr,
+    'Twkb.to_geojson': stage_twkb_to_geojson,
+    'Twkb.to_ogr': stage_twkb_to_ogr,
+}
+
+
+def time_stage(stage : Callable[[Corpus, list], None], corpus : Corpus, shapes : list, repeat : int) -> float:
+    """
+    Best wall time of `repeat` runs, in seconds
+    """
+    best = float('inf')
+    for _ in range(0, repeat):
+        start = time.perf_counter()
+        stage(corpus, shapes)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def run_benchmarks(corpora : Optional[List[str]] = None, stages : Optional[List[str]] = None,
+                   scale : float = 1.0, repeat : int = 3, log = None) -> dict:
+    """
+    Runs the benchmarks
+
+    Returns:
+        dict - the run's environment under 'meta' and one entry per
+               corpus and stage under 'results'
+    """
+    results = []
+    for name in corpora or list(CORPORA):
+        corpus = generate_corpus(name, scale)
+        shapes = list(Decoder().iter_decode(corpus.data))
+        for stage_name in stages or list(STAGES):
+            result = { 'corpus': name, 'stage': stage_name, 'records': len(corpus.blobs),
+                       'bytes': len(corpus.data), 'vertices': corpus.vertices }
+            try:
+                seconds = time_stage(STAGES[stage_name], corpus, shapes, repeat)
+            except Exception as e:
+                result['error'] = f'{type(e).__name__}: {e}'
+            else:
+                result['seconds'] = seconds
+                result['mb_per_s'] = len(corpus.data) / 1e6 / seconds
+                result['vertices_per_s'] = corpus.vertices / seconds
+            results.append(result)
+            if log is not None:
+                log.write(format_result(result) + '\n')
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'scale': scale,
+            'repeat': repeat,
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': results,
+    }
+
+def format_result(result : dict) -> str:
+    if 'error' in result:
+        return f"{result['corpus']:<22}{result['stage']:<18}{result['error']}"
+    return (f"{result['corpus']:<22}{result['stage']:<18}{result['mb_per_s']:10.2f} MB/s"
+            f"{result['vertices_per_s'] / 1e6:10.3f} Mvertices/s")
+
+def compare(baseline : dict, current : dict, threshold : float, log) -> List[dict]:
+    """
+    Speed ratio of every corpus and stage run in both result sets, written
+    to `log`
+
+    Returns:
+        list - the results slower than the baseline by more than threshold
+    """
+    before = { (r['corpus'], r['stage']): r for r in baseline['results'] if 'seconds' in r }
+    regressions = []
+    for result in current['results']:
+        old = before.get((result['corpus'], result['stage']))
+        if old is None or 'seconds' not in result:
+            continue
+        # normalize per byte, in case the two runs used different scales
+        ratio = (old['seconds'] / old['bytes']) / (result['seconds'] / result['bytes'])
+        slower = ratio < 1.0 - threshold
+        log.write(f"{result['corpus']:<22}{result['stage']:<18}{ratio:8.2f}x{'  SLOWER' if slower else ''}\n")
+        if slower:
+            regressions.append(result)
+    return regressions
+
+def main(argv : Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='twkbpy decoding benchmarks')
+    parser.add_argument('--corpus', action='append', choices=list(CORPORA),
+                        help='corpus to run, repeatable (default: all)')
+    parser.add_argument('--stage', action='append', choices=list(STAGES),
+                        help='stage to time, repeatable (default: all)')
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='multiplier of the corpus record counts (e.g. 10 for 2M points)')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per stage, the best one counts')
+    parser.add_argument('--output', help='write the JSON results to this file instead of stdout')
+    parser.add_argument('--compare', help='JSON results of an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='slowdown tolerated by --compare, as a fraction (default 0.1)')
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.corpus, args.stage, args.scale, args.repeat, sys.stderr)
+    if args.output:
+        with open(args.output, 'w') as fp:
+            json.dump(results, fp, indent=1)
+    else:
+        json.dump(results, sys.stdout, indent=1)
+        sys.stdout.write('\n')
+    if args.compare:
+        with open(args.compare) as fp:
+            baseline = json.load(fp)
+        if compare(baseline, results, args.threshold, sys.stderr):
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+Synthetic TWKB corpora for the benchmarks.
+
+Every corpus is generated from a fixed seed, so the same scale always
+gives the same bytes.  Coordinates follow random walks, which gives the
+small deltas of real-world data rather than the full-width varints of
+uniformly random positions.
+"""
+import sys
+import os
+import random
+from typing import Callable, Dict, Iterator, List, NamedTuple
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from twkbpy.encode import Encoder
+
+
+class Corpus(NamedTuple):
+    name : str
+    blobs : List[bytes]     # one TWKB record each
+    data : bytes            # every record, concatenated
+    vertices : int
+
+
+class CorpusSpec(NamedTuple):
+    generate : Callable[[random.Random, int], Iterator[dict]]
+    count : int             # records at scale 1
+    options : dict          # Encoder arguments
+
+
+def walk(rng : random.Random, n : int, ndims : int = 2, step : float = 0.001) -> List[List[float]]:
+    """
+    n positions of a random walk starting somewhere on the globe
+    """
+    position = [ rng.uniform(-170.0, 170.0), rng.uniform(-80.0, 80.0), rng.uniform(0.0, 100.0),
+                 rng.uniform(0.0, 1000.0) ][:ndims]
+    positions = []
+    for _ in range(0, n):
+        position = [ v + rng.uniform(-step, step) for v in position ]
+        positions.append(position)
+    return positions
+
+def ring(rng : random.Random, n : int, ndims : int = 2) -> List[List[float]]:
+    positions = walk(rng, n - 1, ndims)
+    return positions + [ positions[0] ]
+
+def points(rng : random.Random, count : int) -> Iterator[dict]:
+    for position in walk(rng, count, step=0.1):
+        yield { 'type': 'Point', 'coordinates': position }
+
+def lines(ndims : int = 2, nvertices : int = 5000):
+    def generate(rng : random.Random, count : int) -> Iterator[dict]:
+        for _ in range(0, count):
+            yield { 'type': 'LineString', 'coordinates': walk(rng, nvertices, ndims) }
+    return generate
+
+def multipoints(rng : random.Random, count : int) -> Iterator[dict]:
+    for _ in range(0, count):
+        yield { 'type': 'MultiPoint', 'coordinates': walk(rng, 100, step=0.01) }
+
+def polygons(rng : random.Random, count : int) -> Iterator[dict]:
+    for _ in range(0, count):
+        yield { 'type': 'Polygon', 'coordinates': [ ring(rng, 20) for _ in range(0, 40) ] }
+
+def multipolygons(rng : random.Random, count : int) -> Iterator[dict]:
+    for _ in range(0, count):
+        yield { 'type': 'MultiPolygon',
+                'coordinates': [ [ ring(rng, 30) for _ in range(0, 4) ] for _ in range(0, 10) ] }
+
+def collection(rng : random.Random, depth : int) -> dict:
+    geometries = [ { 'type': 'Point', 'coordinates': walk(rng, 1)[0] },
+                   { 'type': 'LineString', 'coordinates': walk(rng, 20) } ]
+    if depth > 1:
+        geometries.append(collection(rng, depth - 1))
+    return { 'type': 'GeometryCollection', 'geometries': geometries }
+
+def collections(rng : random.Random, count : int) -> Iterator[dict]:
+    for _ in range(0, count):
+        yield collection(rng, 5)
+
+CORPORA : Dict[str, CorpusSpec] = {
+    'points': CorpusSpec(points, 200000, { 'precision_xy': 6 }),
+    'points_bbox_size': CorpusSpec(points, 200000, { 'precision_xy': 6, 'bbox': True, 'size': True }),
+    'multipoints': CorpusSpec(multipoints, 2000, { 'precision_xy': 6 }),
+    'multipoints_ids': CorpusSpec(multipoints, 2000, { 'precision_xy': 6, 'ids': True }),
+    'lines': CorpusSpec(lines(), 200, { 'precision_xy': 6 }),
+    'lines_bbox_size': CorpusSpec(lines(), 200, { 'precision_xy': 6, 'bbox': True, 'size': True }),
+    'lines_z': CorpusSpec(lines(3), 200, { 'precision_xy': 6, 'precision_z': 3 }),
+    'lines_zm': CorpusSpec(lines(4), 200, { 'precision_xy': 6, 'precision_z': 3, 'precision_m': 2 }),
+    'polygons_many_rings': CorpusSpec(polygons, 500, { 'precision_xy': 6, 'bbox': True, 'size': True }),
+    'multipolygons_ids': CorpusSpec(multipolygons, 500, { 'precision_xy': 6, 'ids': True }),
+    'collections_deep': CorpusSpec(collections, 2000, { 'precision_xy': 6, 'size': True }),
+}
+
+def count_vertices(geom : dict) -> int:
+    if geom['type'] == 'GeometryCollection':
+        return sum([ count_vertices(child) for child in geom['geometries'] ])
+    coordinates = geom['coordinates']
+    depth = 0
+    while coordinates and isinstance(coordinates[0], list):
+        coordinates = coordinates[0]
+        depth += 1
+    if depth == 0:
+        return 1
+    if depth == 1:
+        return len(geom['coordinates'])
+    if depth == 2:
+        return sum([ len(part) for part in geom['coordinates'] ])
+    return sum([ len(ring) for part in geom['coordinates'] for ring in part ])
+
+def geometry_ids(geom : dict) -> List[int]:
+    count = len(geom['geometries'] if geom['type'] == 'GeometryCollection' else geom['coordinates'])
+    return list(range(1, count + 1))
+
+def generate_corpus(name : str, scale : float = 1.0, seed : int = 0) -> Corpus:
+    """
+    Builds a corpus of CORPORA, with its record count multiplied by
+    `scale`
+    """
+    spec = CORPORA[name]
+    options = dict(spec.options)
+    with_ids = options.pop('ids', False)
+    encoder = Encoder(**options)
+    rng = random.Random(f'{name}:{seed}')
+    blobs = []
+    vertices = 0
+    for geom in spec.generate(rng, max(1, int(spec.count * scale))):
+        blobs.append(encoder.encode(geom, geometry_ids(geom) if with_ids else None))
+        vertices += count_vertices(geom)
+    return Corpus(name, blobs, b''.join(blobs), vertices)
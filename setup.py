@@ -17,5 +17,10 @@ setup(
     classifiers = [],
     install_requires = [
 
-    ]
+    ],
+    extras_require = {
+        'numpy': ['numpy'],
+        'shapely': ['numpy', 'shapely>=2.0'],
+        'arrow': ['pyarrow'],
+    }
 )
@@ -21,7 +21,8 @@ def byte_gen(stream):
 print("start")
 codec = twkb.Decoder()
 with io.open('komm.twkb', 'rb') as stream:   
-    codec.decode(stream)
+    for shape in codec.iter_decode(stream):
+        pass
 print("end")
 #print bytearray(stream.read(1))[0]
 #for b in stream:
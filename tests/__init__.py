@@ -2,6 +2,20 @@ import unittest
 
 from decode_test import *
 from geojson_test import *
+from index_test import *
+from twkb_file_test import *
+from parallel_test import *
+from scan_test import *
+from columnar_test import *
+from wkb_test import *
+from shapely_test import *
+from encode_test import *
+from benchmark_test import *
+from stats_test import *
+from aio_test import *
+from batch_test import *
+from transform_test import *
+from simplify_test import *
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,143 @@
+import sys
+import os
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+from twkbpy import aiter_decode, iter_decode, Decoder, Encoder
+from twkbpy.aio import complete_records, aiter_records, RecordScanner
+
+
+RECORDS = bytes.fromhex('01000204' '02000202020808' '03031b000400040205000004000004030000030500000002020000010100'
+                        '04070b0004020402000200020404' '070402000201000002020002080a0404')
+
+
+class PieceReader:
+    """
+    Async reader handing out `data` in pieces of at most `piece` bytes,
+    whatever was asked for
+    """
+    def __init__(self, data, piece):
+        self.data = data
+        self.piece = piece
+        self.reads = 0
+
+    async def read(self, n=-1):
+        self.reads += 1
+        await asyncio.sleep(0)
+        chunk = self.data[:min(n, self.piece)]
+        self.data = self.data[len(chunk):]
+        return chunk
+
+
+def collect(reader, **kwargs):
+    async def run():
+        return [ shape async for shape in aiter_decode(reader, **kwargs) ]
+    return asyncio.run(run())
+
+def coords(shapes):
+    return [ (shape.type, shape.offset, list(getattr(shape, 'coords', []))) for shape in shapes ]
+
+
+class CompleteRecordsTest(unittest.TestCase):
+
+    def test_whole(self):
+        self.assertEqual(complete_records(bytearray(RECORDS))[0], len(RECORDS))
+
+    def test_partial_unsized(self):
+        end, need = complete_records(bytearray(RECORDS[:9]))
+        self.assertEqual(end, 4)
+        # the linestring is short of 2 coordinate varints
+        self.assertEqual(need, 11)
+
+    def test_resume(self):
+        scanner = RecordScanner()
+        buf = bytearray(RECORDS[:9])
+        self.assertEqual(scanner.scan(buf), (4, 11))
+        # the linestring's walk goes on from where the data ran out: the
+        # bytes already walked, garbled here, aren't read again
+        del buf[:4]
+        buf[:] = b'\xff' * len(buf) + RECORDS[9:11]
+        self.assertEqual(scanner.scan(buf), (7, 8))
+
+    def test_partial_sized(self):
+        # the polygon starts at 11 and is 30 bytes long
+        end, need = complete_records(bytearray(RECORDS[:20]))
+        self.assertEqual(end, 11)
+        self.assertEqual(need, 41)
+
+
+class AiterDecodeTest(unittest.TestCase):
+
+    def test_pieces(self):
+        expected = coords(iter_decode(RECORDS))
+        for piece in (1, 3, 7, 64, 1024):
+            with self.subTest(piece):
+                self.assertEqual(coords(collect(PieceReader(RECORDS, piece))), expected)
+
+    def test_stream_reader(self):
+        async def run():
+            reader = asyncio.StreamReader()
+            async def feed():
+                for i in range(0, len(RECORDS), 5):
+                    reader.feed_data(RECORDS[i:i + 5])
+                    await asyncio.sleep(0)
+                reader.feed_eof()
+            feeder = asyncio.ensure_future(feed())
+            shapes = [ shape async for shape in Decoder().aiter_decode(reader, chunk_size=8) ]
+            await feeder
+            return shapes
+        self.assertEqual(coords(asyncio.run(run())), coords(iter_decode(RECORDS)))
+
+    def test_split_record_without_eof(self):
+        # LINESTRING(1 1, 5 5) arriving as 5 + 2 bytes is yielded as soon as
+        # it is whole, without waiting for more data or the end of the stream
+        async def run():
+            reader = asyncio.StreamReader()
+            reader.feed_data(bytes.fromhex('0200020202'))
+            shapes = Decoder().aiter_decode(reader)
+            first = asyncio.ensure_future(shapes.__anext__())
+            await asyncio.sleep(0.01)
+            self.assertFalse(first.done())
+            reader.feed_data(bytes.fromhex('0808'))
+            shape = await asyncio.wait_for(first, 1)
+            reader.feed_eof()
+            await shapes.aclose()
+            return shape
+        self.assertEqual(list(asyncio.run(run()).coords), [ 1, 1, 5, 5 ])
+
+    def test_truncated(self):
+        with self.assertRaises(EOFError):
+            collect(PieceReader(RECORDS[:-1], 16))
+
+    def test_bbox(self):
+        # the polygon and the multipoint have header bboxes that miss it
+        shapes = collect(PieceReader(RECORDS, 16), bbox=[ 10, 10, 20, 20 ])
+        self.assertEqual([ shape.offset for shape in shapes ], [ 0, 4, 55 ])
+
+    def test_thread_executor(self):
+        with ThreadPoolExecutor(2) as executor:
+            shapes = collect(PieceReader(RECORDS, 16), executor=executor)
+        self.assertEqual(coords(shapes), coords(iter_decode(RECORDS)))
+
+    def test_process_executor(self):
+        with ProcessPoolExecutor(2) as executor:
+            shapes = collect(PieceReader(RECORDS, 16), executor=executor)
+        self.assertEqual(coords(shapes), coords(iter_decode(RECORDS)))
+
+    def test_large_unsized_record(self):
+        # one linestring much longer than the read chunks
+        line = { 'type': 'LineString', 'coordinates': [ [ i * 0.5, -i * 0.25 ] for i in range(0, 20000) ] }
+        data = Encoder(precision_xy=2).encode(line) * 3
+        reader = PieceReader(data, 1000)
+        shapes = collect(reader)
+        self.assertEqual(len(shapes), 3)
+        self.assertEqual(list(shapes[2].coords), list(next(iter_decode(data)).coords))
+        self.assertEqual(shapes[2].offset, 2 * len(data) // 3)
+
+    def test_batches(self):
+        async def run(reader):
+            return [ offset async for offset, data in aiter_records(reader, 1 << 16) ]
+        self.assertEqual(asyncio.run(run(PieceReader(RECORDS, 1 << 16))), [ 0 ])
@@ -0,0 +1,102 @@
+import sys
+import os
+import base64
+import sqlite3
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+from twkbpy import decode, decode_blobs, Decoder, DecoderStats, GeometryColumns, CoordTransform
+from twkbpy.batch import to_blob
+from twkbpy.context import BufferDecoderContext
+
+try:
+    import pandas
+except ImportError:
+    pandas = None
+
+
+BLOBS = [ bytes.fromhex(h) for h in ('01000204', '02000202020808', '04070b0004020402000200020404') ]
+
+
+def coords(shapes):
+    return [ None if shape is None else (shape.type, list(shape.coords)) for shape in shapes ]
+
+
+class DecodeBlobsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.expected = coords([ decode(blob) for blob in BLOBS ])
+
+    def test_list(self):
+        self.assertEqual(coords(decode_blobs(BLOBS)), self.expected)
+
+    def test_base64(self):
+        self.assertEqual(coords(decode_blobs([ base64.b64encode(blob).decode() for blob in BLOBS ])), self.expected)
+
+    def test_hex(self):
+        self.assertEqual(coords(decode_blobs([ '\\x' + blob.hex() for blob in BLOBS ])), self.expected)
+
+    def test_nulls(self):
+        shapes = decode_blobs([ BLOBS[0], None, memoryview(BLOBS[1]), float('nan') ])
+        self.assertEqual(coords(shapes), [ self.expected[0], None, self.expected[1], None ])
+
+    def test_cursor(self):
+        db = sqlite3.connect(':memory:')
+        db.execute('CREATE TABLE t (id INTEGER, geom BLOB)')
+        db.executemany('INSERT INTO t VALUES (?, ?)', [ (i, BLOBS[i % 3] if i % 4 else None) for i in range(0, 50) ])
+        cursor = db.execute('SELECT id, geom FROM t ORDER BY id')
+        shapes = decode_blobs(cursor, column=1, fetch_size=7)
+        self.assertEqual(len(shapes), 50)
+        self.assertEqual(coords(shapes[:4]), [ None, self.expected[1], self.expected[2], self.expected[0] ])
+        cursor = db.execute('SELECT geom FROM t WHERE geom IS NOT NULL')
+        self.assertEqual(len(decode_blobs(cursor, columnar=True)), 37)
+
+    def test_row_tuples(self):
+        rows = [ (i, blob) for i, blob in enumerate(BLOBS) ]
+        self.assertEqual(coords(decode_blobs(rows, column=1)), self.expected)
+
+    def test_columnar(self):
+        columns = decode_blobs([ base64.b64encode(blob).decode() for blob in BLOBS ], columnar=True)
+        self.assertIsInstance(columns, GeometryColumns)
+        self.assertEqual(len(columns), 3)
+        self.assertEqual(list(columns.coords), [ 1.0, 2.0, 1.0, 1.0, 5.0, 5.0, 0.0, 1.0, 2.0, 3.0 ])
+        with self.assertRaises(ValueError):
+            decode_blobs([ BLOBS[0], None ], columnar=True)
+
+    def test_decoder(self):
+        stats = DecoderStats()
+        decode_blobs(BLOBS, decoder=Decoder(stats=stats))
+        self.assertEqual(stats.records, 3)
+        self.assertEqual(stats.bytes, sum([ len(blob) for blob in BLOBS ]))
+
+    def test_columnar_decoder(self):
+        stats = DecoderStats()
+        decoder = Decoder(stats=stats, transform=CoordTransform.scale_offset(2, 2, 1, 1))
+        columns = decode_blobs(BLOBS, columnar=True, decoder=decoder)
+        self.assertEqual(list(columns.coords), [ 3.0, 5.0, 3.0, 3.0, 11.0, 11.0, 1.0, 3.0, 5.0, 7.0 ])
+        self.assertEqual(stats.records, 3)
+        self.assertEqual(stats.vertices, 5)
+        self.assertEqual(stats.bytes, sum([ len(blob) for blob in BLOBS ]))
+        with self.assertRaises(ValueError):
+            decode_blobs(BLOBS, columnar=True, decoder=Decoder(coord_type='q'))
+
+    def test_bad_value(self):
+        with self.assertRaises(TypeError):
+            to_blob(12)
+
+    @unittest.skipIf(pandas is None, "pandas is not installed")
+    def test_series(self):
+        series = pandas.Series([ BLOBS[0], None, BLOBS[2] ])
+        self.assertEqual(coords(decode_blobs(series)), [ self.expected[0], None, self.expected[2] ])
+
+
+class ContextResetTest(unittest.TestCase):
+
+    def test_reset(self):
+        ta_struct = BufferDecoderContext(BLOBS[0])
+        ta_struct.next()
+        ta_struct.reset(BLOBS[1], 1)
+        self.assertEqual((ta_struct.pos, ta_struct.end), (1, 7))
+        self.assertEqual(ta_struct.next(), 0)
+        ta_struct.release()
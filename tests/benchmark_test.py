@@ -0,0 +1,51 @@
+import sys
+import os
+import io
+import json
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'benchmarks')))
+
+import unittest
+from twkbpy import decode, iter_decode
+from corpora import CORPORA, generate_corpus
+from bench import STAGES, run_benchmarks, compare
+
+
+class CorporaTest(unittest.TestCase):
+
+    def test_reproducible(self):
+        self.assertEqual(generate_corpus('lines_zm', 0.01).data, generate_corpus('lines_zm', 0.01).data)
+
+    def test_decodes(self):
+        for name in CORPORA:
+            with self.subTest(name):
+                corpus = generate_corpus(name, 0.001)
+                self.assertEqual(len(list(iter_decode(corpus.data))), len(corpus.blobs))
+
+    def test_headers(self):
+        self.assertEqual(generate_corpus('lines_bbox_size', 0.001).blobs[0][1] & 0x03, 0x03)
+        self.assertEqual(generate_corpus('multipoints_ids', 0.001).blobs[0][1] & 0x04, 0x04)
+        self.assertEqual(decode(generate_corpus('lines_zm', 0.001).blobs[0]).ndims, 4)
+
+
+class BenchmarkTest(unittest.TestCase):
+
+    def test_run(self):
+        results = run_benchmarks([ 'points', 'collections_deep' ], None, 0.001, 1)
+        self.assertEqual(len(results['results']), 2 * len(STAGES))
+        for result in results['results']:
+            self.assertNotIn('error', result)
+            self.assertGreater(result['mb_per_s'], 0)
+            self.assertGreater(result['vertices_per_s'], 0)
+        # the results are plain JSON
+        self.assertEqual(json.loads(json.dumps(results)), results)
+
+    def test_compare(self):
+        baseline = run_benchmarks([ 'lines' ], [ 'decode' ], 0.01, 1)
+        current = json.loads(json.dumps(baseline))
+        current['results'][0]['seconds'] *= 2
+        log = io.StringIO()
+        self.assertEqual(len(compare(baseline, current, 0.1, log)), 1)
+        self.assertIn('SLOWER', log.getvalue())
+        self.assertEqual(compare(baseline, baseline, 0.1, io.StringIO()), [])
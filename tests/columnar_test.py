@@ -0,0 +1,76 @@
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+from util import hex_to_stream
+from twkbpy import decode_columns, iter_decode, GeometryColumns
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+# one record of every type, ids on the multipoint and the collection
+RECORDS = ('01000204' '02000202020808'
+           '03031b000400040205000004000004030000030500000002020000010100'
+           '04070b0004020402000200020404'
+           '05030f020c040c0202020404040204040404'
+           '06031d0016001602010500000200000201000001010514140200000201000001'
+           '070402000201000002020002080a0404')
+
+COLUMN_NAMES = ('coords', 'geometry_offsets', 'part_offsets', 'ring_offsets', 'types',
+                'part_types', 'part_ids', 'has_ids', 'bboxes', 'record_offsets')
+
+
+class DecodeColumnsTest(unittest.TestCase):
+
+    def assertSameColumns(self, a : GeometryColumns, b : GeometryColumns):
+        self.assertEqual(a.ndims, b.ndims)
+        for name in COLUMN_NAMES:
+            x = getattr(a, name).tolist()
+            y = getattr(b, name).tolist()
+            self.assertEqual(len(x), len(y), name)
+            for u, v in zip(x, y):
+                if u == u or v == v:
+                    self.assertEqual(u, v, name)
+
+    def test_matches_shapes(self):
+        expected = GeometryColumns()
+        for shape in iter_decode(bytes.fromhex(RECORDS)):
+            expected.append_shape(shape, shape.offset)
+        self.assertSameColumns(decode_columns(bytes.fromhex(RECORDS)), expected)
+        self.assertSameColumns(decode_columns(hex_to_stream(RECORDS)), expected)
+
+    def test_point_and_line(self):
+        columns = decode_columns(bytes.fromhex('01000204' '02000202020808'))
+        self.assertEqual(len(columns), 2)
+        self.assertEqual(list(columns.types), [1, 2])
+        self.assertEqual(list(columns.coords), [1, 2, 1, 1, 5, 5])
+        self.assertEqual(list(columns.geometry_offsets), [0, 1, 2])
+        self.assertEqual(list(columns.part_offsets), [0, 1, 2])
+        self.assertEqual(list(columns.ring_offsets), [0, 1, 3])
+        self.assertEqual(list(columns.record_offsets), [0, 4])
+
+    def test_blobs(self):
+        columns = decode_columns([ bytes.fromhex('04070b0004020402000200020404'), bytes.fromhex('01000204') ])
+        self.assertEqual(list(columns.types), [4, 1])
+        self.assertEqual(list(columns.part_ids), [0, 1, 0])
+        self.assertEqual(list(columns.has_ids), [1, 0])
+        self.assertEqual(list(columns.record_offsets), [-1, -1])
+
+    def test_mixed_dims(self):
+        with self.assertRaises(ValueError):
+            decode_columns(bytes.fromhex('01000204' 'a208010302040690030a0c0e1012'))
+
+    @unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+    def test_to_arrow(self):
+        table = decode_columns(bytes.fromhex(RECORDS)).to_arrow()
+        self.assertEqual(table.num_rows, 7)
+        self.assertEqual(table.column('type').to_pylist(), [1, 2, 3, 4, 5, 6, 7])
+        geometry = table.column('geometry').to_pylist()
+        self.assertEqual(geometry[0], [[[[1, 2]]]])
+        self.assertEqual(geometry[1], [[[[1, 1], [5, 5]]]])
+        self.assertEqual(len(geometry[2][0]), 2)
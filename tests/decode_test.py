@@ -4,7 +4,10 @@ import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 import unittest
-from twkbpy import decode
+import threading
+from twkbpy import decode, iter_decode, Decoder, Encoder, DecoderStats, WITHIN, thread_decoder
+from twkbpy.constants import GeometryType
+from twkbpy.read_buffer import scale_factors, EXTENDED_DIMS, GEOMETRY_TYPES, PRECISIONS_XY
 from util import hex_to_bytes, hex_to_stream
 
 
@@ -33,3 +36,305 @@ class GeneratorTest(unittest.TestCase):
 
         with self.assertRaises(StopIteration):
             next(generator)
+
+
+class BufferDecodeTest(unittest.TestCase):
+
+    def test_decode_from_bytes(self):
+        shape = decode(bytes.fromhex('02000202020808'))
+        self.assertEqual(list(shape.coordinates), [1, 1, 5, 5])
+
+    def test_decode_consecutive_from_stream(self):
+        stream = hex_to_stream('01000204' '02000202020808')
+        self.assertEqual(list(decode(stream).coordinates), [1, 2])
+        self.assertEqual(list(decode(stream).coordinates), [1, 1, 5, 5])
+        self.assertEqual(stream.read(), b'')
+
+    def test_decode_linestring_z(self):
+        # LINESTRING Z with xy precision 5 and a multi-byte delta
+        shape = decode(bytes.fromhex('a208010302040690030a0c0e1012'))
+        self.assertEqual(shape.ndims, 3)
+        self.assertEqual(list(shape.coordinates), [
+            1e-05, 2e-05, 3.0,
+            0.00201, 7e-05, 9.0,
+            0.00208, 0.00015, 18.0])
+
+    def test_decode_linestring_zm(self):
+        shape = decode(bytes.fromhex('a20803020204060890030a0c0e10'))
+        self.assertEqual(shape.ndims, 4)
+        self.assertEqual(list(shape.coordinates), [
+            1e-05, 2e-05, 3.0, 4.0,
+            0.00201, 7e-05, 9.0, 11.0])
+
+
+class CompactShapeTest(unittest.TestCase):
+
+    def test_multipolygon_buffers(self):
+        # MULTIPOLYGON(((0 0, 1 0, 1 1, 0 1, 0 0)), ((10 10, 11 10, 11 11, 10 11, 10 10)))
+        shape = decode(hex_to_stream('06031d0016001602010500000200000201000001010514140200000201000001'))
+        self.assertFalse(hasattr(shape, '__dict__'))
+        self.assertEqual(len(shape.coords), 20)
+        self.assertEqual(list(shape.part_offsets), [0, 1, 2])
+        self.assertEqual(list(shape.ring_offsets), [0, 5, 10])
+        second = shape.geoms[1]
+        self.assertIs(second.coords, shape.coords)
+        ring = second.coordinates[0]
+        self.assertEqual(list(ring.coordinates), [10, 10, 11, 10, 11, 11, 10, 11, 10, 10])
+
+    def test_polygon_with_empty_ring(self):
+        # POLYGON with a one-point ring and an empty ring
+        data = bytes.fromhex('03000201020200')
+        shape = decode(data)
+        self.assertEqual(list(shape.ring_offsets), [0, 1, 1])
+        self.assertEqual(Encoder().encode(shape), data)
+
+    def test_multilinestring_views(self):
+        shape = decode(hex_to_stream('05030f020c040c0202020404040204040404'))
+        self.assertEqual([list(g.coordinates) for g in shape.geoms], [[1, 2, 3, 4], [5, 6, 7, 8]])
+        self.assertEqual(shape.geoms[0].ndims, 2)
+
+
+class IterDecodeTest(unittest.TestCase):
+
+    RECORDS = '01000204' 'a208010302040690030a0c0e1012' '02000202020808'
+
+    def test_iter_decode_stream(self):
+        shapes = list(iter_decode(hex_to_stream(self.RECORDS)))
+        self.assertEqual([s.offset for s in shapes], [0, 4, 18])
+        self.assertEqual([s.ndims for s in shapes], [2, 3, 2])
+        self.assertEqual(list(shapes[2].coordinates), [1, 1, 5, 5])
+
+    def test_iter_decode_bytes(self):
+        shapes = list(iter_decode(bytes.fromhex(self.RECORDS)))
+        self.assertEqual(len(shapes), 3)
+        self.assertEqual(list(shapes[0].coordinates), [1, 2])
+
+    def test_iter_decode_empty(self):
+        self.assertEqual(list(iter_decode(b'')), [])
+
+    def test_iter_decode_empty_record(self):
+        # LINESTRING EMPTY, with and without a size header, between two records
+        for empty in ('0210', '021200'):
+            with self.subTest(empty):
+                data = '01000204' + empty + '02000202020808'
+                for source in (bytes.fromhex(data), hex_to_stream(data)):
+                    shapes = list(iter_decode(source))
+                    self.assertEqual([s.offset for s in shapes], [0, 4, 4 + len(empty) // 2])
+                    self.assertEqual(shapes[1].coordinates, [])
+                    self.assertEqual(list(shapes[2].coordinates), [1, 1, 5, 5])
+
+
+class PipeDecodeTest(unittest.TestCase):
+
+    def pipe(self, data):
+        r, w = os.pipe()
+        os.write(w, data)
+        os.close(w)
+        return os.fdopen(r, 'rb')
+
+    def test_decode_sized_records(self):
+        # MULTIPOINT((1 2), (3 4)) with bbox and size, LINESTRING(1 1, 5 5) with size
+        with self.pipe(bytes.fromhex('040309020404040202040404' '0202050202020808' '01000204')) as stream:
+            self.assertEqual(list(decode(stream).coords), [1, 2, 3, 4])
+            self.assertEqual(list(decode(stream).coords), [1, 1, 5, 5])
+            self.assertEqual(stream.read(), bytes.fromhex('01000204'))
+
+    def test_decode_unsized_record(self):
+        with self.pipe(bytes.fromhex('01000204')) as stream:
+            with self.assertRaises(ValueError):
+                decode(stream)
+
+    def test_iter_decode(self):
+        with self.pipe(bytes.fromhex('01000204' '02000202020808')) as stream:
+            self.assertEqual(len(list(iter_decode(stream))), 2)
+
+
+class LazyDecodeTest(unittest.TestCase):
+
+    # MULTIPOINT((1 2), (3 4)) with bbox and size headers, twice
+    RECORDS = '040309020404040202040404' * 2
+
+    def test_lazy_body_is_decoded_on_access(self):
+        shapes = list(Decoder(lazy=True).iter_decode(bytes.fromhex(self.RECORDS)))
+        self.assertEqual([s.offset for s in shapes], [0, 12])
+        second = shapes[1]
+        self.assertFalse(second.is_loaded)
+        self.assertEqual(second.body_span, (19, 24))
+        self.assertEqual([list(g.coordinates) for g in second.geoms], [[1, 2], [3, 4]])
+        self.assertTrue(second.is_loaded)
+
+    def test_lazy_without_size_decodes_eagerly(self):
+        shape = Decoder(lazy=True).decode(bytes.fromhex('02000202020808'))
+        self.assertEqual(list(shape.coordinates), [1, 1, 5, 5])
+
+
+class BboxFilterTest(unittest.TestCase):
+
+    # MULTIPOINT((1 2), (3 4)), POINT(100 200) with and without size, LINESTRING(1 1, 5 5)
+    RECORDS = ('040309020404040202040404'
+               '01030ac80100900300c8019003'
+               '0101c80100900300c8019003'
+               '02000202020808')
+
+    def test_bbox_is_exposed(self):
+        # POINT(10 20) with precision 1
+        shape = decode(bytes.fromhex('21030ac80100900300c8019003'))
+        self.assertEqual(shape.bbox, [10, 20, 10, 20])
+        self.assertEqual(list(shape.coordinates), [10, 20])
+
+    def test_iter_decode_intersects(self):
+        shapes = list(iter_decode(bytes.fromhex(self.RECORDS), bbox=(0, 0, 10, 10)))
+        # the record without a bbox can't be ruled out
+        self.assertEqual([s.type.name for s in shapes], ['MULTIPOINT', 'LINESTRING'])
+
+    def test_iter_decode_within(self):
+        shapes = list(iter_decode(bytes.fromhex(self.RECORDS), bbox=(0, 0, 150, 250), predicate=WITHIN))
+        self.assertEqual([s.offset for s in shapes], [0, 12, 25, 37])
+
+    def test_decode_miss(self):
+        self.assertIsNone(decode(bytes.fromhex(self.RECORDS), bbox=(50, 50, 60, 60)))
+
+    def test_collection_header(self):
+        # GEOMETRYCOLLECTION(POINT(1 2), LINESTRING Z(1 2 3, 4 5 6)): the
+        # members' headers must not replace the collection's
+        collection = { 'type': 'GeometryCollection', 'geometries': [
+            { 'type': 'Point', 'coordinates': [ 1, 2 ] },
+            { 'type': 'LineString', 'coordinates': [ [ 1, 2, 3 ], [ 4, 5, 6 ] ] } ] }
+        for decoder, encoder in ((Decoder(), Encoder(bbox=True)), (Decoder(lazy=True), Encoder(bbox=True, size=True))):
+            with self.subTest(lazy=decoder.lazy):
+                shape = decoder.decode(encoder.encode(collection))
+                self.assertEqual(shape.bbox, [1, 2, 4, 5])
+                self.assertEqual(shape.ndims, 2)
+                self.assertEqual([g.ndims for g in shape.geoms], [2, 3])
+                self.assertEqual(decoder.to_wkb(shape)[:5], bytes.fromhex('0107000000'))
+
+
+class ReusedDecoderTest(unittest.TestCase):
+
+    def test_decoder_reuses_context(self):
+        decoder = Decoder()
+        first = decoder.decode(bytes.fromhex('a208010302040690030a0c0e1012'))
+        context = decoder._context
+        second = decoder.decode(bytes.fromhex('01000204'))
+        self.assertIs(decoder._context, context)
+        self.assertEqual(list(second.coords), [1.0, 2.0])
+        self.assertEqual(second.ndims, 2)
+        self.assertEqual(first.ndims, 3)
+        self.assertEqual(list(first.coords)[:3], [1e-05, 2e-05, 3.0])
+
+    def test_nested_decode(self):
+        decoder = Decoder()
+        nested = []
+        def hook(stats, shape):
+            # decode another record while the first one is being read
+            if not nested:
+                nested.append(None)
+                nested[0] = decoder.decode(bytes.fromhex('01000204'))
+        decoder.stats = DecoderStats(hook)
+        shape = decoder.decode(bytes.fromhex('02000202020808'))
+        self.assertEqual(list(shape.coords), [1.0, 1.0, 5.0, 5.0])
+        self.assertEqual(list(nested[0].coords), [1.0, 2.0])
+
+    def test_settings_follow_decoder(self):
+        decoder = Decoder()
+        decoder.decode(bytes.fromhex('01000204'))
+        decoder.lazy = True
+        shape = decoder.decode(hex_to_stream('03031b000400040205000004000004030000030500000002020000010100').getvalue())
+        self.assertFalse(shape.is_loaded)
+
+    def test_errors_keep_decoder_usable(self):
+        decoder = Decoder()
+        with self.assertRaises(EOFError):
+            decoder.decode(bytes.fromhex('0200020202'))
+        with self.assertRaises(ValueError):
+            decoder.decode(bytes.fromhex('0800'))
+        self.assertEqual(list(decoder.decode(bytes.fromhex('01000204')).coords), [1.0, 2.0])
+
+    def test_thread_decoder(self):
+        decoder = thread_decoder()
+        self.assertIs(thread_decoder(), decoder)
+        others = []
+        thread = threading.Thread(target=lambda: others.append(thread_decoder()))
+        thread.start()
+        thread.join()
+        self.assertIsNot(others[0], decoder)
+
+
+class HeaderTablesTest(unittest.TestCase):
+
+    def test_factors(self):
+        self.assertEqual(scale_factors(0x20 | (0x01 | 3 << 2) << 8), (10.0, 10.0, 1000.0, 0.0))
+        self.assertEqual(scale_factors(0x10 | (0x02 | 2 << 5) << 8), (0.1, 0.1, 100.0, 0.0))
+        self.assertEqual(scale_factors(0xa0 | (0x03 | 1 << 2 | 7 << 5) << 8), (100000.0, 100000.0, 10.0, 10000000.0))
+
+    def test_tables(self):
+        self.assertEqual(PRECISIONS_XY[:4], [0, -1, 1, -2])
+        self.assertEqual(GEOMETRY_TYPES[3], GeometryType.POLYGON)
+        self.assertIsNone(GEOMETRY_TYPES[0])
+        self.assertEqual(EXTENDED_DIMS[0x02 | 2 << 5], (False, True, 0, 2))
+
+
+class QuantizedDecodeTest(unittest.TestCase):
+
+    def test_int64(self):
+        shape = Decoder(coord_type='q').decode(bytes.fromhex('a208010302040690030a0c0e1012'))
+        self.assertEqual(shape.coords.typecode, 'q')
+        self.assertEqual(list(shape.coords), [1, 2, 3, 201, 7, 9, 208, 15, 18])
+        self.assertEqual(shape.scale, (100000.0, 100000.0, 1.0))
+        self.assertEqual(list(shape.dequantize().coords), list(decode(bytes.fromhex('a208010302040690030a0c0e1012')).coords))
+
+    def test_int32(self):
+        shape = Decoder(coord_type='i').decode(bytes.fromhex('03031b000400040205000004000004030000030500000002020000010100'))
+        self.assertEqual(shape.coords.typecode, 'i')
+        self.assertEqual([ list(ring.coordinates) for ring in shape.coordinates ][1], [ 0, 0, 0, 1, 1, 1, 1, 0, 0, 0 ])
+        with self.assertRaises(OverflowError):
+            Decoder(coord_type='i').decode(bytes.fromhex('0100808080808001' '00'))
+
+    def test_outputs_match_float_decoding(self):
+        data = bytes.fromhex('070402000201000002020002080a0404')
+        decoder = Decoder(coord_type='q')
+        shape = decoder.decode(data)
+        self.assertEqual(shape.geoms[0].scale, shape.scale)
+        self.assertEqual(decoder.to_wkb(shape), Decoder().to_wkb(decode(data)))
+        self.assertEqual(decoder.to_geojson(shape), Decoder().to_geojson(decode(data)))
+        self.assertIs(decode(data).dequantize().type, GeometryType.COLLECTION)
+
+    def test_lazy(self):
+        shape = Decoder(lazy=True, coord_type='q').decode(bytes.fromhex('a20a010b0302040690030a0c0e1012'))
+        self.assertEqual(list(shape.coords), [1, 2, 3, 201, 7, 9, 208, 15, 18])
+
+    def test_bad_coord_type(self):
+        with self.assertRaises(ValueError):
+            Decoder(coord_type='f')
+
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+@unittest.skipIf(numpy is None, "numpy not installed")
+class NumpyDecodeTest(unittest.TestCase):
+
+    def test_decode_linestring(self):
+        shape = Decoder(use_numpy=True).decode(bytes.fromhex('a208010302040690030a0c0e1012'))
+        self.assertEqual(shape.coordinates.shape, (3, 3))
+        self.assertEqual(shape.coordinates.tolist(), [
+            [1e-05, 2e-05, 3.0],
+            [0.00201, 7e-05, 9.0],
+            [0.00208, 0.00015, 18.0]])
+
+    def test_decode_polygon_rings_share_refpoint(self):
+        shape = Decoder(use_numpy=True).decode(hex_to_stream('03031b000400040205000004000004030000030500000002020000010100'))
+        rings = [ring.coordinates.tolist() for ring in shape.coordinates]
+        self.assertEqual(rings, [
+            [[0, 0], [2, 0], [2, 2], [0, 2], [0, 0]],
+            [[0, 0], [0, 1], [1, 1], [1, 0], [0, 0]]])
+
+    def test_decode_quantized(self):
+        shape = Decoder(use_numpy=True, coord_type='i').decode(bytes.fromhex('a208010302040690030a0c0e1012'))
+        self.assertEqual(shape.coords.dtype, numpy.int32)
+        self.assertEqual(shape.coords.tolist(), [[1, 2, 3], [201, 7, 9], [208, 15, 18]])
+        self.assertEqual(shape.dequantize().coords.tolist(), Decoder(use_numpy=True).decode(
+            bytes.fromhex('a208010302040690030a0c0e1012')).coords.tolist())
@@ -0,0 +1,171 @@
+import sys
+import os
+import io
+import random
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+from twkbpy import decode, encode, Encoder, scan_headers
+from twkbpy.encode import write_varints, zigzag
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# records that re-encode to the same bytes with the same header flags
+RECORDS = [
+    '01000204',
+    '02000202020808',
+    '03031b000400040205000004000004030000030500000002020000010100',
+    '04070b0004020402000200020404',
+    '05030f020c040c0202020404040204040404',
+    '06031d0016001602010500000200000201000001010514140200000201000001',
+    '070402000201000002020002080a0404',
+    'a208010302040690030a0c0e1012',
+    '02080202020406020202',
+    'a20803020204060890030a0c0e',
+]
+
+
+def random_line(n, scale=180.0, digits=5):
+    return [ [ round(random.uniform(-scale, scale), digits), round(random.uniform(-scale, scale), digits) ]
+             for _ in range(0, n) ]
+
+
+class EncoderTest(unittest.TestCase):
+
+    def roundtrip(self, hex_string, use_numpy=False):
+        blob = bytes.fromhex(hex_string)
+        flags = blob[1]
+        encoder = Encoder(bbox=bool(flags & 0x01), size=bool(flags & 0x02), use_numpy=use_numpy)
+        self.assertEqual(encoder.encode(decode(blob)).hex(), hex_string)
+
+    def test_roundtrip(self):
+        for hex_string in RECORDS:
+            with self.subTest(hex_string):
+                self.roundtrip(hex_string)
+
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_roundtrip_numpy(self):
+        for hex_string in RECORDS:
+            with self.subTest(hex_string):
+                self.roundtrip(hex_string, True)
+
+    def test_varints(self):
+        values = [ 0, 1, 127, 128, 300, 16383, 16384, 2 ** 40 ]
+        out = bytearray()
+        write_varints(out, values)
+        self.assertEqual(out.hex(), '00017f8001ac02ff7f808001808080808020')
+        self.assertEqual([ zigzag(v) for v in (0, -1, 1, -2, 2) ], [ 0, 1, 2, 3, 4 ])
+
+    def test_geojson_point(self):
+        self.assertEqual(encode({ 'type': 'Point', 'coordinates': [ 1, 2 ] }).hex(), '01000204')
+
+    def test_geojson_feature(self):
+        feature = { 'type': 'Feature', 'geometry': { 'type': 'LineString', 'coordinates': [ [ 1, 1 ], [ 5, 5 ] ] } }
+        self.assertEqual(encode(feature).hex(), '02000202020808')
+
+    def test_geojson_polygon(self):
+        polygon = { 'type': 'Polygon', 'coordinates': [ [ [ 0, 0 ], [ 2, 0 ], [ 2, 2 ], [ 0, 0 ] ] ] }
+        shape = decode(encode(polygon, precision_xy=2))
+        self.assertEqual(list(shape.coords), [ 0.0, 0.0, 2.0, 0.0, 2.0, 2.0, 0.0, 0.0 ])
+        self.assertEqual(list(shape.ring_offsets), [ 0, 4 ])
+
+    def test_precision(self):
+        blob = encode({ 'type': 'Point', 'coordinates': [ 1.23456, -2.5 ] }, precision_xy=3)
+        self.assertEqual(list(decode(blob).coords), [ 1.235, -2.5 ])
+        self.assertEqual(blob[0] >> 4, 6)
+        blob = encode({ 'type': 'Point', 'coordinates': [ 1234, 5678 ] }, precision_xy=-2)
+        self.assertEqual(list(decode(blob).coords), [ 1200.0, 5700.0 ])
+        with self.assertRaises(ValueError):
+            encode({ 'type': 'Point', 'coordinates': [ 1, 2 ] }, precision_xy=8)
+
+    def test_z(self):
+        blob = encode({ 'type': 'LineString', 'coordinates': [ [ 1, 2, 3.5 ], [ 4, 5, 6.25 ] ] }, precision_z=2)
+        shape = decode(blob)
+        self.assertEqual(shape.ndims, 3)
+        self.assertEqual(list(shape.coords), [ 1.0, 2.0, 3.5, 4.0, 5.0, 6.25 ])
+
+    def test_bbox_and_size(self):
+        collection = { 'type': 'GeometryCollection', 'geometries': [
+            { 'type': 'Point', 'coordinates': [ 1, 2 ] },
+            { 'type': 'LineString', 'coordinates': [ [ -3, 5 ], [ 4, -1.5 ] ] } ] }
+        blob = encode(collection, precision_xy=1, bbox=True, size=True)
+        header = list(scan_headers(blob))[0]
+        self.assertEqual(header.bbox, [ -3.0, -1.5, 4.0, 5.0 ])
+        self.assertEqual(header.length, len(blob))
+        self.assertEqual(len(decode(blob).geoms), 2)
+
+    def test_idlist(self):
+        multipoint = { 'type': 'MultiPoint', 'coordinates': [ [ 0, 1 ], [ 2, 3 ] ] }
+        shape = decode(encode(multipoint, ids=[ 7, -4 ]))
+        self.assertEqual(list(shape.ids), [ 7, -4 ])
+        with self.assertRaises(ValueError):
+            encode(multipoint, ids=[ 1 ])
+
+    def test_empty(self):
+        self.assertEqual(encode({ 'type': 'LineString', 'coordinates': [] }).hex(), '0210')
+        for _type in ('Point', 'LineString', 'Polygon', 'MultiPoint', 'MultiLineString', 'MultiPolygon',
+                      'GeometryCollection'):
+            with self.subTest(_type):
+                geometry = { 'type': _type, 'coordinates': [] }
+                if _type == 'GeometryCollection':
+                    geometry = { 'type': _type, 'geometries': [] }
+                for encoder in (Encoder(), Encoder(size=True, bbox=True)):
+                    shape = decode(encoder.encode(geometry))
+                    self.assertEqual(shape.coordinates if _type != 'GeometryCollection' else shape.geoms, [])
+                    self.assertEqual(Encoder().encode(shape), Encoder().encode(geometry))
+
+    def test_bbox_without_vertices(self):
+        # MULTIPOLYGON(EMPTY) with size; POLYGON with one empty ring
+        data = bytes.fromhex('160a77020100')
+        self.assertEqual(Encoder(bbox=True, size=True).encode(decode(data)), data)
+        data = Encoder(bbox=True).encode({ 'type': 'Polygon', 'coordinates': [ [] ] })
+        self.assertEqual(data.hex(), '03000100')
+        self.assertIsNone(decode(data).bbox)
+
+    def test_bbox_of_mixed_dimensions(self):
+        # the 2D point widens the xy extent of the 3D collection, with its
+        # own precision
+        collection = { 'type': 'GeometryCollection', 'geometries': [
+            { 'type': 'LineString', 'coordinates': [ [ 1, 2, 3 ], [ 4, 5, 6 ] ] },
+            { 'type': 'Point', 'coordinates': [ 1.25, 20 ] } ] }
+        shape = decode(Encoder(bbox=True).encode(collection))
+        self.assertEqual(shape.bbox, [ 1, 2, 3, 4, 20, 6 ])
+        # a point of precision 2 in a 2D collection of precision 0
+        data = bytes.fromhex('070002') + encode(collection['geometries'][0]) + \
+            Encoder(precision_xy=2).encode(collection['geometries'][1])
+        shape = decode(Encoder(bbox=True).encode(decode(data)))
+        self.assertEqual(shape.bbox, [ 1, 2, 4, 20 ])
+        self.assertEqual(list(shape.geoms[1].coords), [ 1.25, 20 ])
+
+    def test_write(self):
+        fp = io.BytesIO()
+        lines = [ { 'type': 'LineString', 'coordinates': random_line(10) } for _ in range(0, 5) ]
+        self.assertEqual(Encoder(precision_xy=5, size=True).write(fp, lines), 5)
+        self.assertEqual(len(list(scan_headers(fp.getvalue()))), 5)
+
+    def test_random_lines(self):
+        random.seed(17)
+        for n in (1, 2, 50, 1000):
+            coordinates = random_line(n)
+            shape = decode(encode({ 'type': 'LineString', 'coordinates': coordinates }, precision_xy=5))
+            self.assertEqual(list(shape.coords), [ v for position in coordinates for v in position ])
+
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_numpy_array(self):
+        self.assertEqual(encode(numpy.array([ 1.0, 2.0 ])).hex(), '01000204')
+        self.assertEqual(encode(numpy.array([ [ 1.0, 1.0 ], [ 5.0, 5.0 ] ])).hex(), '02000202020808')
+
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_random_lines_numpy(self):
+        random.seed(23)
+        encoder = Encoder(precision_xy=5, use_numpy=True)
+        for n in (1, 2, 50, 1000):
+            coordinates = random_line(n)
+            pure = encode({ 'type': 'LineString', 'coordinates': coordinates }, precision_xy=5)
+            self.assertEqual(encoder.encode(numpy.array(coordinates)), pure)
+            self.assertEqual(encoder.encode({ 'type': 'LineString', 'coordinates': coordinates }), pure)
@@ -3,8 +3,11 @@ import os
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+import io
+import json
 import unittest
-from twkbpy import to_geojson
+from twkbpy import decode, to_geojson, write_geojson, GeoJsonWriter, iter_decode
+from twkbpy.geojson_writer import format_geometry
 from util import hex_to_bytes, hex_to_stream
 
 
@@ -191,3 +194,92 @@ class GeoJsonTest(unittest.TestCase):
                 }
             ]
         })
+
+
+class GeoJsonWriterTest(unittest.TestCase):
+
+    # POINT(1 2), LINESTRING(1 1, 5 5), MULTIPOINT((0 1), (2 3)) with ids 0 and 1
+    RECORDS = '01000204' '02000202020808' '04070b0004020402000200020404'
+
+    FEATURES = [
+        { 'type': 'Feature', 'geometry': { 'type': 'Point', 'coordinates': [1, 2] } },
+        { 'type': 'Feature', 'geometry': { 'type': 'LineString', 'coordinates': [[1, 1], [5, 5]] } },
+        { 'type': 'Feature', 'id': 0, 'geometry': { 'type': 'Point', 'coordinates': [0, 1] } },
+        { 'type': 'Feature', 'id': 1, 'geometry': { 'type': 'Point', 'coordinates': [2, 3] } },
+    ]
+
+    def test_feature_collection(self):
+        fp = io.StringIO()
+        self.assertEqual(write_geojson(hex_to_stream(self.RECORDS), fp), 4)
+        self.assertEqual(json.loads(fp.getvalue()), { 'type': 'FeatureCollection', 'features': self.FEATURES })
+
+    def test_empty_feature_collection(self):
+        fp = io.StringIO()
+        write_geojson(b'', fp)
+        self.assertEqual(json.loads(fp.getvalue()), { 'type': 'FeatureCollection', 'features': [] })
+
+    def test_seq(self):
+        fp = io.StringIO()
+        write_geojson(bytes.fromhex(self.RECORDS), fp, seq=True)
+        lines = fp.getvalue().splitlines()
+        self.assertEqual([ json.loads(line) for line in lines ], self.FEATURES)
+
+    def test_seq_rs(self):
+        fp = io.StringIO()
+        write_geojson(bytes.fromhex(self.RECORDS), fp, seq=True, rs=True)
+        # splitlines() would also split on the RS character
+        lines = fp.getvalue().split('\n')[:-1]
+        self.assertTrue(all(line.startswith('\x1e') for line in lines))
+        self.assertEqual([ json.loads(line[1:]) for line in lines ], self.FEATURES)
+
+    def test_polygons(self):
+        fp = io.StringIO()
+        with GeoJsonWriter(fp) as writer:
+            writer.write_all(iter_decode(bytes.fromhex(
+                '03031b000400040205000004000004030000030500000002020000010100'
+                '06031d0016001602010500000200000201000001010514140200000201000001')))
+        features = json.loads(fp.getvalue())['features']
+        self.assertEqual([ f['geometry'] for f in features ], [
+            { 'type': 'Polygon', 'coordinates': [[[0, 0], [2, 0], [2, 2], [0, 2], [0, 0]],
+                                                 [[0, 0], [0, 1], [1, 1], [1, 0], [0, 0]]] },
+            { 'type': 'Polygon', 'coordinates': [[[0, 0], [1, 0], [1, 1], [0, 1], [0, 0]]] },
+            { 'type': 'Polygon', 'coordinates': [[[10, 10], [11, 10], [11, 11], [10, 11], [10, 10]]] },
+        ])
+
+    def test_collection(self):
+        fp = io.StringIO()
+        write_geojson(bytes.fromhex('070402000201000002020002080a0404'), fp, seq=True)
+        self.assertEqual([ json.loads(line) for line in fp.getvalue().splitlines() ], [
+            { 'type': 'Feature', 'id': 0, 'geometry': { 'type': 'Point', 'coordinates': [0, 1] } },
+            { 'type': 'Feature', 'id': 1, 'geometry': { 'type': 'LineString', 'coordinates': [[4, 5], [6, 7]] } },
+        ])
+
+    def test_precision(self):
+        # LINESTRING Z with xy precision 5 and z precision 0
+        fp = io.StringIO()
+        write_geojson(bytes.fromhex('a208010302040690030a0c0e1012'), fp, seq=True)
+        self.assertEqual(fp.getvalue(), '{"type":"Feature","geometry":{"type":"LineString","coordinates":'
+                                        '[[0.00001,0.00002,3],[0.00201,0.00007,9],[0.00208,0.00015,18]]}}\n')
+
+    def test_collection_precision(self):
+        # GEOMETRYCOLLECTION(POINT(1.25 2.5), LINESTRING Z(1 2 3, 4 5 6)) with xy
+        # precision 2: the collection keeps its own, not its last member's
+        data = bytes.fromhex('4700024100fa01f40342080102c801900306d804d80406')
+        shape = decode(data)
+        self.assertEqual(shape.precision, [2, 2])
+        self.assertEqual(format_geometry(shape), '{"type":"GeometryCollection","geometries":['
+                         '{"type":"Point","coordinates":[1.25,2.50]},'
+                         '{"type":"LineString","coordinates":[[1.00,2.00,3],[4.00,5.00,6]]}]}')
+        fp = io.StringIO()
+        write_geojson(data, fp, seq=True)
+        self.assertEqual(fp.getvalue().splitlines()[1],
+                         '{"type":"Feature","geometry":{"type":"LineString","coordinates":[[1.00,2.00,3],[4.00,5.00,6]]}}')
+
+    def test_trim(self):
+        # POINT(10 20) with precision 1
+        fp = io.StringIO()
+        write_geojson(bytes.fromhex('21030ac80100900300c8019003'), fp, seq=True)
+        self.assertIn('"coordinates":[10.0,20.0]', fp.getvalue())
+        fp = io.StringIO()
+        write_geojson(bytes.fromhex('21030ac80100900300c8019003'), fp, seq=True, trim=True)
+        self.assertIn('"coordinates":[10,20]', fp.getvalue())
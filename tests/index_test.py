@@ -0,0 +1,55 @@
+import sys
+import os
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+from twkbpy import TwkbIndex
+from twkbpy.constants import GeometryType
+
+
+# POINT(100 200) with bbox and size, POINT(1 1) with bbox only, LINESTRING(1 1, 5 5),
+# MULTIPOINT with ids and bbox/size
+RECORDS = bytes.fromhex(
+    '01030ac80100900300c8019003'
+    '0101020002000202'
+    '02000202020808'
+    '04070b0004020402000200020404')
+
+
+class IndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.index = TwkbIndex.build(RECORDS, node_size=2)
+
+    def test_records(self):
+        self.assertEqual(len(self.index), 4)
+        self.assertEqual(list(self.index.offsets), [0, 13, 21, 28])
+        self.assertEqual(self.index.type(2), GeometryType.LINESTRING)
+        self.assertEqual(self.index.record_ids(3), [0, 1])
+
+    def test_query(self):
+        self.assertEqual(self.index.query((0, 0, 2, 2)), [1, 2, 3])
+        self.assertEqual(self.index.query((90, 190, 110, 210)), [0])
+        self.assertEqual(self.index.query((-1, -1, 3, 3), predicate='within'), [1, 3])
+
+    def test_query_empty(self):
+        # POINT EMPTY, POINT(1 2)
+        index = TwkbIndex.build(bytes.fromhex('011001000204'))
+        self.assertEqual(index.query((0, 0, 5, 5), predicate='within'), [1])
+        self.assertEqual(index.query((0, 0, 5, 5)), [1])
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'records.idx')
+            self.index.save(path)
+            with TwkbIndex.load(path) as index:
+                self.assertEqual(index.query((0, 0, 2, 2)), [1, 2, 3])
+                self.assertEqual(index.record_ids(3), [0, 1])
+                shapes = list(index.decode_window(RECORDS, (4, 4, 6, 6)))
+                self.assertEqual([list(s.coordinates) for s in shapes], [[1, 1, 5, 5]])
+            # unmapped, so that the file can be removed on every platform
+            with self.assertRaises(ValueError):
+                len(index)
+            index.close()
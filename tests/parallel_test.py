@@ -0,0 +1,36 @@
+import sys
+import os
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+from twkbpy import parallel_decode
+from twkbpy.parallel import split_records
+
+
+# POINT(1 2), LINESTRING(1 1, 5 5), MULTIPOINT((1 2), (3 4)) with bbox and size
+RECORDS = bytes.fromhex('01000204' '02000202020808' '040309020404040202040404')
+
+
+class ParallelDecodeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'records.twkb')
+        with open(self.path, 'wb') as f:
+            f.write(RECORDS * 3)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_split_records(self):
+        self.assertEqual(split_records(self.path, chunk_bytes=20), [(0, 23), (23, 46), (46, 69)])
+
+    def test_parallel_decode(self):
+        chunks = list(parallel_decode(self.path, max_workers=2, chunk_bytes=20))
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual([list(c.record_offsets) for c in chunks], [[0, 4, 11], [23, 27, 34], [46, 50, 57]])
+        self.assertEqual(list(chunks[1].types), [1, 2, 4])
+        self.assertEqual(list(chunks[1].coords), [1, 2, 1, 1, 5, 5, 1, 2, 3, 4])
+        self.assertEqual(list(chunks[1].ring_offsets), [0, 1, 3, 4, 5])
@@ -0,0 +1,36 @@
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+from twkbpy import scan_headers
+from twkbpy.constants import GeometryType
+from util import hex_to_stream
+
+
+class ScanHeadersTest(unittest.TestCase):
+
+    def test_sized_records(self):
+        # MULTIPOINT with ids, POLYGON with bbox and size
+        headers = list(scan_headers(hex_to_stream(
+            '04070b0004020402000200020404'
+            '03031b000400040205000004000004030000030500000002020000010100')))
+        self.assertEqual([h.offset for h in headers], [0, 14])
+        self.assertEqual([h.length for h in headers], [14, 30])
+        self.assertEqual(headers[0].ids, [0, 1])
+        self.assertEqual(headers[0].bbox, [0, 1, 2, 3])
+        self.assertEqual(headers[1].type, GeometryType.POLYGON)
+        self.assertEqual(headers[1].size, 27)
+
+    def test_unsized_records_are_walked(self):
+        # LINESTRING Z, COLLECTION with ids, MULTIPOLYGON without size
+        headers = list(scan_headers(bytes.fromhex(
+            'a208010302040690030a0c0e1012'
+            '070402000201000002020002080a0404'
+            '06010016001602010500000200000201000001010514140200000201000001')))
+        self.assertEqual([h.offset for h in headers], [0, 14, 30])
+        self.assertEqual((headers[0].precision_xy, headers[0].has_z, headers[0].ndims), (5, True, 3))
+        self.assertEqual(headers[1].ids, [0, 1])
+        self.assertIsNone(headers[2].size)
+        self.assertEqual(headers[2].length, 31)
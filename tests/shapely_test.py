@@ -0,0 +1,90 @@
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+from twkbpy import to_shapely, decode, decode_columns
+
+try:
+    import shapely
+except ImportError:
+    shapely = None
+
+
+BLOBS = [ bytes.fromhex(h) for h in (
+    '01000204',
+    '02000202020808',
+    '03031b000400040205000004000004030000030500000002020000010100',
+    '04070b0004020402000200020404',
+    '05030f020c040c0202020404040204040404',
+    '06031d0016001602010500000200000201000001010514140200000201000001',
+    '070402000201000002020002080a0404',
+) ]
+
+
+@unittest.skipIf(shapely is None, "shapely is not installed")
+class ToShapelyTest(unittest.TestCase):
+
+    EXPECTED = [
+        'POINT (1 2)',
+        'LINESTRING (1 1, 5 5)',
+        'POLYGON ((0 0, 2 0, 2 2, 0 2, 0 0), (0 0, 0 1, 1 1, 1 0, 0 0))',
+        'MULTIPOINT ((0 1), (2 3))',
+        'MULTILINESTRING ((1 2, 3 4), (5 6, 7 8))',
+        'MULTIPOLYGON (((0 0, 1 0, 1 1, 0 1, 0 0)), ((10 10, 11 10, 11 11, 10 11, 10 10)))',
+        'GEOMETRYCOLLECTION (POINT (0 1), LINESTRING (4 5, 6 7))',
+    ]
+
+    def assertGeometries(self, geoms, wkts):
+        self.assertEqual(len(geoms), len(wkts))
+        for geom, wkt in zip(geoms, wkts):
+            self.assertTrue(shapely.equals_exact(geom, shapely.from_wkt(wkt), 0), f"{geom} != {wkt}")
+
+    def test_blobs(self):
+        self.assertGeometries(to_shapely(BLOBS), self.EXPECTED)
+
+    def test_mixed_order(self):
+        order = [ 6, 0, 2, 0, 5, 1, 3, 4, 6 ]
+        self.assertGeometries(to_shapely([ BLOBS[i] for i in order ]), [ self.EXPECTED[i] for i in order ])
+
+    def test_columns(self):
+        columns = decode_columns(b''.join(BLOBS))
+        self.assertGeometries(to_shapely(columns), self.EXPECTED)
+
+    def test_z(self):
+        geoms = to_shapely([ bytes.fromhex('a208010302040690030a0c0e1012') ])
+        self.assertTrue(shapely.has_z(geoms[0]))
+        self.assertEqual(shapely.get_coordinates(geoms[0], include_z=True)[2].tolist(), [0.00208, 0.00015, 18.0])
+
+    def test_empty(self):
+        self.assertEqual(len(to_shapely([])), 0)
+
+    def test_empty_geometries(self):
+        # POINT EMPTY, POLYGON EMPTY, GEOMETRYCOLLECTION EMPTY, POINT(1 2)
+        geoms = to_shapely([ bytes.fromhex(h) for h in ('0110', '0310', '0710', '01000204') ])
+        self.assertEqual([ g.wkt for g in geoms ], [ 'POINT EMPTY', 'POLYGON EMPTY', 'GEOMETRYCOLLECTION EMPTY',
+                                                     'POINT (1 2)' ])
+
+    def test_collection_without_members(self):
+        # bbox, size and id list, but no member
+        geoms = to_shapely([ bytes.fromhex('1707098604b209b209e80e00'), BLOBS[6] ])
+        self.assertEqual(geoms[0].wkt, 'GEOMETRYCOLLECTION EMPTY')
+        self.assertGeometries(geoms[1:], self.EXPECTED[6:])
+
+    def test_polygon_without_rings(self):
+        geoms = to_shapely([ bytes.fromhex('660401e60b00'), bytes.fromhex('0600020001040000020000020101'), BLOBS[5] ])
+        self.assertEqual([ g.wkt for g in geoms[:2] ], [ 'MULTIPOLYGON (EMPTY)',
+                                                         'MULTIPOLYGON (EMPTY, ((0 0, 1 0, 1 1, 0 0)))' ])
+        self.assertGeometries(geoms[2:], self.EXPECTED[5:6])
+
+    def test_empty_members(self):
+        # GEOMETRYCOLLECTION(MULTIPOLYGON EMPTY, POINT(1 2)), GEOMETRYCOLLECTION(GEOMETRYCOLLECTION EMPTY, POINT(1 2))
+        blobs = [ bytes.fromhex('070002061001000204'), bytes.fromhex('07000207000001000204') ]
+        expected = [ 'GEOMETRYCOLLECTION (MULTIPOLYGON EMPTY, POINT (1 2))',
+                     'GEOMETRYCOLLECTION (GEOMETRYCOLLECTION EMPTY, POINT (1 2))' ]
+        self.assertEqual([ g.wkt for g in to_shapely(blobs) ], expected)
+        columns = decode_columns([])
+        for blob in blobs:
+            columns.append_shape(decode(blob))
+        self.assertEqual([ g.wkt for g in to_shapely(columns) ], expected)
@@ -0,0 +1,144 @@
+import sys
+import os
+import io
+import math
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+from twkbpy import decode, Decoder, Encoder, Simplify, CoordTransform, DOUGLAS_PEUCKER, VISVALINGAM
+from twkbpy.simplify import douglas_peucker, visvalingam, DEGREES
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def circle(radius, n, x=0.0, y=0.0):
+    ring = [ [ x + radius * math.cos(2 * math.pi * i / n), y + radius * math.sin(2 * math.pi * i / n) ]
+             for i in range(0, n) ]
+    return ring + [ ring[0] ]
+
+SINE = { 'type': 'LineString', 'coordinates': [ [ i * 0.1, math.sin(i * 0.1) ] for i in range(0, 200) ] }
+POLYGONS = { 'type': 'MultiPolygon', 'coordinates': [
+    [ circle(10, 100), circle(0.1, 100) ],
+    [ [ [ 20, 20 ], [ 20.1, 20 ], [ 20.1, 20.1 ], [ 20, 20.1 ], [ 20.05, 20.05 ], [ 20, 20 ] ] ] ] }
+
+
+def rings(shape):
+    coords, offsets = list(shape.coords), shape.ring_offsets
+    return [ coords[offsets[r] * 2:offsets[r + 1] * 2] for r in range(0, len(offsets) - 1) ]
+
+
+class SimplifyTest(unittest.TestCase):
+
+    def test_radial(self):
+        data = Encoder(precision_xy=3).encode(SINE)
+        shape = Decoder(simplify=Simplify(0.5)).decode(data)
+        coords = list(shape.coords)
+        full = list(decode(data).coords)
+        self.assertLess(len(coords), len(full) // 4)
+        self.assertEqual(coords[:2], full[:2])
+        self.assertEqual(coords[-2:], full[-2:])
+        for i in range(2, len(coords) - 2, 2):
+            self.assertGreaterEqual(math.hypot(coords[i] - coords[i - 2], coords[i + 1] - coords[i - 1]), 0.5 - 1e-9)
+
+    def test_methods(self):
+        data = Encoder(precision_xy=3).encode(SINE)
+        radial = len(Decoder(simplify=Simplify(0.1)).decode(data).coords)
+        for method in (DOUGLAS_PEUCKER, VISVALINGAM):
+            with self.subTest(method):
+                shape = Decoder(simplify=Simplify(0.1, method)).decode(data)
+                self.assertLess(len(shape.coords), radial)
+                self.assertEqual(list(shape.coords[-2:]), list(decode(data).coords[-2:]))
+
+    def test_zero_tolerance_keeps_distinct_vertices(self):
+        data = Encoder(precision_xy=3).encode(SINE)
+        self.assertEqual(list(Decoder(simplify=Simplify(0)).decode(data).coords), list(decode(data).coords))
+
+    def test_z_and_m(self):
+        vertices = [ [ x, y, i, -i ] for i, (x, y) in enumerate(SINE['coordinates']) ]
+        for ndims in (3, 4):
+            with self.subTest(ndims):
+                line = { 'type': 'LineString', 'coordinates': [ v[:ndims] for v in vertices ] }
+                data = Encoder(precision_xy=3).encode(line)
+                self.assertEqual(list(Decoder(simplify=Simplify(0)).decode(data).coords), list(decode(data).coords))
+                coords = list(Decoder(simplify=Simplify(0.5)).decode(data).coords)
+                self.assertEqual(coords[ndims - 1::ndims][-1], (-1 if ndims == 4 else 1) * 199)
+
+    def test_rings_stay_valid(self):
+        data = Encoder(precision_xy=3).encode(POLYGONS)
+        for method in (None, DOUGLAS_PEUCKER, VISVALINGAM):
+            with self.subTest(method):
+                shape = Decoder(simplify=Simplify(1, method)).decode(data)
+                # the hole is smaller than the tolerance and is dropped,
+                # the small square is read in full
+                self.assertEqual(list(shape.part_offsets), [ 0, 1, 2 ])
+                for ring in rings(shape):
+                    self.assertGreaterEqual(len(ring), 8)
+                    self.assertEqual(ring[:2], ring[-2:])
+                self.assertEqual(len(rings(shape)[1]), 12)
+
+    def test_stream_rereads_ring(self):
+        data = Encoder(precision_xy=3).encode(POLYGONS)
+        shape = Decoder(simplify=Simplify(1)).decode(io.BytesIO(data))
+        self.assertEqual(rings(shape)[1], rings(decode(data))[2])
+
+    def test_multilinestring_offsets(self):
+        lines = { 'type': 'MultiLineString', 'coordinates': [ SINE['coordinates'], [ [ 0, 0 ], [ 1, 1 ] ] ] }
+        shape = Decoder(simplify=Simplify(0.5)).decode(Encoder(precision_xy=3).encode(lines))
+        offsets = shape.part_offsets
+        self.assertEqual(len(shape.coords) // 2, offsets[-1])
+        self.assertEqual(offsets[2] - offsets[1], 2)
+
+    def test_outputs(self):
+        data = Encoder(precision_xy=3).encode(SINE)
+        full = list(Decoder(simplify=Simplify(0.5)).decode(data).coords)
+        shape = Decoder(simplify=Simplify(0.5), coord_type='q').decode(data)
+        self.assertEqual(shape.coords.typecode, 'q')
+        self.assertEqual(list(shape.dequantize().coords), full)
+        shape = Decoder(simplify=Simplify(0.5), transform=CoordTransform.scale_offset(2, 2)).decode(data)
+        for value, expected in zip(shape.coords, full):
+            self.assertAlmostEqual(value, 2 * expected)
+        shape = Decoder(simplify=Simplify(0.5), lazy=True).decode(Encoder(precision_xy=3, size=True).encode(SINE))
+        self.assertEqual(list(shape.coords), full)
+
+    def test_for_zoom(self):
+        self.assertAlmostEqual(Simplify.for_zoom(0).tolerance, 2 * math.pi * 6378137.0 / 256)
+        self.assertEqual(Simplify.for_zoom(10, units=DEGREES, pixels=2).tolerance, 720.0 / 256 / 1024)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            Simplify(-1)
+        with self.assertRaises(ValueError):
+            Simplify(1, 'topological')
+        with self.assertRaises(ValueError):
+            Simplify.for_zoom(3, units='ft')
+
+    @unittest.skipIf(numpy is None, "numpy not installed")
+    def test_numpy(self):
+        data = Encoder(precision_xy=3).encode(POLYGONS)
+        shape = Decoder(use_numpy=True, simplify=Simplify(1)).decode(data)
+        expected = Decoder(simplify=Simplify(1)).decode(data)
+        self.assertEqual(shape.coords.ravel().tolist(), list(expected.coords))
+        self.assertEqual(list(shape.ring_offsets), list(expected.ring_offsets))
+
+
+class SimplifyAlgorithmsTest(unittest.TestCase):
+
+    def test_douglas_peucker(self):
+        xs, ys = [ 0, 1, 2, 3, 4 ], [ 0, 1, 0, 5, 0 ]
+        self.assertEqual(douglas_peucker(xs, ys, 4, False), [ 0, 3, 4 ])
+        self.assertEqual(douglas_peucker(xs, ys, 0.25, False), [ 0, 1, 2, 3, 4 ])
+
+    def test_douglas_peucker_ring(self):
+        xs, ys = [ 0, 10, 10, 5, 0, 0 ], [ 0, 0, 10, 10, 10, 0 ]
+        self.assertEqual(douglas_peucker(xs, ys, 1, True), [ 0, 1, 2, 4, 5 ])
+
+    def test_visvalingam(self):
+        xs, ys = [ 0, 1, 2, 3, 4 ], [ 0, 1, 0, 5, 0 ]
+        self.assertEqual(visvalingam(xs, ys, 3, False), [ 0, 2, 3, 4 ])
+        self.assertEqual(visvalingam(xs, ys, 12, False), [ 0, 3, 4 ])
+        # rings keep 4 vertices whatever the tolerance
+        self.assertEqual(len(visvalingam([ 0, 10, 10, 0, 0 ], [ 0, 0, 10, 10, 0 ], 1e9, True)), 4)
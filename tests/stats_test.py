@@ -0,0 +1,92 @@
+import sys
+import os
+import io
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+from util import hex_to_stream
+from twkbpy import Decoder, DecoderStats, OgrTransform
+
+
+# a point, a linestring, a multipoint with ids and a collection
+RECORDS = bytes.fromhex('01000204' '02000202020808' '04070b0004020402000200020404' '070402000201000002020002080a0404')
+
+
+class DecoderStatsTest(unittest.TestCase):
+
+    def test_counters(self):
+        stats = DecoderStats()
+        shapes = list(Decoder(stats=stats).iter_decode(RECORDS))
+        self.assertEqual(len(shapes), 4)
+        result = stats.as_dict()
+        self.assertEqual(result['records'], 4)
+        self.assertEqual(result['skipped'], 0)
+        self.assertEqual(result['bytes'], len(RECORDS))
+        self.assertEqual(result['vertices'], 1 + 2 + 2 + 1 + 2)
+        self.assertEqual(result['geometries'], { 'POINT': 2, 'LINESTRING': 2, 'MULTIPOINT': 1, 'COLLECTION': 1 })
+        self.assertEqual(result['calls']['header'], 4)
+        self.assertEqual(result['calls']['body'], 4)
+        self.assertEqual(result['calls']['coordinates'], 5)
+        self.assertGreaterEqual(result['seconds']['body'], result['seconds']['coordinates'])
+
+    def test_stream(self):
+        stats = DecoderStats()
+        list(Decoder(stats=stats).iter_decode(io.BufferedReader(io.BytesIO(RECORDS))))
+        self.assertEqual(stats.bytes, len(RECORDS))
+        self.assertEqual(stats.records, 4)
+
+    def test_skipped(self):
+        stats = DecoderStats()
+        decoder = Decoder(stats=stats)
+        self.assertIsNone(decoder.decode(hex_to_stream('03031b000400040205000004000004030000030500000002020000010100'),
+                                         bbox=[ 10, 10, 20, 20 ]))
+        self.assertEqual(stats.skipped, 1)
+        self.assertEqual(stats.records, 0)
+        self.assertEqual(stats.bytes, 30)
+        self.assertNotIn('body', stats.seconds)
+
+    def test_hook(self):
+        seen = []
+        stats = DecoderStats(lambda stats, shape: seen.append((stats.records, shape.type.name)))
+        list(Decoder(stats=stats).iter_decode(RECORDS))
+        self.assertEqual(seen, [ (1, 'POINT'), (2, 'LINESTRING'), (3, 'MULTIPOINT'), (4, 'COLLECTION') ])
+
+    def test_transforms(self):
+        stats = DecoderStats()
+        decoder = Decoder(stats=stats)
+        shape = decoder.decode(RECORDS)
+        decoder.to_geojson(shape)
+        decoder.to_wkb(shape)
+        OgrTransform(stats).convert(shape)
+        self.assertEqual(decoder.write_geojson(RECORDS, io.StringIO(), seq=True), 6)
+        self.assertEqual(stats.calls['geojson'], 1 + 4)
+        self.assertEqual(stats.calls['wkb'], 1)
+        self.assertEqual(stats.calls['ogr'], 1)
+
+    def test_numpy(self):
+        try:
+            import numpy
+        except ImportError:
+            self.skipTest("numpy is not installed")
+        stats = DecoderStats()
+        list(Decoder(use_numpy=True, stats=stats).iter_decode(RECORDS))
+        self.assertEqual(stats.vertices, 8)
+
+    def test_lazy(self):
+        stats = DecoderStats()
+        shape = Decoder(lazy=True, stats=stats).decode(hex_to_stream('03031b000400040205000004000004030000030500000002020000010100'))
+        self.assertEqual(stats.vertices, 0)
+        shape.coords
+        self.assertEqual(stats.vertices, 10)
+
+    def test_reset(self):
+        stats = DecoderStats()
+        list(Decoder(stats=stats).iter_decode(RECORDS))
+        stats.reset()
+        self.assertEqual(stats.as_dict(), { 'records': 0, 'skipped': 0, 'bytes': 0, 'vertices': 0,
+                                            'geometries': {}, 'seconds': {}, 'calls': {} })
+
+    def test_disabled(self):
+        decoder = Decoder()
+        self.assertIsNone(decoder.create_context(RECORDS).stats)
@@ -0,0 +1,91 @@
+import sys
+import os
+import struct
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+from twkbpy import iter_decode, Decoder, Encoder, CoordTransform, TO_LONLAT, TO_MERCATOR
+from twkbpy.geojson_writer import format_geometry
+from twkbpy.transform import to_lonlat, to_mercator, MERCATOR_EXTENT
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+TILE_LINE = { 'type': 'LineString', 'coordinates': [ [ 0, 0 ], [ 4096, 4096 ], [ 2048, 1024 ] ] }
+LINE_Z = { 'type': 'LineString', 'coordinates': [ [ 1.5, 2.25, 3 ], [ 4, 5, 6 ] ] }
+RECORDS = bytes.fromhex('01000204' '02000202020808' '03031b000400040205000004000004030000030500000002020000010100'
+                        '04070b0004020402000200020404' '070402000201000002020002080a0404')
+
+
+class CoordTransformTest(unittest.TestCase):
+
+    def assertCoordsAlmostEqual(self, first, second):
+        self.assertEqual(len(first), len(second))
+        for a, b in zip(first, second):
+            self.assertAlmostEqual(a, b, places=9)
+
+    def test_projections_round_trip(self):
+        x, y = to_mercator(12.5, 55.25)
+        lon, lat = to_lonlat(x, y)
+        self.assertAlmostEqual(lon, 12.5)
+        self.assertAlmostEqual(lat, 55.25)
+
+    def test_tile(self):
+        transform = CoordTransform.tile(1, 1, 0, extent=4096)
+        self.assertEqual(transform.apply([ 0, 0, 4096, 4096 ], 2), [ 0.0, MERCATOR_EXTENT, MERCATOR_EXTENT, 0.0 ])
+
+    def test_matches_separate_pass(self):
+        transform = CoordTransform((0.5, 0.25, 10, -0.25, 2, -3), project=TO_LONLAT)
+        for shape in iter_decode(RECORDS):
+            if not hasattr(shape, 'coords'):
+                continue
+            with self.subTest(shape.type):
+                transformed = Decoder(transform=transform).decode(RECORDS[shape.offset:])
+                self.assertCoordsAlmostEqual(list(transformed.coords), transform.apply(shape.coords, shape.ndims))
+
+    def test_z_and_bbox(self):
+        data = Encoder(precision_xy=2, bbox=True).encode(LINE_Z)
+        shape = Decoder(transform=CoordTransform.swap_axes(z=(2, 1))).decode(data)
+        self.assertEqual(list(shape.coords), [ 2.25, 1.5, 7.0, 5.0, 4.0, 13.0 ])
+        self.assertEqual(shape.bbox, [ 2.25, 1.5, 7.0, 5.0, 4.0, 13.0 ])
+        self.assertIsNone(shape.precision)
+
+    def test_lazy(self):
+        data = Encoder(precision_xy=2, size=True).encode(LINE_Z)
+        shape = Decoder(lazy=True, transform=CoordTransform.scale_offset(2, 2, 1, 1)).decode(data)
+        self.assertEqual(list(shape.coords), [ 4.0, 5.5, 3.0, 9.0, 11.0, 6.0 ])
+
+    def test_outputs(self):
+        data = Encoder(precision_xy=0).encode(TILE_LINE)
+        decoder = Decoder(transform=CoordTransform.tile(1, 1, 0, project=TO_LONLAT, precision=6))
+        shape = decoder.decode(data)
+        self.assertEqual(format_geometry(shape), '{"type":"LineString","coordinates":'
+                         '[[0.000000,85.051129],[180.000000,0.000000],[90.000000,79.171335]]}')
+        self.assertEqual(shape.precision, [ 6, 6 ])
+        self.assertEqual(decoder.to_wkb(shape), struct.pack('<BII6d', 1, 2, 3, *shape.coords))
+
+    def test_bbox_query_in_record_units(self):
+        data = Encoder(precision_xy=0, bbox=True).encode(TILE_LINE)
+        decoder = Decoder(transform=CoordTransform.tile(1, 1, 0, project=TO_LONLAT))
+        self.assertIsNotNone(decoder.decode(data, bbox=[ 0, 0, 10, 10 ]))
+        self.assertIsNone(decoder.decode(data, bbox=[ 5000, 5000, 6000, 6000 ]))
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            CoordTransform(project='utm')
+        with self.assertRaises(ValueError):
+            Decoder(coord_type='q', transform=CoordTransform())
+
+    @unittest.skipIf(numpy is None, "numpy not installed")
+    def test_numpy(self):
+        transform = CoordTransform.tile(3, 2, 5, project=TO_LONLAT)
+        data = Encoder(precision_xy=0).encode(TILE_LINE)
+        expected = list(Decoder(transform=transform).decode(data).coords)
+        self.assertCoordsAlmostEqual(Decoder(use_numpy=True, transform=transform).decode(data).coords.ravel().tolist(),
+                                     expected)
+        shape = Decoder(use_numpy=True, transform=CoordTransform(project=TO_MERCATOR)).decode(RECORDS[4:])
+        self.assertCoordsAlmostEqual(shape.coords.ravel().tolist(), list(to_mercator(1, 1)) + list(to_mercator(5, 5)))
@@ -0,0 +1,56 @@
+import sys
+import os
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+from twkbpy import TwkbFile, Decoder
+
+
+# POINT(1 2), LINESTRING(1 1, 5 5), MULTIPOINT((1 2), (3 4)) with bbox and size
+RECORDS = bytes.fromhex('01000204' '02000202020808' '040309020404040202040404')
+
+
+class TwkbFileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'records.twkb')
+        with open(self.path, 'wb') as f:
+            f.write(RECORDS)
+        self.reader = TwkbFile(self.path)
+
+    def tearDown(self):
+        self.reader.close()
+        self.tmp.cleanup()
+
+    def test_random_access(self):
+        self.assertEqual(list(self.reader[1].coordinates), [1, 1, 5, 5])
+        self.assertEqual(len(self.reader.offsets), 2)
+        self.assertEqual(self.reader[-1].offset, 11)
+        self.assertEqual(len(self.reader), 3)
+        with self.assertRaises(IndexError):
+            self.reader[3]
+
+    def test_slice(self):
+        shapes = self.reader[::2]
+        self.assertEqual([s.type.name for s in shapes], ['POINT', 'MULTIPOINT'])
+
+    def test_iter(self):
+        self.assertEqual([s.offset for s in self.reader], [0, 4, 11])
+
+    def test_close_after_lazy_read(self):
+        self.reader.close()
+        self.reader = TwkbFile(self.path, Decoder(lazy=True))
+        shape = self.reader[2]
+        self.reader.close()
+        # the lazy body doesn't point into the closed mapping
+        self.assertEqual(list(shape.coords), [1, 2, 3, 4])
+
+    def test_close_with_unfinished_iterator(self):
+        shapes = iter(self.reader)
+        self.assertEqual(next(shapes).offset, 0)
+        self.reader.close()
+        with self.assertRaises(ValueError):
+            next(shapes)
@@ -0,0 +1,88 @@
+import sys
+import os
+import struct
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+from util import hex_to_stream
+from twkbpy import decode, to_ewkb, Twkb
+from twkbpy.wkb import to_wkb
+
+
+def wkb(code, *fields):
+    """
+    Little-endian WKB header followed by counts (ints) and ordinates (floats)
+    """
+    out = struct.pack('<BI', 1, code)
+    for field in fields:
+        out += struct.pack('<I', field) if isinstance(field, int) else struct.pack('<d', field)
+    return out
+
+
+class WkbTest(unittest.TestCase):
+
+    def test_point(self):
+        self.assertEqual(to_wkb(decode(hex_to_stream('01000204'))), wkb(1, 1.0, 2.0))
+
+    def test_linestring(self):
+        self.assertEqual(to_wkb(decode(bytes.fromhex('02000202020808'))), wkb(2, 2, 1.0, 1.0, 5.0, 5.0))
+
+    def test_linestring_z(self):
+        self.assertEqual(to_wkb(decode(bytes.fromhex('a208010302040690030a0c0e1012'))),
+                         wkb(1002, 3, 1e-05, 2e-05, 3.0, 0.00201, 7e-05, 9.0, 0.00208, 0.00015, 18.0))
+
+    def test_linestring_m(self):
+        self.assertEqual(to_wkb(decode(bytes.fromhex('0208020202040602020202'))),
+                         wkb(2002, 2, 1.0, 2.0, 3.0, 2.0, 3.0, 4.0))
+
+    def test_linestring_zm(self):
+        self.assertEqual(to_wkb(decode(bytes.fromhex('a20803020204060890030a0c0e10'))),
+                         wkb(3002, 2, 1e-05, 2e-05, 3.0, 4.0, 0.00201, 7e-05, 9.0, 11.0))
+
+    def test_polygon(self):
+        shape = decode(hex_to_stream('03031b000400040205000004000004030000030500000002020000010100'))
+        self.assertEqual(to_wkb(shape), wkb(3, 2,
+            5, 0.0, 0.0, 2.0, 0.0, 2.0, 2.0, 0.0, 2.0, 0.0, 0.0,
+            5, 0.0, 0.0, 0.0, 1.0, 1.0, 1.0, 1.0, 0.0, 0.0, 0.0))
+
+    def test_multipoint(self):
+        self.assertEqual(to_wkb(decode(hex_to_stream('04070b0004020402000200020404'))),
+                         wkb(4, 2) + wkb(1, 0.0, 1.0) + wkb(1, 2.0, 3.0))
+
+    def test_multilinestring(self):
+        self.assertEqual(to_wkb(decode(hex_to_stream('05030f020c040c0202020404040204040404'))),
+                         wkb(5, 2) + wkb(2, 2, 1.0, 2.0, 3.0, 4.0) + wkb(2, 2, 5.0, 6.0, 7.0, 8.0))
+
+    def test_multipolygon(self):
+        shape = decode(hex_to_stream('06031d0016001602010500000200000201000001010514140200000201000001'))
+        self.assertEqual(to_wkb(shape), wkb(6, 2)
+            + wkb(3, 1, 5, 0.0, 0.0, 1.0, 0.0, 1.0, 1.0, 0.0, 1.0, 0.0, 0.0)
+            + wkb(3, 1, 5, 10.0, 10.0, 11.0, 10.0, 11.0, 11.0, 10.0, 11.0, 10.0, 10.0))
+
+    def test_collection(self):
+        self.assertEqual(to_wkb(decode(hex_to_stream('070402000201000002020002080a0404'))),
+                         wkb(7, 2) + wkb(1, 0.0, 1.0) + wkb(2, 2, 4.0, 5.0, 6.0, 7.0))
+
+    def test_member_views(self):
+        shape = decode(hex_to_stream('05030f020c040c0202020404040204040404'))
+        self.assertEqual(to_wkb(shape.geoms[1]), wkb(2, 2, 5.0, 6.0, 7.0, 8.0))
+
+
+class EwkbTest(unittest.TestCase):
+
+    def test_point(self):
+        self.assertEqual(to_ewkb(hex_to_stream('01000204')), wkb(1, 1.0, 2.0))
+
+    def test_srid(self):
+        self.assertEqual(to_ewkb(hex_to_stream('01000204'), 4326), wkb(0x20000001, 4326, 1.0, 2.0))
+
+    def test_flags(self):
+        self.assertEqual(Twkb.from_binary(bytes.fromhex('0208020202040602020202')).to_ewkb(),
+                         wkb(0x40000002, 2, 1.0, 2.0, 3.0, 2.0, 3.0, 4.0))
+        self.assertEqual(Twkb.from_binary(bytes.fromhex('a20803020204060890030a0c0e10')).to_ewkb(4326)[:9],
+                         struct.pack('<BII', 1, 0xe0000002, 4326))
+
+    def test_members_have_no_srid(self):
+        self.assertEqual(to_ewkb(hex_to_stream('070402000201000002020002080a0404'), 4326),
+                         wkb(0x20000007, 4326, 2) + wkb(1, 0.0, 1.0) + wkb(2, 2, 4.0, 5.0, 6.0, 7.0))
@@ -1,21 +1,63 @@
 # -*- coding: utf-8 -*-
 import base64
-from .decode import Decoder
+from .decode import Decoder, thread_decoder
+from .bbox import INTERSECTS, WITHIN
 from .ogr_transform import OgrTransform
+from .geojson_writer import GeoJsonWriter
+from .encode import Encoder
 
 from .twkb import Twkb
+from .index import TwkbIndex
+from .twkb_file import TwkbFile
+from .columnar import GeometryColumns, decode_columns
+from .batch import decode_blobs
+from .parallel import parallel_decode
+from .scan import RecordHeader, scan_headers
+from .stats import DecoderStats
+from .transform import CoordTransform, TO_LONLAT, TO_MERCATOR
+from .simplify import Simplify, DOUGLAS_PEUCKER, VISVALINGAM
 
-def decode(stream):
-    return Decoder().decode(stream)
+def decode(stream, bbox=None, predicate=INTERSECTS):
+    return thread_decoder().decode(stream, bbox, predicate)
+
+def iter_decode(stream, bbox=None, predicate=INTERSECTS):
+    return thread_decoder().iter_decode(stream, bbox, predicate)
+
+def aiter_decode(reader, bbox=None, predicate=INTERSECTS, executor=None):
+    return thread_decoder().aiter_decode(reader, bbox, predicate, executor)
+
+def encode(geom, ids=None, precision_xy=None, precision_z=None, precision_m=None, bbox=False, size=False):
+    return Encoder(precision_xy, precision_z, precision_m, bbox, size).encode(geom, ids)
 
 def to_geojson(stream):
-    _decoder = Decoder()
+    _decoder = thread_decoder()
     geoshape = _decoder.decode(stream)
     return _decoder.to_geojson(geoshape)
 
+def write_geojson(stream, fp, seq=False, rs=False, bbox=None, predicate=INTERSECTS, trim=False):
+    return thread_decoder().write_geojson(stream, fp, seq, rs, bbox, predicate, trim)
+
+def to_wkb(stream):
+    _decoder = thread_decoder()
+    return _decoder.to_wkb(_decoder.decode(stream))
+
+def to_ewkb(stream, srid=None):
+    _decoder = thread_decoder()
+    return _decoder.to_ewkb(_decoder.decode(stream), srid)
+
+def to_shapely(source):
+    # numpy and shapely are optional, only needed here
+    from .shapely_transform import to_shapely as _to_shapely
+    return _to_shapely(source)
+
 def to_ogr(stream):
-    _decoder = Decoder()
+    _decoder = thread_decoder()
     _xform = OgrTransform()
     geoshape = _decoder.decode(stream)
     ogr = _xform.convert(geoshape)
     return ogr
+
+def to_ogr_layer(stream, datasource, name, srs=None, bbox=None, predicate=INTERSECTS):
+    _decoder = thread_decoder()
+    _xform = OgrTransform()
+    return _xform.create_layer(datasource, name, _decoder.iter_decode(stream, bbox, predicate), srs)
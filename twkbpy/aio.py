@@ -0,0 +1,187 @@
+"""
+Record framing for asyncio byte streams.
+
+Data is pulled from an async reader in chunks.  Only record boundaries are
+worked out as it arrives: a record with a size header is complete once
+that many bytes are buffered, other records are walked varint by varint
+without decoding any coordinates.  The walk of a record that hasn't fully
+arrived is suspended where the data ran out and resumed from there, so a
+long record is walked once however many chunks it comes in.  Whole records
+are handed out in batches for Decoder.aiter_decode() to decode, while a
+trailing partial record waits in the buffer for more data.
+"""
+from typing import AsyncIterator, Generator, Tuple
+
+from .constants import GeometryType
+from .context import BufferDecoderContext, CHUNK_SIZE
+from .protobuf import read_varint64, skip_varints
+from .read_buffer import MULTI_TYPES, read_header
+
+# walks yield a lower bound of the bytes they are short of whenever the data
+# runs out, and go on once the context has been reset() over more data
+Walk = Generator[int, None, None]
+
+
+def retry(ta_struct : BufferDecoderContext, func, *args):
+    """
+    Calls func(ta_struct, *args) from the cursor again until the data it
+    reads has arrived
+    """
+    while True:
+        # taken again after a yield, the buffer may have been shifted
+        pos = ta_struct.pos
+        try:
+            return func(ta_struct, *args)
+        except EOFError:
+            ta_struct.pos = pos
+            yield 1
+
+def walk_varints(ta_struct : BufferDecoderContext, count : int) -> Walk:
+    # skip_varints() leaves the cursor at the end of the data, with the
+    # number of varints it didn't get to
+    while True:
+        try:
+            skip_varints(ta_struct, count)
+            return
+        except EOFError as error:
+            count = error.missing
+            yield count
+
+def walk_line(ta_struct : BufferDecoderContext) -> Walk:
+    npoints = yield from retry(ta_struct, read_varint64)
+    yield from walk_varints(ta_struct, npoints * ta_struct.ndims)
+
+def walk_polygon(ta_struct : BufferDecoderContext) -> Walk:
+    nrings = yield from retry(ta_struct, read_varint64)
+    for _ring in range(0, nrings):
+        yield from walk_line(ta_struct)
+
+def walk_body(ta_struct : BufferDecoderContext) -> Walk:
+    """
+    Suspendable counterpart of read_buffer.walk_objects()
+    """
+    _type = ta_struct.type
+    ndims = ta_struct.ndims
+    if ta_struct.is_empty:
+        return
+    if _type == GeometryType.POINT:
+        yield from walk_varints(ta_struct, ndims)
+    elif _type == GeometryType.LINESTRING:
+        yield from walk_line(ta_struct)
+    elif _type == GeometryType.POLYGON:
+        yield from walk_polygon(ta_struct)
+    elif _type in MULTI_TYPES:
+        ngeoms = yield from retry(ta_struct, read_varint64)
+        if ta_struct.has_idlist:
+            yield from walk_varints(ta_struct, ngeoms)
+        if _type == GeometryType.MULTIPOINT:
+            yield from walk_varints(ta_struct, ngeoms * ndims)
+        elif _type == GeometryType.MULTILINESTRING:
+            for _i in range(0, ngeoms):
+                yield from walk_line(ta_struct)
+        elif _type == GeometryType.MULTIPOLYGON:
+            for _i in range(0, ngeoms):
+                yield from walk_polygon(ta_struct)
+        else:
+            header = ta_struct.save_header()
+            for _i in range(0, ngeoms):
+                yield from walk_record(ta_struct)
+            ta_struct.load_header(header)
+    else:
+        raise TypeError('Unknown type: %s' % _type)
+
+def walk_record(ta_struct : BufferDecoderContext) -> Walk:
+    """
+    Moves the cursor past the record starting at it: a sized record is
+    jumped over once it is all buffered, others are walked
+    """
+    yield from retry(ta_struct, read_header)
+    if ta_struct.has_size:
+        while ta_struct.record_end > ta_struct.end:
+            yield ta_struct.record_end - ta_struct.end
+        ta_struct.skip(ta_struct.record_end - ta_struct.tell())
+    else:
+        yield from walk_body(ta_struct)
+
+
+class RecordScanner:
+    """
+    Finds the whole records of a buffer that grows at the end as data
+    arrives and drops the records handed out from its start
+    """
+    def __init__(self):
+        self.ta_struct = BufferDecoderContext(b'')
+        self.walk = None            # suspended walk of the partial record
+        self.record_start = 0       # where that record started in the buffer
+
+    def scan(self, buf : bytearray, start : int = 0) -> Tuple[int, int]:
+        """
+        Finds the whole records in buf from `start` on.  A record left
+        partial by the previous scan must now start at `start`; its walk
+        resumes where it was suspended.
+
+        Returns:
+            (end, need) - the end of the last whole record, and how many bytes
+                          should be buffered before looking for the next one
+        """
+        ta_struct = self.ta_struct
+        walk = self.walk
+        if walk is None:
+            ta_struct.reset(buf, start)
+        else:
+            # the bytes before the record were dropped
+            shift = start - self.record_start
+            ta_struct.reset(buf, ta_struct.pos + shift)
+            ta_struct.record_end += shift
+        end = start
+        try:
+            while True:
+                if walk is None:
+                    if ta_struct.at_eof():
+                        return end, len(buf) + 1
+                    walk = walk_record(ta_struct)
+                missing = next(walk, None)
+                if missing is not None:
+                    return end, len(buf) + missing
+                walk = None
+                end = ta_struct.tell()
+        finally:
+            self.walk = walk
+            self.record_start = end
+            # the buffer can only be resized once it isn't exported
+            ta_struct.release()
+
+
+def complete_records(buf : bytearray, start : int = 0) -> Tuple[int, int]:
+    """
+    Finds the whole records in buf from `start` on, see RecordScanner.scan()
+    """
+    return RecordScanner().scan(buf, start)
+
+async def aiter_records(reader, chunk_size : int = CHUNK_SIZE) -> AsyncIterator[Tuple[int, bytes]]:
+    """
+    Yields (offset, data) batches of whole records read from an
+    asyncio.StreamReader or any object with an async read(n), `offset`
+    being the stream position of the batch
+    """
+    scanner = RecordScanner()
+    buf = bytearray()
+    offset = 0          # stream position of buf[0]
+    need = 1
+    while True:
+        chunk = await reader.read(chunk_size)
+        if chunk:
+            buf += chunk
+            if len(buf) < need:
+                continue
+        end, need = scanner.scan(buf)
+        if end:
+            data = bytes(buf[:end])
+            del buf[:end]
+            need -= end
+            yield offset, data
+            offset += end
+        if not chunk:
+            if buf:
+                raise EOFError("Unexpected end of TWKB data")
+            return
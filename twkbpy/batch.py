@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+Batch decoding of TWKB blob columns, such as the result of ST_AsTWKB.
+
+Blobs come from a DB-API cursor (read with fetchmany), a list, a pandas
+Series or any other iterable, either raw (bytes, bytearray, memoryview),
+base64 encoded or as PostgreSQL '\\x' hex text.  The whole batch goes
+through one Decoder and one decoder context, which is pointed at each blob
+in turn (BufferDecoderContext.reset): no Twkb, BytesIO stream, Decoder or
+context is created per row.
+"""
+from binascii import a2b_base64
+from typing import Iterator, List, Optional, Union
+
+from .columnar import GeometryColumns, decode_columns
+from .context import BUFFER_TYPES
+from .decode import Decoder, thread_decoder
+from .read_buffer import GeometryShape
+
+FETCH_SIZE = 10000
+
+def iter_rows(source, fetch_size : int = FETCH_SIZE) -> Iterator:
+    """
+    Rows of a DB-API cursor, fetched `fetch_size` at a time, or the items
+    of any other iterable
+    """
+    if hasattr(source, 'fetchmany'):
+        while True:
+            rows = source.fetchmany(fetch_size)
+            if not rows:
+                return
+            yield from rows
+    else:
+        yield from source
+
+def to_blob(value):
+    """
+    TWKB bytes of one column value; None for SQL NULL (or a pandas NaN)
+    """
+    if value is None or isinstance(value, BUFFER_TYPES):
+        return value
+    if isinstance(value, str):
+        if value.startswith('\\x'):
+            return bytes.fromhex(value[2:])
+        return a2b_base64(value)
+    if isinstance(value, float) and value != value:
+        return None
+    raise TypeError(f"Can't decode a {type(value).__name__} as TWKB")
+
+def iter_blobs(source, column : Optional[int] = None, fetch_size : int = FETCH_SIZE) -> Iterator:
+    """
+    TWKB blobs of a cursor or iterable.  Rows of a cursor are tuples from
+    which `column` (default 0) is taken; items of other iterables are the
+    values themselves unless a column is given.
+    """
+    if column is None and hasattr(source, 'fetchmany'):
+        column = 0
+    for row in iter_rows(source, fetch_size):
+        value = row if column is None else row[column]
+        if value is None or isinstance(value, BUFFER_TYPES):
+            yield value
+        else:
+            yield to_blob(value)
+
+def _not_null(blobs : Iterator) -> Iterator:
+    for row, blob in enumerate(blobs):
+        if blob is None:
+            raise ValueError(f"Row {row} is NULL; GeometryColumns has no null geometries")
+        yield blob
+
+def decode_blobs(source, column : Optional[int] = None, columnar : bool = False,
+                 fetch_size : int = FETCH_SIZE,
+                 decoder : Optional[Decoder] = None) -> Union[List[Optional[GeometryShape]], GeometryColumns]:
+    """
+    Decodes a column of TWKB blobs, one record per row
+
+    column     - index of the TWKB column in cursor rows (or row tuples)
+    columnar   - return a GeometryColumns instead of a list of shapes
+    fetch_size - rows fetched at a time from a cursor
+    decoder    - Decoder to use, e.g. with use_numpy or stats set; see
+                 decode_columns() for what applies to a GeometryColumns
+
+    Returns:
+        list - one shape per row, None for NULL rows; or a GeometryColumns
+               with one row per blob when columnar is set
+    """
+    blobs = iter_blobs(source, column, fetch_size)
+    if columnar:
+        return decode_columns(_not_null(blobs), decoder=decoder)
+    decoder = decoder or thread_decoder()
+    read_record = decoder.read_record
+    ta_struct = decoder.create_context(b'')
+    shapes = []
+    try:
+        for blob in blobs:
+            if blob is None:
+                shapes.append(None)
+            else:
+                ta_struct.reset(blob)
+                shapes.append(read_record(ta_struct))
+    finally:
+        ta_struct.release()
+    return shapes
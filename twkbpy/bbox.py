@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+from typing import List, Optional, Sequence
+
+INTERSECTS = 'intersects'
+WITHIN = 'within'
+
+def bbox_matches(bbox : Sequence[float], ndims : int, window : Sequence[float], predicate : str = INTERSECTS) -> bool:
+    """
+    Tests a record bbox laid out as [ min_0 .. min_n, max_0 .. max_n ]
+    against a 2D query window (xmin, ymin, xmax, ymax)
+
+    predicate - 'intersects' (the boxes touch or overlap) or 'within' (the
+                record bbox lies inside the window)
+    """
+    xmin, ymin, xmax, ymax = bbox[0], bbox[1], bbox[ndims], bbox[ndims + 1]
+    qxmin, qymin, qxmax, qymax = window
+    if predicate == INTERSECTS:
+        return xmin <= qxmax and xmax >= qxmin and ymin <= qymax and ymax >= qymin
+    if predicate == WITHIN:
+        return xmin >= qxmin and xmax <= qxmax and ymin >= qymin and ymax <= qymax
+    raise ValueError(f"Unsupported bbox predicate {predicate}")
+
+def union(a : Optional[List[float]], b : Optional[List[float]]) -> Optional[List[float]]:
+    """
+    Union of two 2D boxes (xmin, ymin, xmax, ymax), either of which may be None
+    """
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return [ min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]) ]
+
+def shape_extent(shape, ndims : int) -> Optional[List[float]]:
+    """
+    2D extent (xmin, ymin, xmax, ymax) computed from the decoded coordinates
+    of a GeometryShape, or None when it has none
+    """
+    result = None
+    stack = [ shape ]
+    while stack:
+        geom = stack.pop()
+        coords = getattr(geom, 'coords', None)
+        if coords is None:
+            # collection
+            stack.extend(getattr(geom, 'geoms', None) or [])
+            continue
+        if len(coords) == 0:
+            continue
+        if getattr(coords, 'ndim', 1) == 2:
+            xs, ys = coords[:, 0], coords[:, 1]
+        else:
+            xs, ys = coords[0::ndims], coords[1::ndims]
+        result = union(result, [ min(xs), min(ys), max(xs), max(ys) ])
+    return result
@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+import math
+from array import array
+from time import perf_counter
+from typing import List, Optional
+
+from .constants import GeometryType
+from .context import DecoderContext, BUFFER_TYPES, create_context
+from .decode import Decoder
+from .protobuf import read_varint64
+from .read_buffer import GeometryShape, read_header, read_id_list, read_pa, read_part, read_rings, scaled_bbox
+
+NAN_BBOX = [ math.nan ] * 4
+
+class GeometryColumns:
+    """
+    Struct-of-arrays container for many decoded geometries.
+
+    Every geometry is stored with the same nesting, geometry -> parts ->
+    rings -> vertices, whatever its type: a point is one part with one ring
+    of one vertex, a linestring one part with one ring, a polygon one part
+    with several rings and multi-geometries one part per member.  Members
+    of a collection become parts of their own type (`part_types`); an
+    empty member is kept as a part without rings of the member's type.
+
+    All arrays are flat `array` buffers so the container pickles as a few
+    byte strings, and the offsets are int64 like Arrow's large lists:
+    to_arrow() hands them to pyarrow without copying.
+    """
+    def __init__(self, ndims : Optional[int] = None):
+        self.ndims = ndims
+        self.coords = array('d')                # interleaved, ndims per vertex
+        self.geometry_offsets = array('q', [ 0 ])   # geometry -> first part
+        self.part_offsets = array('q', [ 0 ])       # part -> first ring
+        self.ring_offsets = array('q', [ 0 ])       # ring -> first vertex
+        self.types = array('B')                 # GeometryType value per geometry
+        self.part_types = array('B')            # GeometryType value per part
+        self.part_ids = array('q')              # id per part, see has_ids
+        self.has_ids = array('B')               # 1 when the record had an id list
+        self.bboxes = array('d')                # xmin, ymin, xmax, ymax per geometry, NaN if unknown
+        self.record_offsets = array('q')        # byte offset of the record, -1 if unknown
+
+    def __len__(self) -> int:
+        return len(self.types)
+
+    def append_shape(self, shape : GeometryShape, offset : int = -1):
+        shape = shape.dequantize()
+        ndims = shape.ndims
+        if self.ndims is None:
+            self.ndims = ndims
+        elif ndims != self.ndims:
+            raise ValueError(f"Can't mix {ndims}D geometries into {self.ndims}D columns")
+        ids = getattr(shape, 'ids', None) or []
+        self._append_parts(shape, ids[0] if ids else 0, ids)
+        self.geometry_offsets.append(len(self.part_types))
+        self.types.append(shape.type.value)
+        self.has_ids.append(1 if ids else 0)
+        bbox = shape.bbox
+        self.bboxes.extend(NAN_BBOX if bbox is None else [ bbox[0], bbox[1], bbox[ndims], bbox[ndims + 1] ])
+        self.record_offsets.append(offset)
+
+    def read_record(self, ta_struct : DecoderContext, offset : int = -1):
+        """
+        Decodes the next record of the context straight into the columns,
+        without building a GeometryShape.  The context's transform, simplify
+        and stats apply; its DecoderStats hook gets the columns in place of
+        a shape.
+        """
+        # vertices go straight into self.coords
+        ta_struct.use_numpy = False
+        ta_struct.coord_type = 'd'
+        stats = ta_struct.stats
+        if stats is not None:
+            start = ta_struct.tell()
+            started = perf_counter()
+        read_header(ta_struct)
+        ndims = ta_struct.ndims
+        if self.ndims is None:
+            self.ndims = ndims
+        elif ndims != self.ndims:
+            raise ValueError(f"Can't mix {ndims}D geometries into {self.ndims}D columns")
+        _type = ta_struct.type
+        bbox = scaled_bbox(ta_struct)
+        if bbox is not None and ta_struct.transform is not None:
+            bbox = ta_struct.transform.transform_bbox(bbox, ndims, ta_struct.has_z)
+        if stats is not None:
+            parsed = perf_counter()
+            stats.add_time('header', parsed - started)
+            stats.add_geometry(_type)
+        ids = self._read_parts(ta_struct, _type, 0)
+        self.geometry_offsets.append(len(self.part_types))
+        self.types.append(_type.value)
+        self.has_ids.append(1 if ids else 0)
+        self.bboxes.extend(NAN_BBOX if bbox is None else [ bbox[0], bbox[1], bbox[ndims], bbox[ndims + 1] ])
+        self.record_offsets.append(offset)
+        if stats is not None:
+            stats.add_time('body', perf_counter() - parsed)
+            stats.add_record(ta_struct.tell() - start, self)
+
+    def _read_parts(self, ta_struct : DecoderContext, _type : GeometryType, gid : int) -> List[int]:
+        """
+        Columnar counterpart of read_objects(); returns the id list
+        """
+        ids : List[int] = []
+        if ta_struct.is_empty:
+            return ids
+        ndims = self.ndims
+        refpoint = ta_struct.refpoint
+        for i in range(0, ndims):
+            refpoint[i] = 0
+
+        if _type == GeometryType.POINT:
+            read_pa(ta_struct, 1, self.coords)
+            self.ring_offsets.append(len(self.coords) // ndims)
+            self._end_part(_type, gid)
+        elif _type == GeometryType.LINESTRING:
+            read_part(ta_struct, read_varint64(ta_struct), self.coords)
+            self.ring_offsets.append(len(self.coords) // ndims)
+            self._end_part(_type, gid)
+        elif _type == GeometryType.POLYGON:
+            read_rings(ta_struct, self.coords, self.ring_offsets)
+            self._end_part(_type, gid)
+        else:
+            ngeoms = read_varint64(ta_struct)
+            if ta_struct.has_idlist:
+                ids = read_id_list(ta_struct, ngeoms)
+            for i in range(0, ngeoms):
+                part_id = ids[i] if ids else gid
+                if _type == GeometryType.MULTIPOINT:
+                    read_pa(ta_struct, 1, self.coords)
+                    self.ring_offsets.append(len(self.coords) // ndims)
+                    self._end_part(GeometryType.POINT, part_id)
+                elif _type == GeometryType.MULTILINESTRING:
+                    read_part(ta_struct, read_varint64(ta_struct), self.coords)
+                    self.ring_offsets.append(len(self.coords) // ndims)
+                    self._end_part(GeometryType.LINESTRING, part_id)
+                elif _type == GeometryType.MULTIPOLYGON:
+                    read_rings(ta_struct, self.coords, self.ring_offsets)
+                    self._end_part(GeometryType.POLYGON, part_id)
+                else:
+                    read_header(ta_struct)
+                    if ta_struct.ndims != ndims:
+                        raise ValueError(f"Can't mix {ta_struct.ndims}D geometries into {ndims}D columns")
+                    member_type = ta_struct.type
+                    if ta_struct.stats is not None:
+                        ta_struct.stats.add_geometry(member_type)
+                    nparts = len(self.part_types)
+                    self._read_parts(ta_struct, member_type, part_id)
+                    if len(self.part_types) == nparts:
+                        self._end_part(member_type, part_id)
+        return ids
+
+    def _append_parts(self, shape : GeometryShape, gid : int, ids):
+        t = shape.type
+        if t == GeometryType.COLLECTION:
+            geoms = shape.geoms
+            for i in range(0, len(geoms)):
+                nparts = len(self.part_types)
+                self._append_parts(geoms[i], ids[i] if ids else gid, None)
+                if len(self.part_types) == nparts:
+                    self._end_part(geoms[i].type, ids[i] if ids else gid)
+            return
+        if shape.coords is None:
+            # empty geometry, no parts as in _read_parts()
+            return
+
+        vertex_base = self._append_coords(shape.coords)
+        ring_base = len(self.ring_offsets) - 1
+        if t == GeometryType.POINT or t == GeometryType.LINESTRING:
+            self.ring_offsets.append(len(self.coords) // self.ndims)
+            self._end_part(t, gid)
+        elif t == GeometryType.POLYGON:
+            self._append_offsets(self.ring_offsets, shape.ring_offsets, vertex_base)
+            self._end_part(t, gid)
+        elif t == GeometryType.MULTIPOINT:
+            npoints = len(self.coords) // self.ndims - vertex_base
+            for i in range(0, npoints):
+                self.ring_offsets.append(vertex_base + i + 1)
+                self._end_part(GeometryType.POINT, ids[i] if ids else gid)
+        elif t == GeometryType.MULTILINESTRING:
+            parts = shape.part_offsets
+            for i in range(0, len(parts) - 1):
+                self.ring_offsets.append(vertex_base + parts[i + 1])
+                self._end_part(GeometryType.LINESTRING, ids[i] if ids else gid)
+        else:
+            self._append_offsets(self.ring_offsets, shape.ring_offsets, vertex_base)
+            parts = shape.part_offsets
+            for i in range(0, len(parts) - 1):
+                self.part_offsets.append(ring_base + parts[i + 1])
+                self.part_types.append(GeometryType.POLYGON.value)
+                self.part_ids.append(ids[i] if ids else gid)
+
+    def _append_coords(self, coords) -> int:
+        """
+        Appends a shape's vertex buffer, returning the index of its first
+        vertex in the columns
+        """
+        base = len(self.coords) // self.ndims
+        if getattr(coords, 'ndim', 1) == 2:
+            self.coords.frombytes(coords.astype('float64').tobytes())
+        else:
+            self.coords.extend(coords)
+        return base
+
+    @staticmethod
+    def _append_offsets(target : array, offsets, base : int):
+        """
+        Appends offsets[1:] shifted by `base`
+        """
+        for i in range(1, len(offsets)):
+            target.append(base + offsets[i])
+
+    def _end_part(self, _type : GeometryType, gid : int):
+        self.part_offsets.append(len(self.ring_offsets) - 1)
+        self.part_types.append(_type.value)
+        self.part_ids.append(gid)
+
+    def to_arrow(self):
+        """
+        The columns as a pyarrow Table, sharing this object's buffers.  The
+        `geometry` column nests geometry -> parts -> rings -> vertices with
+        interleaved coordinates, the GeoArrow multipolygon layout.
+        """
+        import pyarrow as pa
+
+        def buffer(values : array):
+            return pa.py_buffer(memoryview(values))
+
+        def offsets(values : array):
+            return pa.Array.from_buffers(pa.int64(), len(values), [ None, buffer(values) ])
+
+        ndims = self.ndims or 2
+        coords = pa.Array.from_buffers(pa.float64(), len(self.coords), [ None, buffer(self.coords) ])
+        vertices = pa.FixedSizeListArray.from_arrays(coords, ndims)
+        rings = pa.LargeListArray.from_arrays(offsets(self.ring_offsets), vertices)
+        parts = pa.LargeListArray.from_arrays(offsets(self.part_offsets), rings)
+        geometry = pa.LargeListArray.from_arrays(offsets(self.geometry_offsets), parts)
+        n = len(self)
+        bboxes = pa.Array.from_buffers(pa.float64(), len(self.bboxes), [ None, buffer(self.bboxes) ])
+        return pa.table({
+            'geometry': geometry,
+            'type': pa.Array.from_buffers(pa.uint8(), n, [ None, buffer(self.types) ]),
+            'part_types': pa.LargeListArray.from_arrays(offsets(self.geometry_offsets),
+                pa.Array.from_buffers(pa.uint8(), len(self.part_types), [ None, buffer(self.part_types) ])),
+            'part_ids': pa.LargeListArray.from_arrays(offsets(self.geometry_offsets),
+                pa.Array.from_buffers(pa.int64(), len(self.part_ids), [ None, buffer(self.part_ids) ])),
+            'bbox': pa.FixedSizeListArray.from_arrays(bboxes, 4),
+            'record_offset': pa.Array.from_buffers(pa.int64(), n, [ None, buffer(self.record_offsets) ]),
+        })
+
+
+def decode_columns(source, ndims : Optional[int] = None, decoder : Optional[Decoder] = None) -> GeometryColumns:
+    """
+    Decodes many records into one GeometryColumns.  `source` is either a
+    stream or buffer of concatenated records, or an iterable of TWKB blobs
+    (one record each).
+
+    decoder - Decoder whose transform, simplify and stats apply; the
+              columns always hold float coordinates, so its coord_type
+              must be 'd'
+    """
+    if decoder is not None and decoder.coord_type != 'd':
+        raise ValueError("GeometryColumns hold float coordinates, the decoder's coord_type must be 'd'")
+    context = create_context if decoder is None else decoder.create_context
+    columns = GeometryColumns(ndims)
+    if isinstance(source, BUFFER_TYPES) or hasattr(source, 'read'):
+        ta_struct = context(source)
+        try:
+            while not ta_struct.at_eof():
+                columns.read_record(ta_struct, ta_struct.tell())
+        finally:
+            ta_struct.release()
+    else:
+        ta_struct = context(b'')
+        try:
+            for blob in source:
+                ta_struct.reset(blob)
+                columns.read_record(ta_struct)
+        finally:
+            ta_struct.release()
+    return columns
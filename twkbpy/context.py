@@ -1,15 +1,42 @@
 
+import io
+import mmap
 from typing import Optional,List
 from .constants import GeometryType
 
+CHUNK_SIZE = 64 * 1024
+
+# longest possible varint64 encoding
+MAX_VARINT_LEN = 10
+
+# per-record header state, see save_header()
+HEADER_FIELDS = ('type', 'ndims', 'factors', 'bbox', 'size', 'record_end', 'precision_xy', 'precision_z',
+                 'precision_m', 'has_bbox', 'has_size', 'has_idlist', 'has_z', 'has_m', 'is_empty',
+                 'use_numpy', 'coord_type', 'transform', 'simplify', 'stats')
+
 class DecoderContext:
+    """
+    Decoder state over a file-like stream.
+
+    Bytes are pulled from the stream in CHUNK_SIZE blocks into `buf` and
+    consumed through the integer cursor `pos`, so the hot decode loops never
+    make a Python-level call per byte.
+    """
     def __init__(self, stream):
         self.stream = stream
+        self.buf = b''
+        self.pos : int = 0
+        self.end : int = 0
+        self.offset : int = 0     # stream position of buf[0]
         self.refpoint : List[float] = [ 0.0 ]*4
         self.size = 0
+        self.record_end : int = 0     # tell() at the end of a sized record
         self.ndims : int = 2
         self.type : Optional[GeometryType] = None
         self.factors : List[float] = []
+        self.precision_xy : int = 0
+        self.precision_z : int = 0
+        self.precision_m : int = 0
         self.bbox : Optional[List[int]] = None
         self.has_bbox = False
         self.has_size = False
@@ -18,14 +45,219 @@ class DecoderContext:
         self.has_m = False
         self.is_empty = True
         self.idlist = None
+        self.use_numpy = False
+        self.coord_type = 'd'       # array typecode of decoded coordinates
+        self.transform = None       # CoordTransform applied by read_pa
+        self.simplify = None        # Simplify applied to lines and rings
+        self.lazy = False
+        self.stats = None         # DecoderStats, when profiling
+
+    def fill(self, nbytes : int = MAX_VARINT_LEN) -> bool:
+        """
+        Make sure at least `nbytes` unread bytes are buffered, reading more
+        from the stream when needed.  Returns False if the stream had no
+        more data to add.
+        """
+        avail = self.end - self.pos
+        if avail >= nbytes:
+            return True
+        chunks = [ self.buf[self.pos:self.end] ]
+        while avail < nbytes:
+            chunk = self.stream.read(max(CHUNK_SIZE, nbytes - avail))
+            if not chunk:
+                break
+            chunks.append(bytes(chunk))
+            avail += len(chunk)
+        if len(chunks) == 1:
+            return False
+        self.offset += self.pos
+        self.buf = b''.join(chunks)
+        self.pos = 0
+        self.end = len(self.buf)
+        return True
+
+    def read(self, nbytes : int):
+        """
+        Consumes and returns the next `nbytes` raw bytes
+        """
+        self.fill(nbytes)
+        if self.end - self.pos < nbytes:
+            raise EOFError("Unexpected end of TWKB data")
+        data = self.buf[self.pos:self.pos + nbytes]
+        self.pos += nbytes
+        return data
+
+    def skip(self, nbytes : int):
+        """
+        Consumes `nbytes` without keeping them
+        """
+        avail = self.end - self.pos
+        while avail < nbytes:
+            # drop the whole buffer and carry on with the next chunk
+            nbytes -= avail
+            self.offset += self.end
+            self.buf = b''
+            self.pos = self.end = 0
+            if not self.fill(min(nbytes, CHUNK_SIZE)):
+                raise EOFError("Unexpected end of TWKB data")
+            avail = self.end - self.pos
+        self.pos += nbytes
+
+    def save_header(self) -> dict:
+        """
+        Snapshot of the header fields parsed for the current record
+        """
+        return { name: getattr(self, name) for name in HEADER_FIELDS }
+
+    def load_header(self, header : dict):
+        for name, value in header.items():
+            setattr(self, name, value)
+
+    def tell(self) -> int:
+        """
+        Offset of the cursor in the source: an index into the buffer, or the
+        number of bytes consumed since the stream was handed over
+        """
+        return self.offset + self.pos
+
+    def at_eof(self) -> bool:
+        return self.pos >= self.end and not self.fill(1)
+
+    def release(self):
+        """
+        Give back read-ahead bytes to a seekable stream so that it is left
+        positioned right after the last decoded byte.
+        """
+        unread = self.end - self.pos
+        if unread and is_seekable(self.stream):
+            self.stream.seek(-unread, io.SEEK_CUR)
+            self.offset += self.end
+            self.buf = b''
+            self.pos = self.end = 0
 
     def byte_gen(self):
         while True:
             b8 = self.stream.read(1)
             if b8 == b'':
                 break
-            print("read byte",b8)
-            yield b8 & 0xff
+            yield b8[0]
 
     def next(self) -> int:
-        return self.stream.read(1)[0] & 0xff
\ No newline at end of file
+        if self.pos >= self.end and not self.fill(1):
+            raise EOFError("Unexpected end of TWKB data")
+        b = self.buf[self.pos]
+        self.pos += 1
+        return b
+
+
+class BufferDecoderContext(DecoderContext):
+    """
+    Decoder state over an in-memory buffer (bytes, bytearray, memoryview or
+    mmap).  The data is never copied; `pos` indexes straight into it.
+
+    When `stream` is given (a BytesIO whose buffer is being decoded), it is
+    moved past the consumed bytes on release().  release() also drops the
+    context's views so that an mmap source can be closed afterwards; for
+    the same reason read() returns copies of BytesIO and mmap data, which
+    lazy shapes keep.
+    """
+    def __init__(self, buf, start : int = 0, stream = None):
+        super().__init__(stream)
+        self.view = memoryview(buf)
+        self.buf = self.view.cast('B')
+        self.pos = start
+        self.end = len(self.buf)
+
+    def reset(self, buf, start : int = 0):
+        """
+        Points the context at another buffer, so that a batch of blobs can
+        be decoded without creating a context per blob
+        """
+        self.buf.release()
+        self.view.release()
+        self.view = memoryview(buf)
+        self.buf = self.view.cast('B')
+        self.pos = start
+        self.end = len(self.buf)
+
+    def fill(self, nbytes : int = MAX_VARINT_LEN) -> bool:
+        return self.pos < self.end
+
+    def read(self, nbytes : int):
+        data = super().read(nbytes)
+        if self.stream is not None or isinstance(self.view.obj, mmap.mmap):
+            # don't keep the BytesIO buffer or the mmap exported after
+            # release()
+            data = bytes(data)
+        return data
+
+    def skip(self, nbytes : int):
+        if self.end - self.pos < nbytes:
+            raise EOFError("Unexpected end of TWKB data")
+        self.pos += nbytes
+
+    def release(self):
+        if self.stream is not None:
+            self.stream.seek(self.pos)
+            self.stream = None
+        self.buf.release()
+        self.view.release()
+
+
+BUFFER_TYPES = (bytes, bytearray, memoryview, mmap.mmap)
+
+def is_seekable(stream) -> bool:
+    return hasattr(stream, 'seekable') and stream.seekable()
+
+def read_exactly(stream, nbytes : int) -> bytes:
+    """
+    Reads `nbytes` from a stream that may return short reads (pipes, sockets)
+    """
+    chunks = []
+    while nbytes > 0:
+        chunk = stream.read(nbytes)
+        if not chunk:
+            raise EOFError("Unexpected end of TWKB data")
+        chunks.append(bytes(chunk))
+        nbytes -= len(chunk)
+    return b''.join(chunks)
+
+def read_sized_record(stream) -> bytes:
+    """
+    Reads one record from a stream that can't be seeked back, without
+    reading past its end: the header is read up to the size field, which
+    gives the length of the rest.  Records without a size header can't be
+    delimited that way and raise ValueError.
+
+    Returns:
+        bytes - the whole record
+    """
+    head = read_exactly(stream, 2)
+    flags = head[1]
+    if flags & 0x08:
+        head += read_exactly(stream, 1)
+    if not flags & 0x02:
+        raise ValueError("decode() can't find the end of a record without a size header on a "
+                         "non-seekable stream; use iter_decode() to read such streams")
+    size = shift = 0
+    while True:
+        b = read_exactly(stream, 1)
+        head += b
+        size |= (b[0] & 0x7f) << shift
+        if not b[0] & 0x80:
+            break
+        shift += 7
+    return head + read_exactly(stream, size)
+
+def create_context(source) -> DecoderContext:
+    """
+    Picks the fastest decoder context for `source`: buffer-like objects are
+    decoded in place, anything else is treated as a file-like stream.
+    """
+    if isinstance(source, DecoderContext):
+        return source
+    if isinstance(source, BUFFER_TYPES):
+        return BufferDecoderContext(source)
+    if isinstance(source, io.BytesIO):
+        return BufferDecoderContext(source.getbuffer(), source.tell(), source)
+    return DecoderContext(source)
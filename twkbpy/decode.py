@@ -1,22 +1,261 @@
 # -*- coding: utf-8 -*-
+import asyncio
+import threading
+from concurrent.futures import Executor
+from time import perf_counter
+from typing import AsyncIterator, Iterator, List, Optional, Sequence, TextIO
 
 from .geojson_transforms import JsonFormatter
-from .read_buffer import GeometryShape, read_buffer
-from .context import DecoderContext
+from .geojson_writer import GeoJsonWriter
+from .wkb import to_wkb, to_ewkb
+from .read_buffer import GeometryShape, read_header, read_body, skip_body, scaled_bbox
+from .bbox import bbox_matches, INTERSECTS
+from .aio import aiter_records
+from .context import DecoderContext, BufferDecoderContext, BUFFER_TYPES, create_context, CHUNK_SIZE, \
+    is_seekable, read_sized_record
+from .stats import DecoderStats
+from .transform import CoordTransform
+from .simplify import Simplify
+
+# array typecodes of the coordinate types a Decoder can return
+COORD_TYPES = ('d', 'q', 'i')
 
 class Decoder:
-    def __init__(self):
-        pass
+    def __init__(self, use_numpy : bool = False, lazy : bool = False, stats : Optional[DecoderStats] = None,
+                 coord_type : str = 'd', transform : Optional[CoordTransform] = None,
+                 simplify : Optional[Simplify] = None):
+        """
+        use_numpy  - return coordinates as (n, ndims) numpy arrays instead of
+                     flat arrays
+        lazy       - for records with a size header, only parse the header
+                     and decode the body on first access (see
+                     LazyGeometryShape)
+        stats      - DecoderStats collecting stage timings and counters
+        coord_type - 'd' for float coordinates, or 'q' (int64) / 'i' (int32)
+                     to keep the quantized integers of the record and skip
+                     the division by 10^precision; the shapes' `scale` then
+                     holds the factors and dequantize() makes float copies.
+                     'i' raises OverflowError for values beyond int32.
+        transform  - CoordTransform applied to the coordinates as they are
+                     decoded; needs float coordinates
+        simplify   - Simplify thinning out lines and rings as they are
+                     decoded, for a tolerance or a target zoom level
+
+        decode() points one context of the decoder's own at every buffer it
+        is given instead of setting up a new one, so a long-lived Decoder
+        is cheap per record but must stay on one thread; thread_decoder()
+        keeps one per thread.
+        """
+        self.use_numpy = use_numpy
+        self.lazy = lazy
+        self.stats = stats
+        if coord_type not in COORD_TYPES:
+            raise ValueError(f"Unknown coord_type {coord_type!r}, expected one of {COORD_TYPES}")
+        if transform is not None and coord_type != 'd':
+            raise ValueError("A transform needs float coordinates (coord_type 'd')")
+        self.coord_type = coord_type
+        self.transform = transform
+        self.simplify = simplify
+        self._context : Optional[BufferDecoderContext] = None
+
+    def __getstate__(self) -> dict:
+        # the reused context holds views that can't be pickled, e.g. when
+        # aiter_decode() hands batches to a process pool
+        state = self.__dict__.copy()
+        state['_context'] = None
+        return state
+
+    def create_context(self, stream) -> DecoderContext:
+        ta_struct = create_context(stream)
+        ta_struct.use_numpy = self.use_numpy
+        ta_struct.lazy = self.lazy
+        ta_struct.stats = self.stats
+        ta_struct.coord_type = self.coord_type
+        ta_struct.transform = self.transform
+        ta_struct.simplify = self.simplify
+        return ta_struct
+
+    def buffer_context(self, buf) -> BufferDecoderContext:
+        """
+        The decoder's own context, reset in place to the start of `buf`.
+        decode() takes it from the decoder until the record is read, so
+        that a nested decode() gets a fresh one.
+        """
+        ta_struct = self._context
+        if ta_struct is None:
+            ta_struct = BufferDecoderContext(buf)
+        else:
+            self._context = None
+            ta_struct.reset(buf)
+        ta_struct.use_numpy = self.use_numpy
+        ta_struct.lazy = self.lazy
+        ta_struct.stats = self.stats
+        ta_struct.coord_type = self.coord_type
+        ta_struct.transform = self.transform
+        ta_struct.simplify = self.simplify
+        return ta_struct
+
+    @staticmethod
+    def read_record(ta_struct : DecoderContext, bbox : Optional[Sequence[float]] = None,
+                    predicate : str = INTERSECTS) -> Optional[GeometryShape]:
+        """
+        Reads one record, or skips over its body and returns None when its
+        header bbox does not match the query window.  Records without a
+        header bbox always match.
+        """
+        if ta_struct.stats is not None:
+            return Decoder.read_record_profiled(ta_struct, bbox, predicate)
+        read_header(ta_struct)
+        if bbox is not None and ta_struct.has_bbox:
+            if not bbox_matches(scaled_bbox(ta_struct), ta_struct.ndims, bbox, predicate):
+                skip_body(ta_struct)
+                return None
+        return read_body(ta_struct)
 
-    def decode(self, stream):
-        #print("decode")
-        ta_struct = DecoderContext(stream)
-        shape = read_buffer(ta_struct)
+    @staticmethod
+    def read_record_profiled(ta_struct : DecoderContext, bbox : Optional[Sequence[float]] = None,
+                             predicate : str = INTERSECTS) -> Optional[GeometryShape]:
+        """
+        read_record() that reports to the context's DecoderStats
+        """
+        stats = ta_struct.stats
+        offset = ta_struct.tell()
+        started = perf_counter()
+        read_header(ta_struct)
+        parsed = perf_counter()
+        stats.add_time('header', parsed - started)
+        shape = None
+        if bbox is not None and ta_struct.has_bbox and \
+                not bbox_matches(scaled_bbox(ta_struct), ta_struct.ndims, bbox, predicate):
+            skip_body(ta_struct)
+        else:
+            shape = read_body(ta_struct)
+            stats.add_time('body', perf_counter() - parsed)
+        stats.add_record(ta_struct.tell() - offset, shape)
         return shape
 
+    def decode(self, stream, bbox : Optional[Sequence[float]] = None, predicate : str = INTERSECTS):
+        """
+        Decodes one geometry from a file-like stream or from a bytes-like
+        buffer (bytes, bytearray, memoryview, mmap)
+
+        bbox      - optional (xmin, ymin, xmax, ymax) query window; None is
+                    returned when the record's header bbox misses it
+        predicate - 'intersects' or 'within'
+
+        A stream that can't be seeked back (pipe, socket, stdin) is left
+        right after the record too, which needs a size header; read streams
+        of unsized records with iter_decode().
+        """
+        if not isinstance(stream, BUFFER_TYPES + (DecoderContext,)) and not is_seekable(stream):
+            stream = read_sized_record(stream)
+        if isinstance(stream, BUFFER_TYPES):
+            ta_struct = self.buffer_context(stream)
+            try:
+                return self.read_record(ta_struct, bbox, predicate)
+            finally:
+                ta_struct.release()
+                self._context = ta_struct
+        ta_struct = self.create_context(stream)
+        try:
+            shape = self.read_record(ta_struct, bbox, predicate)
+        finally:
+            ta_struct.release()
+        return shape
+
+    def iter_decode(self, stream, bbox : Optional[Sequence[float]] = None,
+                    predicate : str = INTERSECTS) -> Iterator[GeometryShape]:
+        """
+        Decodes consecutive TWKB records until the end of the stream or
+        buffer, yielding one geometry per record.  A single context is used
+        for the whole run so memory stays bounded by the read-ahead chunk.
+
+        With a bbox query window only matching records are yielded; the
+        bodies of the others are skipped using their size header.
+
+        Each shape gets an `offset` attribute holding the position of its
+        first byte in the source.
+        """
+        ta_struct = self.create_context(stream)
+        try:
+            while not ta_struct.at_eof():
+                offset = ta_struct.tell()
+                shape = self.read_record(ta_struct, bbox, predicate)
+                if shape is not None:
+                    shape.offset = offset
+                    yield shape
+        finally:
+            ta_struct.release()
+
+    def decode_batch(self, data, offset : int = 0, bbox : Optional[Sequence[float]] = None,
+                     predicate : str = INTERSECTS) -> List[GeometryShape]:
+        """
+        Decodes every record of a buffer into a list, with shape offsets
+        counted from `offset`
+        """
+        shapes = list(self.iter_decode(data, bbox, predicate))
+        for shape in shapes:
+            shape.offset += offset
+        return shapes
+
+    async def aiter_decode(self, reader, bbox : Optional[Sequence[float]] = None, predicate : str = INTERSECTS,
+                           executor : Optional[Executor] = None,
+                           chunk_size : int = CHUNK_SIZE) -> AsyncIterator[GeometryShape]:
+        """
+        Decodes the records of an asyncio.StreamReader, or of any object
+        with an async read(n), as they arrive:
+
+            async for shape in Decoder().aiter_decode(reader):
+                ...
+
+        Records are decoded in batches, as soon as a chunk completes them;
+        a partial record only waits for more data.  Batches run on the
+        event loop, or on `executor` (a thread or process pool) to keep
+        heavy decoding off it.  Shape offsets count from the first byte
+        read.
+        """
+        loop = asyncio.get_running_loop()
+        async for offset, data in aiter_records(reader, chunk_size):
+            if executor is None:
+                shapes = self.decode_batch(data, offset, bbox, predicate)
+            else:
+                shapes = await loop.run_in_executor(executor, self.decode_batch, data, offset, bbox, predicate)
+            for shape in shapes:
+                yield shape
+
     def to_geojson(self, shape : GeometryShape):
-        fmt = JsonFormatter(shape)
-        return fmt.xform_geom(shape)
+        if self.stats is not None:
+            return self.stats.timed('geojson', JsonFormatter, shape).obj
+        return JsonFormatter(shape).obj
+
+    def to_wkb(self, shape : GeometryShape) -> bytes:
+        if self.stats is not None:
+            return self.stats.timed('wkb', to_wkb, shape)
+        return to_wkb(shape)
+
+    def to_ewkb(self, shape : GeometryShape, srid : Optional[int] = None) -> bytes:
+        if self.stats is not None:
+            return self.stats.timed('wkb', to_ewkb, shape, srid)
+        return to_ewkb(shape, srid)
+
+    def write_geojson(self, stream, fp : TextIO, seq : bool = False, rs : bool = False,
+                      bbox : Optional[Sequence[float]] = None, predicate : str = INTERSECTS,
+                      trim : bool = False) -> int:
+        """
+        Decodes every record of `stream` and streams them to the text file
+        `fp` as a GeoJSON FeatureCollection, or as newline-delimited
+        features with seq=True (see GeoJsonWriter)
+
+        Returns:
+            int - the number of features written
+        """
+        with GeoJsonWriter(fp, seq, rs, trim) as writer:
+            if self.stats is None:
+                writer.write_all(self.iter_decode(stream, bbox, predicate))
+            else:
+                for shape in self.iter_decode(stream, bbox, predicate):
+                    self.stats.timed('geojson', writer.write, shape)
+        return writer.count
 
         #for res in read_buffer(ta_struct):
         #    pass
@@ -39,3 +278,17 @@ class Decoder:
     #         'type': 'FeatureCollection',
     #         'features': features
     #     }
+
+
+_thread_decoders = threading.local()
+
+def thread_decoder() -> Decoder:
+    """
+    The calling thread's default Decoder, created on first use.  Decoders
+    reuse their context and must not be shared between threads; this keeps
+    one per thread for the module-level entry points.
+    """
+    decoder = getattr(_thread_decoders, 'decoder', None)
+    if decoder is None:
+        decoder = _thread_decoders.decoder = Decoder()
+    return decoder
@@ -0,0 +1,488 @@
+# -*- coding: utf-8 -*-
+"""
+TWKB encoder, the inverse of read_buffer.
+
+Geometries are accepted as decoded GeometryShapes, GeoJSON geometry or
+Feature dicts, or NumPy coordinate arrays (an (ndims,) array is a point,
+an (n, ndims) array a linestring; other types can be given as GeoJSON
+dicts whose coordinates are arrays).
+
+Coordinates are encoded a run at a time: each run of vertices is
+quantized, delta encoded against the running refpoint, zigzagged and
+varint packed with list-level operations, or with NumPy vector operations
+when the encoder runs with use_numpy=True.
+"""
+import math
+from array import array
+from operator import mul, sub
+from typing import Any, Iterable, Iterator, List, Optional, Sequence
+
+from .constants import GeometryType
+from .read_buffer import GeometryShape, MULTI_TYPES
+
+GEOJSON_TYPES = {
+    'Point': GeometryType.POINT,
+    'LineString': GeometryType.LINESTRING,
+    'Polygon': GeometryType.POLYGON,
+    'MultiPoint': GeometryType.MULTIPOINT,
+    'MultiLineString': GeometryType.MULTILINESTRING,
+    'MultiPolygon': GeometryType.MULTIPOLYGON,
+    'GeometryCollection': GeometryType.COLLECTION,
+}
+
+# metadata header flags
+FLAG_BBOX = 0x01
+FLAG_SIZE = 0x02
+FLAG_IDLIST = 0x04
+FLAG_EXTENDED_DIMS = 0x08
+FLAG_EMPTY = 0x10
+
+# encoded bytes of every varint below 1 << 14, built on first use
+_VARINT_TABLE : List[bytes] = []
+
+def zigzag(n_val : int) -> int:
+    """
+    Converts a signed int to its unsigned zigzag encoding
+    """
+    return (n_val << 1) ^ (n_val >> 63)
+
+def write_varint(out : bytearray, n_val : int):
+    """
+    Appends an unsigned variable length integer
+    """
+    while n_val >= 0x80:
+        out.append((n_val & 0x7f) | 0x80)
+        n_val >>= 7
+    out.append(n_val)
+
+def write_varsint(out : bytearray, n_val : int):
+    write_varint(out, zigzag(n_val))
+
+def write_varints(out : bytearray, values : List[int]):
+    """
+    Appends many unsigned varints.  Runs of small values, the usual case
+    for deltas, are packed with bytes() or a table lookup per value instead
+    of bit twiddling.
+    """
+    if not values:
+        return
+    top = max(values)
+    if top < 0x80:
+        out += bytes(values)
+    elif top < 0x4000:
+        if not _VARINT_TABLE:
+            _VARINT_TABLE.extend(bytes([ v ]) for v in range(0, 0x80))
+            _VARINT_TABLE.extend(bytes([ (v & 0x7f) | 0x80, v >> 7 ]) for v in range(0x80, 0x4000))
+        out += b''.join(map(_VARINT_TABLE.__getitem__, values))
+    else:
+        for n_val in values:
+            while n_val >= 0x80:
+                out.append((n_val & 0x7f) | 0x80)
+                n_val >>= 7
+            out.append(n_val)
+
+
+class EncoderContext:
+    """
+    Per-record encoder state: the scale factors, the delta refpoint that
+    runs on across the rings and parts of a geometry, and the quantized
+    extent for the bbox header
+    """
+    def __init__(self, ndims : int, factors : List[float], use_numpy : bool = False, track_bbox : bool = False,
+                 has_m : bool = False):
+        self.ndims = ndims
+        self.factors = factors[:ndims]
+        # name of every ordinate, to match those of collection members
+        self.ordinates = 'xyzm'[:ndims] if ndims != 3 or not has_m else 'xym'
+        self.refpoint : List[int] = [ 0 ] * ndims
+        self.use_numpy = use_numpy
+        self.track_bbox = track_bbox
+        self.mins : Optional[List[int]] = None
+        self.maxs : Optional[List[int]] = None
+
+    def extend_bbox(self, mins : List[Optional[int]], maxs : List[Optional[int]]):
+        """
+        Grows the extent; None values, for ordinates a collection member
+        doesn't have, are left out
+        """
+        if self.mins is None:
+            self.mins = list(mins)
+            self.maxs = list(maxs)
+            return
+        for i in range(0, self.ndims):
+            low, high = mins[i], maxs[i]
+            if low is None:
+                continue
+            if self.mins[i] is None or low < self.mins[i]:
+                self.mins[i] = low
+            if self.maxs[i] is None or high > self.maxs[i]:
+                self.maxs[i] = high
+
+    def member_extent(self, member : 'EncoderContext'):
+        """
+        Extent of a collection member in this context's ordinates and
+        units: members have their own dimensions and precisions
+
+        Returns:
+            (mins, maxs) - with None for ordinates the member doesn't have
+        """
+        mins : List[Optional[int]] = []
+        maxs : List[Optional[int]] = []
+        for name, factor in zip(self.ordinates, self.factors):
+            i = member.ordinates.find(name)
+            if i < 0 or member.mins[i] is None:
+                mins.append(None)
+                maxs.append(None)
+            elif member.factors[i] == factor:
+                mins.append(member.mins[i])
+                maxs.append(member.maxs[i])
+            else:
+                ratio = factor / member.factors[i]
+                mins.append(math.floor(member.mins[i] * ratio))
+                maxs.append(math.ceil(member.maxs[i] * ratio))
+        return mins, maxs
+
+
+def run_length(run, ndims : int) -> int:
+    """
+    Number of vertices in a run: a flat buffer of ordinates, an (n, ndims)
+    array or a list of positions
+    """
+    if run is None:
+        return 0
+    if isinstance(run, array):
+        return len(run) // ndims
+    return len(run)
+
+def run_values(run) -> List[float]:
+    """
+    Flat list of the ordinates of a run
+    """
+    if isinstance(run, array):
+        return run.tolist()
+    if getattr(run, 'ndim', 0) == 2:
+        return run.ravel().tolist()
+    return [ c for position in run for c in position ]
+
+def encode_pa(ta_struct : EncoderContext, out : bytearray, run):
+    """
+    Quantizes, delta encodes, zigzags and varint packs a run of vertices,
+    the inverse of read_pa()
+    """
+    ndims = ta_struct.ndims
+    if ta_struct.use_numpy:
+        from .numpy_pa import encode_pa_numpy
+        encode_pa_numpy(ta_struct, out, run)
+        return
+    values = run_values(run)
+    npoints = len(values) // ndims
+    if npoints == 0:
+        return
+    quantized = list(map(round, map(mul, values, ta_struct.factors * npoints)))
+    previous = ta_struct.refpoint + quantized[:-ndims]
+    write_varints(out, [ (d << 1) ^ (d >> 63) for d in map(sub, quantized, previous) ])
+    ta_struct.refpoint = quantized[-ndims:]
+    if ta_struct.track_bbox:
+        ta_struct.extend_bbox([ min(quantized[i::ndims]) for i in range(0, ndims) ],
+                              [ max(quantized[i::ndims]) for i in range(0, ndims) ])
+
+def write_line(ta_struct : EncoderContext, out : bytearray, run):
+    write_varint(out, run_length(run, ta_struct.ndims))
+    encode_pa(ta_struct, out, run)
+
+def write_rings(ta_struct : EncoderContext, out : bytearray, rings : Sequence[Any]):
+    write_varint(out, len(rings))
+    for ring in rings:
+        write_line(ta_struct, out, ring)
+
+
+class GeometryNode:
+    """
+    A geometry to encode, normalized from any of the accepted inputs.
+    `parts` is a run for points, linestrings and multipoints, a list of
+    runs for polygons and multilinestrings, a list of run lists for
+    multipolygons and a list of GeometryNodes for collections; None when
+    the geometry is empty.
+    """
+    __slots__ = ('type', 'ndims', 'has_m', 'parts', 'ids', 'precision')
+
+    def __init__(self, _type : GeometryType, ndims : int, has_m : bool, parts, ids : Optional[List[int]] = None,
+                 precision : Optional[List[int]] = None):
+        self.type = _type
+        self.ndims = ndims
+        self.has_m = has_m
+        self.parts = parts
+        self.ids = ids
+        self.precision = precision
+
+    @property
+    def is_empty(self) -> bool:
+        parts = self.parts
+        return parts is None or len(parts) == 0
+
+
+def node_dims(node : GeometryNode):
+    """
+    (has_z, has_m) of a node; a third ordinate is Z unless it is flagged M
+    """
+    if node.ndims == 4:
+        return True, True
+    if node.ndims == 3:
+        return not node.has_m, node.has_m
+    return False, False
+
+def shape_node(shape : GeometryShape) -> GeometryNode:
+    """
+    GeometryNode of a decoded shape or view shape
+    """
+    _type = shape.type
+    ndims = shape.ndims
+    ids = getattr(shape, 'ids', None)
+    precision = getattr(shape, 'precision', None)
+    if _type == GeometryType.COLLECTION:
+        return GeometryNode(_type, ndims, shape.has_m, [ shape_node(g) for g in shape.geoms ], ids, precision)
+    coords = getattr(shape, 'coords', None)
+    if coords is None:
+        return GeometryNode(_type, ndims, shape.has_m, None, ids, precision)
+
+    flat = getattr(coords, 'ndim', 1) == 1
+    def run(start, end):
+        return coords[start * ndims:end * ndims] if flat else coords[start:end]
+
+    start = shape.start
+    end = shape.end
+    if end is None:
+        end = len(coords) // ndims if flat else len(coords)
+    if _type == GeometryType.POINT:
+        parts = run(start, start + 1)
+    elif _type == GeometryType.LINESTRING or _type == GeometryType.MULTIPOINT:
+        parts = run(start, end)
+    elif _type == GeometryType.POLYGON:
+        rings = shape.ring_offsets
+        last = len(rings) - 1 if shape.end is None else shape.end
+        parts = [ run(rings[r], rings[r + 1]) for r in range(start, last) ]
+    elif _type == GeometryType.MULTILINESTRING:
+        offsets = shape.part_offsets
+        parts = [ run(offsets[i], offsets[i + 1]) for i in range(0, len(offsets) - 1) ]
+    else:
+        offsets = shape.part_offsets
+        rings = shape.ring_offsets
+        parts = [ [ run(rings[r], rings[r + 1]) for r in range(offsets[i], offsets[i + 1]) ]
+                  for i in range(0, len(offsets) - 1) ]
+    return GeometryNode(_type, ndims, shape.has_m, parts, ids, precision)
+
+def geojson_node(obj : dict) -> GeometryNode:
+    """
+    GeometryNode of a GeoJSON geometry or Feature.  Three dimensional
+    positions are taken as XYZ.
+    """
+    if obj.get('type') == 'Feature':
+        return geojson_node(obj['geometry'])
+    try:
+        _type = GEOJSON_TYPES[obj['type']]
+    except KeyError:
+        raise ValueError(f"Unsupported GeoJSON type {obj.get('type')}")
+    if _type == GeometryType.COLLECTION:
+        children = [ geojson_node(g) for g in obj['geometries'] ]
+        ndims = children[0].ndims if children else 2
+        return GeometryNode(_type, ndims, False, children)
+
+    coordinates = obj['coordinates']
+    ndims = position_ndims(coordinates)
+    if _type == GeometryType.POINT:
+        # a point is a run of one position
+        coordinates = [ coordinates ] if len(coordinates) else None
+    return GeometryNode(_type, ndims, False, coordinates)
+
+def position_ndims(coordinates) -> int:
+    """
+    Number of ordinates of the first position in nested GeoJSON coordinates
+    """
+    while len(coordinates) and hasattr(coordinates[0], '__len__'):
+        if getattr(coordinates, 'ndim', 0) == 2:
+            return coordinates.shape[1]
+        coordinates = coordinates[0]
+    return len(coordinates) or 2
+
+def array_node(coords) -> GeometryNode:
+    """
+    GeometryNode of a NumPy array: (ndims,) is a point, (n, ndims) a
+    linestring
+    """
+    if coords.ndim == 1:
+        return GeometryNode(GeometryType.POINT, len(coords), False, coords.reshape(1, -1))
+    if coords.ndim == 2:
+        return GeometryNode(GeometryType.LINESTRING, coords.shape[1], False, coords)
+    raise ValueError(f"Can't encode a {coords.ndim} dimensional array")
+
+def to_node(geom) -> GeometryNode:
+    if isinstance(geom, GeometryNode):
+        return geom
+    if isinstance(geom, GeometryShape):
+        return shape_node(geom.dequantize())
+    if isinstance(geom, dict):
+        return geojson_node(geom)
+    if hasattr(geom, 'ndim'):
+        return array_node(geom)
+    raise TypeError(f"Can't encode {type(geom).__name__}")
+
+
+class Encoder:
+    def __init__(self, precision_xy : Optional[int] = None, precision_z : Optional[int] = None,
+                 precision_m : Optional[int] = None, bbox : bool = False, size : bool = False,
+                 use_numpy : bool = False):
+        """
+        precision_* - decimal digits kept per ordinate; None uses the
+                      precision a decoded shape was read with, or 0
+        bbox        - write the bbox header
+        size        - write the size header, needed for skipping records
+                      (Decoder lazy mode, bbox filters, TwkbFile)
+        use_numpy   - encode coordinate runs with NumPy
+        """
+        self.precision_xy = precision_xy
+        self.precision_z = precision_z
+        self.precision_m = precision_m
+        self.bbox = bbox
+        self.size = size
+        self.use_numpy = use_numpy
+
+    def precisions(self, node : GeometryNode):
+        """
+        (xy, z, m) precision for a node, resolving the ones left unset from
+        the node's own precision
+        """
+        own = node.precision or []
+        has_z, has_m = node_dims(node)
+        own_z = own[2] if has_z and len(own) > 2 else 0
+        own_m = own[-1] if has_m and len(own) > 2 else 0
+        xy = self.precision_xy if self.precision_xy is not None else (own[0] if own else 0)
+        z = self.precision_z if self.precision_z is not None else own_z
+        m = self.precision_m if self.precision_m is not None else own_m
+        if not -8 <= xy <= 7:
+            raise ValueError(f"xy precision {xy} is outside -8..7")
+        if not 0 <= z <= 7 or not 0 <= m <= 7:
+            raise ValueError("z/m precision must be within 0..7")
+        return xy, z, m
+
+    def encode(self, geom, ids : Optional[Sequence[int]] = None) -> bytes:
+        """
+        Encodes one geometry as a TWKB record; `ids` are written as the id
+        list of a multi-geometry or collection (by default a decoded
+        shape's own ids)
+        """
+        out = bytearray()
+        self.write_record(out, to_node(geom), ids, True)
+        return bytes(out)
+
+    def iter_encode(self, geoms : Iterable[Any]) -> Iterator[bytes]:
+        for geom in geoms:
+            yield self.encode(geom)
+
+    def write(self, fp, geoms : Iterable[Any]) -> int:
+        """
+        Encodes geometries into a binary file object, one record after the
+        other
+
+        Returns:
+            int - the number of records written
+        """
+        count = 0
+        for record in self.iter_encode(geoms):
+            fp.write(record)
+            count += 1
+        return count
+
+    def write_record(self, out : bytearray, node : GeometryNode, ids : Optional[Sequence[int]] = None,
+                     top : bool = True, parent : Optional[EncoderContext] = None):
+        """
+        Appends one record; collection members are written as records of
+        their own with only the type, precision and dimension headers
+        """
+        _type = node.type
+        ndims = node.ndims
+        has_z, has_m = node_dims(node)
+        precision_xy, precision_z, precision_m = self.precisions(node)
+        if ids is None:
+            ids = node.ids
+        empty = node.is_empty
+        has_idlist = bool(ids) and _type in MULTI_TYPES and not empty
+        track_bbox = top and self.bbox and not empty
+        has_size = top and self.size
+
+        factors = [ math.pow(10, precision_xy) ] * 2
+        if has_z:
+            factors.append(math.pow(10, precision_z))
+        if has_m:
+            factors.append(math.pow(10, precision_m))
+        ta_struct = EncoderContext(ndims, factors, self.use_numpy, track_bbox or parent is not None and parent.track_bbox,
+                                   has_m)
+
+        body = bytearray()
+        if not empty:
+            self.write_body(ta_struct, body, node, ids if has_idlist else None)
+        if parent is not None and ta_struct.mins is not None:
+            parent.extend_bbox(*parent.member_extent(ta_struct))
+        # parts without any vertex leave no extent to write
+        has_bbox = track_bbox and ta_struct.mins is not None
+
+        out.append((zigzag(precision_xy) << 4) | _type.value)
+        flags = 0
+        if has_bbox:
+            flags |= FLAG_BBOX
+        if has_size:
+            flags |= FLAG_SIZE
+        if has_idlist:
+            flags |= FLAG_IDLIST
+        if has_z or has_m:
+            flags |= FLAG_EXTENDED_DIMS
+        if empty:
+            flags |= FLAG_EMPTY
+        out.append(flags)
+        if has_z or has_m:
+            out.append(int(has_z) | (int(has_m) << 1) | (precision_z << 2) | (precision_m << 5))
+
+        bbox = bytearray()
+        if has_bbox:
+            for i in range(0, ndims):
+                # 0 for an ordinate none of a collection's members has
+                low, high = ta_struct.mins[i] or 0, ta_struct.maxs[i] or 0
+                write_varsint(bbox, low)
+                write_varsint(bbox, high - low)
+        if has_size:
+            write_varint(out, len(bbox) + len(body))
+        out += bbox
+        out += body
+
+    def write_body(self, ta_struct : EncoderContext, out : bytearray, node : GeometryNode,
+                   ids : Optional[Sequence[int]]):
+        """
+        Appends the geometry body, the inverse of read_objects()
+        """
+        _type = node.type
+        parts = node.parts
+        if _type == GeometryType.POINT:
+            encode_pa(ta_struct, out, parts)
+        elif _type == GeometryType.LINESTRING:
+            write_line(ta_struct, out, parts)
+        elif _type == GeometryType.POLYGON:
+            write_rings(ta_struct, out, parts)
+        else:
+            ngeoms = run_length(parts, node.ndims) if _type == GeometryType.MULTIPOINT else len(parts)
+            write_varint(out, ngeoms)
+            if ids:
+                if len(ids) != ngeoms:
+                    raise ValueError(f"Got {len(ids)} ids for {ngeoms} geometries")
+                for gid in ids:
+                    write_varsint(out, gid)
+            if _type == GeometryType.MULTIPOINT:
+                encode_pa(ta_struct, out, parts)
+            elif _type == GeometryType.MULTILINESTRING:
+                for part in parts:
+                    write_line(ta_struct, out, part)
+            elif _type == GeometryType.MULTIPOLYGON:
+                for part in parts:
+                    write_rings(ta_struct, out, part)
+            else:
+                for child in parts:
+                    self.write_record(out, child, None, False, ta_struct)
+
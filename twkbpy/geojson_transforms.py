@@ -8,7 +8,7 @@ import json
 
 class JsonFormatter:
     def __init__(self, geom : GeometryShape):
-        self.obj = self.xform_geom(geom)
+        self.obj = self.xform_geom(geom.dequantize())
 
     def get_type_string(self, _type):
         result = None
@@ -67,10 +67,10 @@ class JsonFormatter:
     def xform_collection(self, geom : GeometryShape):
         return self.create_collection(geom.geoms, geom.ids, geom.ndims)
 
-    def create_geometry(self, _type : GeometryType, coordinates : List[float], ndims : int):
+    def create_geometry(self, _type : GeometryType, coordinates : List[Any], ndims : int):
         return {
             'type': self.get_type_string(_type),
-            'coordinates': self.to_coords(coordinates, ndims)
+            'coordinates': coordinates
         }
 
     @staticmethod
@@ -122,8 +122,13 @@ class JsonFormatter:
         """
         TWKB flat coordinates to GeoJSON coordinates
         """
-        coords = []
         assert(ndims != 0)
+        if coordinates is None:
+            return []
+        if getattr(coordinates, 'ndim', 1) == 2:
+            # (n, ndims) numpy array
+            return coordinates.tolist()
+        coords = []
         for i in range(0, len(coordinates), ndims):
             pos = []
             for c in range(0, ndims):
@@ -133,15 +138,16 @@ class JsonFormatter:
 
     def create_point(self, coordinates : List[float], ndims):
         assert(ndims != 0)
-        return self.create_geometry(GeometryType.POINT, self.to_coords(coordinates, ndims)[0], ndims)
+        coords = self.to_coords(coordinates, ndims)
+        return self.create_geometry(GeometryType.POINT, coords[0] if coords else [], ndims)
 
     def create_linestring(self, coordinates : List[float], ndims):
         assert(ndims != 0)
         return self.create_geometry(GeometryType.LINESTRING, self.to_coords(coordinates, ndims), ndims)
 
-    def create_polygon(self, coordinates : List[float], ndims):
+    def create_polygon(self, rings : List[GeometryShape], ndims):
         assert(ndims != 0)
-        coords = self.to_coords(coordinates, ndims)
+        coords = [ self.to_coords(ring.coordinates, ndims) for ring in rings ]
         return self.create_geometry(GeometryType.POLYGON, coords, ndims)
 
     def create_multipoint(self, geoms : List[GeometryShape], ids : List[int], ndims : int):
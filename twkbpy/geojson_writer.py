@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+"""
+Streaming GeoJSON output.
+
+Features are serialized one record at a time, straight from the flat
+coordinate buffers of the decoded shapes, and written to a text file
+object.  No dict tree is built and nothing is kept between records, so
+memory stays bounded however many records are written.
+
+Coordinates are written with the number of decimals the record was
+encoded with (GeometryShape.precision), so a value stored with precision 5
+never shows more than 5 decimals.  Each ordinate is the nearest double to
+an integer over 10**precision, which '%.<precision>f' turns back into
+exactly that integer's digits; this is also about twice as fast as the
+shortest round-trip repr() that json.dumps uses.  With trim=True the
+padding zeros are dropped as well, for smaller output at some extra cost.
+
+Like JsonFormatter, every member of a multi-geometry or collection is
+written as a Feature of its own, carrying its id when the record has an
+id list.
+"""
+import re
+from typing import Iterable, Optional, Sequence, TextIO
+
+from .constants import GeometryType
+from .read_buffer import GeometryShape
+
+TYPE_NAMES = {
+    GeometryType.POINT: 'Point',
+    GeometryType.LINESTRING: 'LineString',
+    GeometryType.POLYGON: 'Polygon',
+    GeometryType.MULTIPOINT: 'MultiPoint',
+    GeometryType.MULTILINESTRING: 'MultiLineString',
+    GeometryType.MULTIPOLYGON: 'MultiPolygon',
+    GeometryType.COLLECTION: 'GeometryCollection',
+}
+
+# printf format of one position when the precision is unknown; %r gives
+# the same text as json.dumps
+POSITION_FORMATS = { 2: '[%r,%r]', 3: '[%r,%r,%r]', 4: '[%r,%r,%r,%r]' }
+
+# zeros ending the fraction of a number, and the point itself when nothing
+# else is left of the fraction; only valid when every number has a point
+TRAILING_ZEROS = re.compile(r'\.?0+(?=[,\]])')
+
+SINGLE_TYPES = (GeometryType.POINT, GeometryType.LINESTRING, GeometryType.POLYGON)
+
+
+def position_format(ndims : int, precision : Optional[Sequence[int]] = None, trim : bool = False) -> str:
+    """
+    printf format of one position with `precision` decimals per ordinate.
+    For trim_zeros() at least one decimal is written, so that it can tell
+    fractions from integers.
+    """
+    if precision is None:
+        return POSITION_FORMATS[ndims]
+    least = 1 if trim else 0
+    return '[' + ','.join([ '%%.%df' % max(p, least) for p in precision[:ndims] ]) + ']'
+
+def trim_zeros(text : str) -> str:
+    """
+    Drops the padding zeros of the numbers in text written with
+    position_format()
+    """
+    return TRAILING_ZEROS.sub('', text)
+
+def format_positions(coords, start : int, end : int, ndims : int, fmt : Optional[str] = None) -> str:
+    """
+    Comma separated positions of vertices [start, end) of a flat or
+    (n, ndims) coordinate buffer
+    """
+    if end <= start:
+        return ''
+    if getattr(coords, 'ndim', 1) == 2:
+        values = coords[start:end].ravel().tolist()
+    else:
+        values = coords[start * ndims:end * ndims].tolist()
+    return ','.join([ fmt or POSITION_FORMATS[ndims] ] * (end - start)) % tuple(values)
+
+def format_rings(coords, ring_offsets, first : int, last : int, ndims : int, fmt : Optional[str] = None) -> str:
+    """
+    Rings [first, last) as comma separated position lists
+    """
+    return ','.join([ '[' + format_positions(coords, ring_offsets[r], ring_offsets[r + 1], ndims, fmt) + ']'
+                      for r in range(first, last) ])
+
+def format_coordinates(shape : GeometryShape, fmt : Optional[str] = None) -> str:
+    """
+    GeoJSON `coordinates` text of a shape or view shape
+    """
+    coords = getattr(shape, 'coords', None)
+    if coords is None:
+        return '[]'
+    _type = shape.type
+    ndims = shape.ndims
+    start = shape.start
+    end = shape.end
+    nvertices = len(coords) if getattr(coords, 'ndim', 1) == 2 else len(coords) // ndims
+    if _type == GeometryType.POINT:
+        return format_positions(coords, start, start + 1, ndims, fmt) or '[]'
+    if _type == GeometryType.LINESTRING or _type == GeometryType.MULTIPOINT:
+        return '[' + format_positions(coords, start, nvertices if end is None else end, ndims, fmt) + ']'
+    if _type == GeometryType.POLYGON:
+        rings = shape.ring_offsets
+        return '[' + format_rings(coords, rings, start, len(rings) - 1 if end is None else end, ndims, fmt) + ']'
+    parts = shape.part_offsets
+    if _type == GeometryType.MULTILINESTRING:
+        return '[' + ','.join([ '[' + format_positions(coords, parts[i], parts[i + 1], ndims, fmt) + ']'
+                                for i in range(0, len(parts) - 1) ]) + ']'
+    if _type == GeometryType.MULTIPOLYGON:
+        rings = shape.ring_offsets
+        return '[' + ','.join([ '[' + format_rings(coords, rings, parts[i], parts[i + 1], ndims, fmt) + ']'
+                                for i in range(0, len(parts) - 1) ]) + ']'
+    raise NotImplementedError(f"{_type} not implemented")
+
+def format_geometry(shape : GeometryShape, precision : Optional[Sequence[int]] = None,
+                    trim : bool = False) -> str:
+    """
+    GeoJSON geometry object text of a shape, with `precision` decimals per
+    ordinate (the shape's own precision by default).  trim=True drops
+    trailing zeros.
+    """
+    shape = shape.dequantize()
+    if precision is None:
+        precision = getattr(shape, 'precision', None)
+    trim = trim and precision is not None
+    text = _format_geometry(shape, position_format(shape.ndims, precision, trim), trim)
+    if trim:
+        text = trim_zeros(text)
+    return text
+
+def _format_geometry(shape : GeometryShape, fmt : str, trim : bool) -> str:
+    if shape.type == GeometryType.COLLECTION:
+        # members of a collection carry their own precision
+        return '{"type":"GeometryCollection","geometries":[' + \
+            ','.join([ _format_geometry(geom, position_format(geom.ndims, geom.precision, trim)
+                                              if geom.precision else fmt, trim)
+                       for geom in shape.geoms ]) + ']}'
+    return '{"type":"' + TYPE_NAMES[shape.type] + '","coordinates":' + format_coordinates(shape, fmt) + '}'
+
+def format_feature(geometry : str, id : Optional[int] = None) -> str:
+    if id is None:
+        return '{"type":"Feature","geometry":' + geometry + '}'
+    return '{"type":"Feature","id":' + str(id) + ',"geometry":' + geometry + '}'
+
+
+class GeoJsonWriter:
+    """
+    Writes decoded shapes to a text file object as a FeatureCollection, or
+    as newline-delimited GeoJSON with seq=True (one Feature per line,
+    preceded by an RS character when rs=True as in RFC 8142).  trim=True
+    drops the trailing zeros of coordinates.
+    """
+    def __init__(self, fp : TextIO, seq : bool = False, rs : bool = False, trim : bool = False):
+        self.fp = fp
+        self.seq = seq
+        self.prefix = '\x1e' if rs else ''
+        self.trim = trim
+        self.count = 0          # features written so far
+        self.closed = False
+        if not seq:
+            fp.write('{"type":"FeatureCollection","features":[')
+
+    def __enter__(self) -> 'GeoJsonWriter':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write_feature(self, geometry : str, id : Optional[int] = None):
+        """
+        Writes one Feature given the text of its geometry
+        """
+        feature = format_feature(geometry, id)
+        if self.seq:
+            self.fp.write(self.prefix + feature + '\n')
+        elif self.count:
+            self.fp.write(',' + feature)
+        else:
+            self.fp.write(feature)
+        self.count += 1
+
+    def write(self, shape : GeometryShape):
+        """
+        Writes the Feature(s) of one decoded record
+        """
+        shape = shape.dequantize()
+        if shape.type in SINGLE_TYPES:
+            self.write_feature(format_geometry(shape, None, self.trim))
+            return
+        ids = getattr(shape, 'ids', None)
+        if getattr(shape, 'coords', None) is None and shape.type != GeometryType.COLLECTION:
+            # empty multi-geometry
+            return
+        # members of a multi-geometry are views without a precision of their own
+        precision = None if shape.type == GeometryType.COLLECTION else shape.precision
+        geoms = shape.geoms
+        for i in range(0, len(geoms)):
+            self.write_feature(format_geometry(geoms[i], precision, self.trim), ids[i] if ids else None)
+
+    def write_all(self, shapes : Iterable[GeometryShape]):
+        """
+        Writes every shape of an iterable, e.g. Decoder.iter_decode() or a
+        TwkbFile, pulling one at a time
+        """
+        for shape in shapes:
+            self.write(shape)
+
+    def close(self):
+        """
+        Ends the FeatureCollection; the file object is left open
+        """
+        if self.closed:
+            return
+        self.closed = True
+        if not self.seq:
+            self.fp.write(']}')
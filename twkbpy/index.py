@@ -0,0 +1,280 @@
+# -*- coding: utf-8 -*-
+"""
+Sidecar spatial index for files of concatenated TWKB records.
+
+The index holds the offset, length, geometry type, 2D bbox and id list of
+every record, plus a packed STR R-tree over the bboxes.  It is saved as a
+flat binary file whose sections are all 8-byte aligned, so a saved index
+can be memory mapped and queried without parsing it.
+"""
+import math
+import mmap
+import struct
+import sys
+from array import array
+from typing import Iterator, List, Optional, Sequence
+
+from .bbox import bbox_matches, shape_extent, INTERSECTS
+from .constants import GeometryType
+from .context import DecoderContext, create_context
+from .decode import Decoder
+from .read_buffer import GeometryShape, read_header, read_body, skip_body, scaled_bbox
+
+MAGIC = b'TWKBIDX\x01'
+# nrecords, nids, node_size, nlevels
+HEADER = struct.Struct('<QQII')
+
+NODE_SIZE = 16
+
+# bbox stored for records without coordinates; query() skips it, as an
+# inverted box would still pass the WITHIN test
+EMPTY_BBOX = [ math.inf, math.inf, -math.inf, -math.inf ]
+
+
+def read_record_entry(ta_struct : DecoderContext):
+    """
+    Reads one record for indexing: only the header and id list when the
+    record has a bbox header, the whole geometry when its extent has to be
+    computed
+
+    Returns:
+        (type, bbox, ids)
+    """
+    read_header(ta_struct)
+    _type = ta_struct.type
+    ndims = ta_struct.ndims
+    bbox = scaled_bbox(ta_struct)
+    if bbox is not None:
+        bbox = [ bbox[0], bbox[1], bbox[ndims], bbox[ndims + 1] ]
+        ids = skip_body(ta_struct, read_ids=True)
+    else:
+        shape = read_body(ta_struct)
+        ids = getattr(shape, 'ids', [])
+        bbox = shape_extent(shape, ndims)
+    if bbox is None:
+        bbox = EMPTY_BBOX
+    return _type, bbox, ids
+
+
+class TwkbIndex:
+    """
+    Record table and packed STR R-tree for a TWKB record file
+    """
+    def __init__(self, offsets : Sequence[int], lengths : Sequence[int], types : Sequence[int],
+                 id_offsets : Sequence[int], ids : Sequence[int], order : Sequence[int],
+                 nodes : Sequence[float], levels : Sequence[int], node_size : int = NODE_SIZE):
+        self.offsets = offsets
+        self.lengths = lengths
+        self.types = types
+        self.id_offsets = id_offsets
+        self.ids = ids
+        self.order = order          # record number of every leaf entry
+        self.nodes = nodes          # 4 floats per node, leaf level first
+        self.levels = levels        # start of every level in nodes, plus the end
+        self.node_size = node_size
+        self._mmap = None           # mapping of a loaded index
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """
+        Unmaps a loaded index; its arrays can't be used afterwards
+        """
+        if self._mmap is None:
+            return
+        for section in self._sections():
+            if isinstance(section, memoryview):
+                section.release()
+        self._mmap.close()
+        self._mmap = None
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    @classmethod
+    def build(cls, stream, node_size : int = NODE_SIZE) -> 'TwkbIndex':
+        """
+        Indexes every record of a stream or buffer in one pass
+        """
+        ta_struct = create_context(stream)
+        offsets = array('Q')
+        lengths = array('Q')
+        types = array('B')
+        id_offsets = array('Q', [ 0 ])
+        ids = array('q')
+        bboxes : List[List[float]] = []
+        try:
+            while not ta_struct.at_eof():
+                offset = ta_struct.tell()
+                _type, bbox, rec_ids = read_record_entry(ta_struct)
+                offsets.append(offset)
+                lengths.append(ta_struct.tell() - offset)
+                types.append(_type.value)
+                ids.extend(rec_ids)
+                id_offsets.append(len(ids))
+                bboxes.append(bbox)
+        finally:
+            ta_struct.release()
+        order, nodes, levels = pack_str_tree(bboxes, node_size)
+        return cls(offsets, lengths, types, id_offsets, ids, order, nodes, levels, node_size)
+
+    def type(self, i : int) -> GeometryType:
+        return GeometryType(self.types[i])
+
+    def record_ids(self, i : int) -> List[int]:
+        return list(self.ids[self.id_offsets[i]:self.id_offsets[i + 1]])
+
+    def query(self, bbox : Sequence[float], predicate : str = INTERSECTS) -> List[int]:
+        """
+        Record numbers, in file order, whose bbox matches the (xmin, ymin,
+        xmax, ymax) window
+        """
+        nodes = self.nodes
+        levels = self.levels
+        node_size = self.node_size
+        result = []
+        top = len(levels) - 2
+        # (level, first entry, end entry)
+        stack = [ (top, levels[top], levels[top + 1]) ]
+        while stack:
+            level, first, last = stack.pop()
+            for j in range(first, last):
+                box = nodes[4 * j:4 * j + 4]
+                if level == 0:
+                    # records without coordinates match no window
+                    if math.isfinite(box[0]) and bbox_matches(box, 2, bbox, predicate):
+                        result.append(self.order[j])
+                elif bbox_matches(box, 2, bbox, INTERSECTS):
+                    child = levels[level - 1] + (j - levels[level]) * node_size
+                    stack.append((level - 1, child, min(child + node_size, levels[level])))
+        result.sort()
+        return result
+
+    def read_record(self, source, i : int):
+        """
+        Raw bytes of record `i` from a buffer or a seekable stream
+        """
+        offset = self.offsets[i]
+        length = self.lengths[i]
+        if isinstance(source, (bytes, bytearray, memoryview, mmap.mmap)):
+            return memoryview(source)[offset:offset + length]
+        source.seek(offset)
+        return source.read(length)
+
+    def decode_window(self, source, bbox : Sequence[float], predicate : str = INTERSECTS,
+                      decoder : Optional[Decoder] = None) -> Iterator[GeometryShape]:
+        """
+        Decodes only the records of `source` matching the window, seeking
+        straight to each of them
+        """
+        if decoder is None:
+            decoder = Decoder()
+        for i in self.query(bbox, predicate):
+            shape = decoder.decode(self.read_record(source, i))
+            shape.offset = self.offsets[i]
+            yield shape
+
+    def save(self, path : str):
+        nrecords = len(self.offsets)
+        with open(path, 'wb') as f:
+            f.write(MAGIC)
+            f.write(HEADER.pack(nrecords, len(self.ids), self.node_size, len(self.levels)))
+            for section in self._sections():
+                typecode = section.typecode if isinstance(section, array) else section.format
+                data = array(typecode, section)
+                if sys.byteorder == 'big':
+                    data.byteswap()
+                raw = data.tobytes()
+                f.write(raw)
+                f.write(b'\0' * (-len(raw) % 8))
+
+    def _sections(self):
+        return [ self.levels, self.offsets, self.lengths, self.id_offsets, self.ids,
+                 self.order, self.nodes, self.types ]
+
+    @classmethod
+    def load(cls, path : str) -> 'TwkbIndex':
+        """
+        Memory maps a saved index; the arrays are views into the mapping,
+        which close() unmaps
+        """
+        with open(path, 'rb') as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if data[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a TWKB index")
+        nrecords, nids, node_size, nlevels = HEADER.unpack_from(data, len(MAGIC))
+        pos = len(MAGIC) + HEADER.size
+
+        def section(typecode : str, count : int):
+            nonlocal pos
+            size = count * array(typecode).itemsize
+            view = memoryview(data)[pos:pos + size]
+            pos += size + (-size % 8)
+            if sys.byteorder == 'big':
+                values = array(typecode, view.tobytes())
+                values.byteswap()
+                return values
+            return view.cast(typecode)
+
+        levels = section('Q', nlevels)
+        nnodes = levels[-1]
+        offsets = section('Q', nrecords)
+        lengths = section('Q', nrecords)
+        id_offsets = section('Q', nrecords + 1)
+        ids = section('q', nids)
+        order = section('Q', nrecords)
+        nodes = section('d', 4 * nnodes)
+        types = section('B', nrecords)
+        index = cls(offsets, lengths, types, id_offsets, ids, order, nodes, levels, node_size)
+        index._mmap = data
+        return index
+
+
+def pack_str_tree(bboxes : List[List[float]], node_size : int):
+    """
+    Sort-Tile-Recursive packing of the record bboxes
+
+    Returns:
+        (order, nodes, levels) - record number of each leaf entry, flat node
+        bboxes level by level starting with the leaves, and the start offset
+        of each level followed by the total node count
+    """
+    n = len(bboxes)
+    if n == 0:
+        return array('Q'), array('d'), array('Q', [ 0, 0 ])
+
+    def center(i, axis):
+        b = bboxes[i]
+        c = (b[axis] + b[axis + 2]) / 2
+        return c if math.isfinite(c) else math.inf
+
+    nleaves = math.ceil(n / node_size)
+    nslices = math.ceil(math.sqrt(nleaves))
+    slice_len = nslices * node_size
+    by_x = sorted(range(n), key=lambda i: center(i, 0))
+    order = array('Q')
+    for s in range(0, n, slice_len):
+        order.extend(sorted(by_x[s:s + slice_len], key=lambda i: center(i, 1)))
+
+    nodes = array('d')
+    for i in order:
+        nodes.extend(bboxes[i])
+    levels = array('Q', [ 0 ])
+    start, count = 0, n
+    while True:
+        levels.append(start + count)
+        if count == 1:
+            break
+        for first in range(start, start + count, node_size):
+            last = min(first + node_size, start + count)
+            xmin = min(nodes[4 * j] for j in range(first, last))
+            ymin = min(nodes[4 * j + 1] for j in range(first, last))
+            xmax = max(nodes[4 * j + 2] for j in range(first, last))
+            ymax = max(nodes[4 * j + 3] for j in range(first, last))
+            nodes.extend([ xmin, ymin, xmax, ymax ])
+        start, count = start + count, math.ceil(count / node_size)
+    return order, nodes, levels
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+Generated vertex decoding kernels.
+
+The loops decoding vertex runs inline the varint, zigzag and delta steps
+of every ordinate, so that no Python-level call is made per value.  The
+kernels differ only in their loop and in what they do with the
+accumulated ordinates, so instead of hand-unrolled copies per dimension
+count they are compiled at import from DELTA and a template per kind of
+kernel (see build_kernel()).
+"""
+from typing import Callable, Dict, Optional, Sequence
+
+ORDINATES = ('x', 'y', 'z', 'm')
+
+# varint, zigzag and delta of ordinate {o}
+DELTA = """\
+b = buf[pos]; pos += 1
+if b & 0x80:
+    v = b & 0x7f; shift = 7
+    while True:
+        b = buf[pos]; pos += 1
+        v |= (b & 0x7f) << shift
+        if not b & 0x80: break
+        shift += 7
+    b = v
+{o} += (b >> 1) ^ -(b & 1)
+"""
+
+# read_pa kernels: decode `npoints` vertices from `buf` at `pos` into
+# `coords` from index `base` on, update `refpoint` in place and return the
+# new cursor position
+PA_TEMPLATE = """\
+def {name}(buf, pos, npoints, refpoint, factors, coords, base):
+    {ords} = refpoint[0:{ndims}]
+{setup}
+    for i in range(base, base + npoints * {ndims}, {ndims}):
+{deltas}
+{store}
+    refpoint[0:{ndims}] = [{ords}]
+    return pos
+"""
+
+def slot(k : int) -> str:
+    """
+    Index in `coords` of ordinate `k` of the current vertex
+    """
+    return 'i' if k == 0 else f'i + {k}'
+
+def _indent(lines : Sequence[str], spaces : int) -> str:
+    prefix = ' ' * spaces
+    return '\n'.join([ prefix + line for text in lines for line in text.splitlines() ])
+
+def build_kernel(template : str, name : str, ndims : int, setup : Sequence[str] = (), store : Sequence[str] = (),
+                 namespace : Optional[Dict[str, object]] = None) -> Callable:
+    """
+    Compiles a kernel for `ndims` ordinates named x, y, z, m.  `template`
+    is formatted with {name}, {ndims}, {ords} ('x, y, z'), {setup} (lines
+    indented to the function body), {deltas} (DELTA for every ordinate)
+    and {store} (lines), the last two indented to the loop body.
+    `namespace` holds globals the kernel refers to.
+
+    Returns:
+        Callable - the kernel function
+    """
+    ords = ORDINATES[:ndims]
+    source = template.format(name=name, ndims=ndims, ords=', '.join(ords), setup=_indent(setup, 4),
+                             deltas=_indent([ DELTA.format(o=o) for o in ords ], 8), store=_indent(store, 8))
+    scope = dict(namespace) if namespace else {}
+    exec(compile(source, f'<{name}>', 'exec'), scope)
+    return scope[name]
+
+def pa_kernels(suffix : str, setup : Callable[[int], Sequence[str]],
+               store : Callable[[int], Sequence[str]]) -> Dict[int, Callable]:
+    """
+    read_pa kernels for 2, 3 and 4 ordinates, with the setup and store
+    lines given by functions of the dimension count
+    """
+    return { ndims: build_kernel(PA_TEMPLATE, f'_read_pa_{ndims}d{suffix}', ndims, setup(ndims), store(ndims))
+             for ndims in (2, 3, 4) }
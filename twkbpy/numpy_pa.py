@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+NumPy implementations of read_pa and of the encoder's encode_pa.
+Imported only when a decoder or encoder runs with use_numpy=True, so numpy
+stays an optional dependency.
+"""
+import numpy as np
+
+from .context import DecoderContext, MAX_VARINT_LEN
+from .transform import EARTH_RADIUS, latitude, mercator_y
+
+# numpy dtypes of the coord_type array typecodes
+DTYPES = { 'd': np.float64, 'q': np.int64, 'i': np.int32 }
+INT32_MIN, INT32_MAX = -(1 << 31), (1 << 31) - 1
+
+def decode_varints(data : np.ndarray, count : int):
+    """
+    Vectorized decode of the first `count` unsigned varints in `data`
+
+    Returns:
+        (values, nbytes) - uint64 array of decoded values and the number of
+        bytes they occupied
+    """
+    term = np.flatnonzero(data < 0x80)
+    if len(term) < count:
+        raise EOFError("Unexpected end of TWKB data")
+    term = term[:count]
+    nbytes = int(term[-1]) + 1
+    data = data[:nbytes]
+
+    starts = np.empty(count, dtype=np.intp)
+    starts[0] = 0
+    starts[1:] = term[:-1] + 1
+    if nbytes == count:
+        # every value fits in a single byte
+        return data.astype(np.uint64), nbytes
+
+    lengths = term - starts + 1
+    shift = np.arange(nbytes, dtype=np.uint64) - np.repeat(starts, lengths).astype(np.uint64)
+    payload = (data & 0x7f).astype(np.uint64) << (shift * np.uint64(7))
+    return np.bitwise_or.reduceat(payload, starts), nbytes
+
+def unzigzag_array(values : np.ndarray) -> np.ndarray:
+    """
+    Converts unsigned zigzag encoded uint64 values to int64
+    """
+    return (values >> np.uint64(1)).astype(np.int64) ^ -(values & np.uint64(1)).astype(np.int64)
+
+def read_pa_numpy(ta_struct : DecoderContext, npoints : int) -> np.ndarray:
+    """
+    Reads an array of delta compressed integers from the decoder context and
+    rebuilds absolute coordinates with a cumulative sum per axis
+
+    Returns:
+        coords : float64 ndarray of shape (npoints, ndims), or the quantized
+                 int64 / int32 values for an integer coord_type
+    """
+    ndims = ta_struct.ndims
+    count = npoints * ndims
+    if count == 0:
+        return np.empty((0, ndims), dtype=DTYPES[ta_struct.coord_type])
+
+    ta_struct.fill(count * MAX_VARINT_LEN)
+    pos = ta_struct.pos
+    window = np.frombuffer(ta_struct.buf[pos:pos + count * MAX_VARINT_LEN], dtype=np.uint8)
+    values, nbytes = decode_varints(window, count)
+    ta_struct.pos = pos + nbytes
+
+    deltas = unzigzag_array(values).reshape(npoints, ndims)
+    refpoint = np.array(ta_struct.refpoint[:ndims], dtype=np.int64)
+    absolute = np.cumsum(deltas, axis=0) + refpoint
+    ta_struct.refpoint[:ndims] = absolute[-1].tolist()
+    if ta_struct.transform is not None:
+        return transform_pa(absolute, ta_struct.transform.coefficients(ta_struct.factors, ta_struct.has_z))
+    coord_type = ta_struct.coord_type
+    if coord_type == 'q':
+        return absolute
+    if coord_type == 'i':
+        if absolute.min() < INT32_MIN or absolute.max() > INT32_MAX:
+            raise OverflowError("Quantized coordinates don't fit in int32")
+        return absolute.astype(np.int32)
+    return absolute / np.array(ta_struct.factors[:ndims], dtype=np.float64)
+
+def transform_pa(absolute : np.ndarray, coeffs : tuple) -> np.ndarray:
+    """
+    Applies CoordTransform.coefficients() to quantized coordinates
+
+    Returns:
+        coords : float64 ndarray of the same shape
+    """
+    xx, xy, xo, yx, yy, yo, s2, o2, s3, o3, project = coeffs
+    values = absolute.astype(np.float64)
+    x, y = values[:, 0], values[:, 1]
+    coords = np.empty_like(values)
+    coords[:, 0] = xx * x + xy * y + xo
+    coords[:, 1] = yx * x + yy * y + yo
+    if project is not None:
+        coords[:, 1] = PROJECT_ARRAYS[project](coords[:, 1])
+    if values.shape[1] > 2:
+        coords[:, 2] = s2 * values[:, 2] + o2
+    if values.shape[1] > 3:
+        coords[:, 3] = s3 * values[:, 3] + o3
+    return coords
+
+# vectorized versions of the y functions of the transform module's projections
+PROJECT_ARRAYS = {
+    latitude: lambda v: np.degrees(2.0 * np.arctan(np.exp(v))) - 90.0,
+    mercator_y: lambda v: EARTH_RADIUS * np.log(np.tan(np.pi / 4.0 + v)),
+}
+
+def concat_pa(parts : list, ndims : int, coord_type : str = 'd') -> np.ndarray:
+    """
+    Joins the runs read into a numpy coordinate buffer
+    """
+    if len(parts) == 1:
+        return parts[0]
+    if not parts:
+        return np.empty((0, ndims), dtype=DTYPES[coord_type])
+    return np.concatenate(parts)
+
+def encode_varints(values : np.ndarray) -> bytes:
+    """
+    Vectorized encoding of uint64 values as unsigned varints
+    """
+    nbytes = np.ones(len(values), dtype=np.intp)
+    for k in range(1, MAX_VARINT_LEN):
+        nbytes += values >= np.uint64(1 << (7 * k))
+    starts = np.cumsum(nbytes) - nbytes
+    out = np.empty(int(nbytes.sum()), dtype=np.uint8)
+    for k in range(0, int(nbytes.max())):
+        sel = nbytes > k
+        payload = (values[sel] >> np.uint64(7 * k)) & np.uint64(0x7f)
+        more = (nbytes[sel] > k + 1).astype(np.uint64) << np.uint64(7)
+        out[starts[sel] + k] = payload | more
+    return out.tobytes()
+
+def encode_pa_numpy(ta_struct, out : bytearray, run):
+    """
+    Quantizes a run of vertices, delta encodes it per axis against the
+    refpoint of the encoder context and appends the zigzag varints
+    """
+    ndims = ta_struct.ndims
+    coords = np.asarray(run, dtype=np.float64).reshape(-1, ndims)
+    if len(coords) == 0:
+        return
+    quantized = np.rint(coords * np.array(ta_struct.factors, dtype=np.float64)).astype(np.int64)
+    deltas = np.diff(quantized, axis=0, prepend=np.array([ ta_struct.refpoint ], dtype=np.int64)).ravel()
+    out += encode_varints(((deltas << 1) ^ (deltas >> 63)).view(np.uint64))
+    ta_struct.refpoint = quantized[-1].tolist()
+    if ta_struct.track_bbox:
+        ta_struct.extend_bbox(quantized.min(axis=0).tolist(), quantized.max(axis=0).tolist())
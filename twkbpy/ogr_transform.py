@@ -1,73 +1,59 @@
-
-from sys import getrecursionlimit
-from typing import Coroutine
-from .read_buffer import GeometryShape, GeometryType
+from typing import Iterable, Optional
+from .read_buffer import GeometryShape
+from .stats import DecoderStats
+from .wkb import to_wkb
 from osgeo import ogr
 
 class OgrTransform:
-    def __init__(self):
-        pass
+    """
+    Decoded shapes to OGR geometries.  Each shape is serialized to ISO WKB
+    in one pass and handed to OGR in a single CreateGeometryFromWkb call,
+    instead of being built up point by point through SWIG.  With a
+    DecoderStats the time spent is added to its 'ogr' stage.
+    """
+    def __init__(self, stats : Optional[DecoderStats] = None):
+        self.stats = stats
 
     def convert(self, shape : GeometryShape) -> ogr.Geometry:
+        if self.stats is not None:
+            return self.stats.timed('ogr', self.xform_shape, shape, shape.ndims)
         return self.xform_shape(shape, shape.ndims)
 
     def xform_shape(self, shape : GeometryShape, ndims : int) -> ogr.Geometry:
-        t = shape.type
-        if t == GeometryType.MULTILINESTRING:
-            geom = self.xform_multilinestring(shape, ndims)
-        elif t == GeometryType.LINESTRING:
-            geom = self.xform_line(shape, ndims)
-        elif t == GeometryType.MULTIPOINT:
-            geom = self.xform_multipoint(shape, ndims)
-        elif t == GeometryType.POINT:
-            geom = self.xform_point(shape, ndims)
-        # elif t == GeometryType.POLYGON:
-        #     geom = self.xform_polygon(shape, ndims)
-        else:
-            raise NotImplementedError(f"Unimplemented type {t}")
-        return geom
-
-    def xform_polygon(self, shape : GeometryShape, ndims : int) -> ogr.Geometry:
-        assert(shape.type == GeometryType.POLYGON)
-        geom = ogr.Geometry(ogr.wkbPolygon)
-        ring = ogr.Geometry(ogr.wkbLinearRing)
-        # TODO
-        
-
-    def xform_multilinestring(self, shape : GeometryShape, dims : int) -> ogr.Geometry:
-        assert(shape.type == GeometryType.MULTILINESTRING)
-        geom = ogr.Geometry(ogr.wkbMultiLineString)
-        for i in range(0,len(shape.geoms)):
-            o = self.xform_line(shape.geoms[i], dims)
-            geom.AddGeometry(o)
-        return geom
-
-    @staticmethod
-    def fill_points(shape : GeometryShape, geom : ogr.Geometry, dims : int):
-        for i in range(0,len(shape.coordinates),dims):
-            x = shape.coordinates[i+0]
-            y = shape.coordinates[i+1]
-            z = 0
-            if dims > 2:
-                z = shape.coordinates[i+2]
-            geom.AddPoint(x, y, z)        
-
-    def xform_line(self, shape : GeometryShape, dims : int) -> ogr.Geometry:
-        assert(shape.type == GeometryType.LINESTRING)
-        geom = ogr.Geometry(ogr.wkbLineString)
-        self.fill_points(shape, geom, dims)
-        return geom
-
-    def xform_point(self, shape : GeometryShape, dims : int) -> ogr.Geometry:
-        assert(shape.type == GeometryType.POINT)
-        geom = ogr.Geometry(ogr.wkbMultiPoint)
-        self.fill_points(shape, geom, dims)
-        return geom
-
-    def xform_multipoint(self, shape : GeometryShape, dims : int) -> ogr.Geometry:
-        assert(shape.type == GeometryType.MULTIPOINT)
-        geom = ogr.Geometry(ogr.wkbPoint)
-        for i in range(0,len(shape.geoms)):
-            o = self.xform_point(shape.geoms[i], dims)
-            geom.AddGeometry(o)
-        return geom
\ No newline at end of file
+        return ogr.CreateGeometryFromWkb(to_wkb(shape))
+
+    def write_layer(self, layer : ogr.Layer, shapes : Iterable[GeometryShape]) -> int:
+        """
+        Adds one feature per shape to an existing layer, inside a single
+        transaction
+
+        Returns:
+            int - the number of features created
+        """
+        defn = layer.GetLayerDefn()
+        count = 0
+        layer.StartTransaction()
+        try:
+            for shape in shapes:
+                feature = ogr.Feature(defn)
+                feature.SetGeometryDirectly(self.convert(shape))
+                if layer.CreateFeature(feature) != 0:
+                    raise RuntimeError(f"Failed to create feature {count} in layer {layer.GetName()}")
+                count += 1
+        except BaseException:
+            layer.RollbackTransaction()
+            raise
+        layer.CommitTransaction()
+        return count
+
+    def create_layer(self, datasource : ogr.DataSource, name : str, shapes : Iterable[GeometryShape],
+                     srs = None, geom_type : int = ogr.wkbUnknown) -> ogr.Layer:
+        """
+        Creates a layer in `datasource` (e.g. from the 'Memory' or 'GPKG'
+        driver) and fills it with the shapes, see write_layer()
+        """
+        layer = datasource.CreateLayer(name, srs, geom_type)
+        if layer is None:
+            raise RuntimeError(f"Failed to create layer {name}")
+        self.write_layer(layer, shapes)
+        return layer
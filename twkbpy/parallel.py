@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+Decoding of large TWKB record files across a process pool.
+
+The parent only works out record boundaries; every worker maps the file
+itself, decodes its byte range and sends back a compact GeometryColumns.
+"""
+import mmap
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Iterator, List, Optional, Tuple
+
+from .columnar import GeometryColumns
+from .context import BufferDecoderContext
+from .index import TwkbIndex
+from .twkb_file import TwkbFile
+
+CHUNK_BYTES = 8 * 1024 * 1024
+
+def split_records(path : str, chunk_bytes : int = CHUNK_BYTES,
+                  index : Optional[TwkbIndex] = None) -> List[Tuple[int, int]]:
+    """
+    Splits a record file into (start, end) byte ranges of roughly
+    `chunk_bytes` that begin and end on record boundaries
+    """
+    with TwkbFile(path, index=index) as reader:
+        len(reader)
+        offsets = reader.offsets
+        size = len(reader.data)
+    ranges = []
+    start = 0
+    for offset in offsets:
+        if offset - start >= chunk_bytes:
+            ranges.append((start, offset))
+            start = offset
+    if start < size:
+        ranges.append((start, size))
+    return ranges
+
+def decode_range(path : str, start : int, end : int) -> GeometryColumns:
+    """
+    Decodes the records in [start, end) of a file.  Runs in the workers.
+    """
+    columns = GeometryColumns()
+    with open(path, 'rb') as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        ta_struct = BufferDecoderContext(data, start)
+        ta_struct.end = end
+        try:
+            while not ta_struct.at_eof():
+                columns.read_record(ta_struct, ta_struct.tell())
+        finally:
+            ta_struct.release()
+    finally:
+        data.close()
+    return columns
+
+def parallel_decode(path : str, max_workers : Optional[int] = None, chunk_bytes : int = CHUNK_BYTES,
+                    ordered : bool = True, index : Optional[TwkbIndex] = None) -> Iterator[GeometryColumns]:
+    """
+    Decodes a record file on a ProcessPoolExecutor, yielding one
+    GeometryColumns per chunk.  With ordered=False chunks are yielded as
+    they complete; their `record_offsets` still tell where they came from.
+    """
+    ranges = split_records(path, chunk_bytes, index)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [ executor.submit(decode_range, path, start, end) for start, end in ranges ]
+        for future in (futures if ordered else as_completed(futures)):
+            yield future.result()
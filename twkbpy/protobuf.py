@@ -1,5 +1,5 @@
 # -*- coding: utf-8 -*-
-from twkbpy.context import DecoderContext
+from twkbpy.context import DecoderContext, MAX_VARINT_LEN
 
 def unzigzag(n_val : int) -> int:
     """
@@ -13,22 +13,23 @@ def read_varint64(ta_struct : DecoderContext) -> int:
     """
     Read unsigned variable length integer
     """
-    #print("read_varint64")
-    #cursor = ta_struct['cursor']
+    if ta_struct.end - ta_struct.pos < MAX_VARINT_LEN:
+        ta_struct.fill()
+    buf = ta_struct.buf
+    pos = ta_struct.pos
+    end = ta_struct.end
     n_val = 0
     n_shift = 0
-    result = 0
     while True:
-        n_byte = ta_struct.next()
+        if pos >= end:
+            raise EOFError("Unexpected end of TWKB data")
+        n_byte = buf[pos]
+        pos += 1
         if (n_byte & 0x80) == 0:
-            #cursor += 1
-            #ta_struct['cursor'] = cursor
-            result = n_val | (n_byte << n_shift)
-            break
+            ta_struct.pos = pos
+            return n_val | (n_byte << n_shift)
         n_val = n_val | (n_byte & 0x7f) << n_shift
-        #cursor += 1
         n_shift += 7
-    return result
 
 
 def read_varsint64(ta_struct : DecoderContext) -> int:
@@ -38,3 +39,28 @@ def read_varsint64(ta_struct : DecoderContext) -> int:
     #print("read_varsint64")
     n_val = read_varint64(ta_struct)
     return unzigzag(n_val)
+
+
+# every byte value with the continuation bit set
+_CONTINUATION_BYTES = bytes(range(0x80, 0x100))
+
+def skip_varints(ta_struct : DecoderContext, count : int):
+    """
+    Moves the cursor past `count` varints without decoding them.  The next
+    `count` varints take at least `count` bytes, so a window of that many
+    bytes never holds more terminating bytes than are still needed.
+
+    The EOFError raised when the data runs out has a `missing` attribute:
+    the number of varints left, a lower bound of the bytes still needed.
+    """
+    remaining = count
+    while remaining > 0:
+        ta_struct.fill(remaining)
+        pos = ta_struct.pos
+        window = bytes(ta_struct.buf[pos:pos + remaining])
+        if not window:
+            error = EOFError("Unexpected end of TWKB data")
+            error.missing = remaining
+            raise error
+        ta_struct.pos = pos + len(window)
+        remaining -= len(window.translate(None, _CONTINUATION_BYTES))
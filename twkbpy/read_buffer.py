@@ -1,30 +1,74 @@
 import math
-from typing import Callable, List, Any, Optional
-from dataclasses import dataclass
+from array import array
+from itertools import cycle
+from operator import truediv
+from time import perf_counter
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
-from .context import DecoderContext
+from .context import DecoderContext, BufferDecoderContext, MAX_VARINT_LEN
 from .constants import GeometryType
-from .protobuf import unzigzag, read_varsint64, read_varint64
-from .context import DecoderContext
+from .protobuf import unzigzag, read_varsint64, read_varint64, skip_varints
+from .kernels import ORDINATES, pa_kernels, slot
+from .simplify import LINE, OUTER_RING, INNER_RING, simplify_run, scale_kept
 
 class GeometryShape:
+    """
+    A decoded geometry.
+
+    All vertices of a point, linestring, polygon or multi-geometry live in
+    the one flat buffer `coords`: an array('d') with ndims ordinates per
+    vertex, or an (n, ndims) ndarray in numpy mode.  `ring_offsets` holds the
+    vertex index at which each polygon ring starts, plus the end.
+    `part_offsets` does the same for the members of a multilinestring (in
+    vertices) or multipolygon (in rings); multipoint members are one vertex
+    each.  Rings (`coordinates` of a polygon) and members (`geoms`) are
+    handed out as view shapes over the same buffers, selected by `start` and
+    `end`.  Collections keep their members as a list in `geoms`.
+
+    `precision` holds the number of decimal digits of every ordinate as
+    encoded in the record header, `has_m` tells an XYM shape from an XYZ
+    one.
+
+    Shapes decoded with an integer coord_type keep the quantized ordinates
+    in `coords` (array('q') or array('i'), int64 or int32 in numpy mode)
+    and the factors that scale them to coordinate units in `scale`, one per
+    dimension; `scale` is None for float shapes.
+    """
+    __slots__ = ('type', '_ndims', 'dims', 'ids', 'bbox', 'precision', 'has_m', 'scale', 'offset',
+                 'coords', 'part_offsets', 'ring_offsets', '_geoms', 'start', 'end')
+
     def __init__(self, 
             type : GeometryType, 
             dims : Optional[List[int]] = None, 
             ids : Optional[List[int]] = None, 
             geoms : Optional[List[Any]] = None, 
-            coordinates : Optional[List[float]] = None,
-            ndims : Optional[int] = None
+            coordinates : Optional[Sequence[float]] = None,
+            ndims : Optional[int] = None,
+            part_offsets : Optional[array] = None,
+            ring_offsets : Optional[array] = None,
+            start : int = 0,
+            end : Optional[int] = None
             ) :
         self.type = type
+        # header bbox in coordinate units, when the record carried one
+        self.bbox : Optional[List[float]] = None
+        self.precision : Optional[List[int]] = None
+        self.has_m = False
+        self.scale : Optional[Tuple[float, ...]] = None
+        self.start = start
+        self.end = end
         if not dims is None:
            self.dims = dims
         if not ids is None:
             self.ids = ids
         if not geoms is None:
-            self.geoms = geoms
+            self._geoms = geoms
         if not coordinates is None:
-            self.coordinates = coordinates
+            self.coords = coordinates
+        if not part_offsets is None:
+            self.part_offsets = part_offsets
+        if not ring_offsets is None:
+            self.ring_offsets = ring_offsets
         if not ndims is None:
             self._ndims = ndims
 
@@ -36,27 +80,232 @@ class GeometryShape:
     def ndims(self, value : int):
         self._ndims = value
 
-DEBUG=False
+    def view(self, _type : GeometryType, start : int, end : int) -> 'GeometryShape':
+        """
+        Shape of type `_type` sharing this shape's buffers; `start` and
+        `end` are vertex indexes for points and linestrings, ring indexes
+        for polygons
+        """
+        shape = GeometryShape(type = _type, coordinates = self.coords, ndims = self._ndims,
+                              start = start, end = end)
+        shape.precision = self.precision
+        shape.has_m = self.has_m
+        shape.scale = self.scale
+        if _type == GeometryType.POLYGON:
+            shape.ring_offsets = self.ring_offsets
+        return shape
+
+    def dequantize(self) -> 'GeometryShape':
+        """
+        Float copy of a shape decoded with an integer coord_type, with its
+        ordinates divided by `scale`; float shapes are returned as they are
+        """
+        scale = self.scale
+        if scale is None:
+            return self
+        shape = GeometryShape(type = self.type, ndims = self._ndims, start = self.start, end = self.end)
+        for name in ('dims', 'ids', 'bbox', 'precision', 'has_m', 'offset', 'part_offsets', 'ring_offsets'):
+            if hasattr(self, name):
+                setattr(shape, name, getattr(self, name))
+        if self.type == GeometryType.COLLECTION:
+            shape._geoms = [ geom.dequantize() for geom in self._geoms ]
+        else:
+            coords = self.coords
+            if coords is None:
+                shape.coords = None
+            elif getattr(coords, 'ndim', 1) == 2:
+                shape.coords = coords / scale
+            else:
+                shape.coords = array('d', map(truediv, coords, cycle(scale)))
+        return shape
+
+    @property
+    def coordinates(self):
+        """
+        Flat coordinates of a point or linestring, ring shapes of a polygon
+        """
+        _type = self.type
+        if _type != GeometryType.COLLECTION and self.coords is None:
+            # empty geometry
+            return []
+        if _type == GeometryType.POINT or _type == GeometryType.LINESTRING:
+            coords = self.coords
+            if self.end is None:
+                return coords
+            if getattr(coords, 'ndim', 1) == 2:
+                return coords[self.start:self.end]
+            return memoryview(coords)[self.start * self._ndims:self.end * self._ndims]
+        if _type == GeometryType.POLYGON:
+            rings = self.ring_offsets
+            end = len(rings) - 1 if self.end is None else self.end
+            return [ self.view(GeometryType.LINESTRING, rings[r], rings[r + 1])
+                     for r in range(self.start, end) ]
+        raise AttributeError('coordinates')
+
+    @property
+    def geoms(self) -> List['GeometryShape']:
+        """
+        Members of a multi-geometry or collection
+        """
+        _type = self.type
+        if _type == GeometryType.COLLECTION:
+            return self._geoms
+        if _type in MULTI_TYPES and self.coords is None:
+            # empty multi-geometry
+            return []
+        if _type == GeometryType.MULTIPOINT:
+            coords = self.coords
+            npoints = len(coords) if getattr(coords, 'ndim', 1) == 2 else len(coords) // self._ndims
+            return [ self.view(GeometryType.POINT, i, i + 1) for i in range(0, npoints) ]
+        if _type == GeometryType.MULTILINESTRING:
+            part_type = GeometryType.LINESTRING
+        elif _type == GeometryType.MULTIPOLYGON:
+            part_type = GeometryType.POLYGON
+        else:
+            raise AttributeError('geoms')
+        parts = self.part_offsets
+        return [ self.view(part_type, parts[i], parts[i + 1]) for i in range(0, len(parts) - 1) ]
+
+class LazyGeometryShape(GeometryShape):
+    """
+    Geometry read from a size-prefixed record whose body is kept as raw
+    bytes and only decoded the first time coordinates, geoms or ids are
+    accessed
+    """
+    LAZY_ATTRS = ('coordinates', 'geoms', 'ids', 'coords', 'part_offsets', 'ring_offsets', '_geoms')
+
+    def __init__(self, type : GeometryType, ndims : int, header : dict, body, body_span : Tuple[int, int]):
+        super().__init__(type = type, ndims = ndims)
+        self.header = header
+        self.body_span = body_span
+        self._body = body
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._body is None
+
+    def load(self):
+        if self._body is None:
+            return
+        ta_struct = BufferDecoderContext(self._body)
+        ta_struct.load_header(self.header)
+        shape = read_objects(ta_struct)
+        for name in ('coords', 'part_offsets', 'ring_offsets', '_geoms', 'ids'):
+            if hasattr(shape, name):
+                setattr(self, name, getattr(shape, name))
+        self._body = None
+
+    def __getattr__(self, name):
+        # only called for attributes that are not set yet
+        if name in LazyGeometryShape.LAZY_ATTRS and self.__dict__.get('_body') is not None:
+            self.load()
+            return getattr(self, name)
+        raise AttributeError(name)
+
+MULTI_TYPES = (GeometryType.MULTIPOINT, GeometryType.MULTILINESTRING,
+               GeometryType.MULTIPOLYGON, GeometryType.COLLECTION)
+
+# Unrolled varint + zigzag + delta kernels for read_pa, one per dimension
+# count (see kernels.py).  Each decodes `npoints` vertices from `buf`
+# starting at `pos` into `coords` from index `base` on, updates `refpoint`
+# in place and returns the new cursor position.  These scale the
+# ordinates by the record's factors, e.g. for 3 dimensions:
+#
+#     fx, fy, fz = factors[0:3]
+#     for i in range(base, base + npoints * 3, 3):
+#         <varint, zigzag and delta of x, y, z>
+#         coords[i] = x / fx; coords[i + 1] = y / fy; coords[i + 2] = z / fz
+_PA_KERNELS = pa_kernels('',
+    lambda ndims: [ ', '.join([ 'f' + o for o in ORDINATES[:ndims] ]) + f' = factors[0:{ndims}]' ],
+    lambda ndims: [ f'coords[{slot(k)}] = {o} / f{o}' for k, o in enumerate(ORDINATES[:ndims]) ])
+
+# The same kernels for integer coordinate buffers (coord_type 'q' or 'i'),
+# storing the accumulated values without scaling them.
+_PA_INT_KERNELS = pa_kernels('_int', lambda ndims: [],
+    lambda ndims: [ f'coords[{slot(k)}] = {o}' for k, o in enumerate(ORDINATES[:ndims]) ])
+
+# The same kernels with a CoordTransform fused in: `factors` is the tuple
+# of CoordTransform.coefficients(), already divided by the record's factors.
+def _xform_store(ndims : int) -> List[str]:
+    store = [ 'coords[i] = xx * x + xy * y + xo',
+              'if project is None:\n    coords[i + 1] = yx * x + yy * y + yo\n'
+              'else:\n    coords[i + 1] = project(yx * x + yy * y + yo)' ]
+    if ndims > 2:
+        store.append('coords[i + 2] = s2 * z + o2')
+    if ndims > 3:
+        store.append('coords[i + 3] = s3 * m + o3')
+    return store
+
+_PA_XFORM_KERNELS = pa_kernels('_xform', lambda ndims: [ 'xx, xy, xo, yx, yy, yo, s2, o2, s3, o3, project = factors' ],
+                               _xform_store)
+
+def new_coord_buffer(ta_struct : DecoderContext):
+    """
+    Empty buffer for read_pa() to append the vertices of a whole geometry to
+    """
+    return [] if ta_struct.use_numpy else array(ta_struct.coord_type)
 
-def read_pa(ta_struct : DecoderContext, npoints : int) -> List[float]:
+def finish_coord_buffer(ta_struct : DecoderContext, coords):
+    if ta_struct.use_numpy:
+        from .numpy_pa import concat_pa
+        return concat_pa(coords, ta_struct.ndims, ta_struct.coord_type)
+    return coords
+
+def read_pa(ta_struct : DecoderContext, npoints : int, coords = None):
     """
     Reads an array of delta compressed integers from the decoder context
-    and scales them back into coordinates
+    and scales them back into coordinates, or keeps them quantized when the
+    context's coord_type is an integer one.  The context's CoordTransform,
+    if any, is applied in the same pass.
+
+    If `coords` is a buffer from new_coord_buffer() the vertices are
+    appended to it, otherwise a new buffer is returned.
 
     Returns:
-        coords : List[float]
+        coords : array of npoints * ndims flat coordinates, or an
+                 (npoints, ndims) ndarray when the context uses numpy
     """
-    if DEBUG:
-        print("read_pa")
+    if ta_struct.use_numpy:
+        from .numpy_pa import read_pa_numpy
+        if ta_struct.stats is not None:
+            pa = ta_struct.stats.timed('coordinates', read_pa_numpy, ta_struct, npoints)
+            ta_struct.stats.vertices += npoints
+        else:
+            pa = read_pa_numpy(ta_struct, npoints)
+        if coords is None:
+            return pa
+        coords.append(pa)
+        return coords
     ndims = ta_struct.ndims
     assert(ndims != 0)
-    factors = ta_struct.factors
-    coords = [0.0] * (npoints * ndims)
-
-    for i in range(0, npoints):
-        for j in range(0, ndims):
-            ta_struct.refpoint[j] += read_varsint64(ta_struct)
-            coords[ndims * i + j] = ta_struct.refpoint[j] / factors[j]
+    coord_type = ta_struct.coord_type
+    if coords is None:
+        coords = array(coord_type, [0]) * (npoints * ndims)
+        base = 0
+    else:
+        base = len(coords)
+        coords.frombytes(bytes(coords.itemsize * npoints * ndims))
+    if npoints == 0:
+        return coords
+
+    ta_struct.fill(npoints * ndims * MAX_VARINT_LEN)
+    stats = ta_struct.stats
+    if stats is not None:
+        started = perf_counter()
+    try:
+        transform = ta_struct.transform
+        if transform is not None:
+            kernel = _PA_XFORM_KERNELS[ndims]
+            factors = transform.coefficients(ta_struct.factors, ta_struct.has_z)
+        else:
+            kernel = (_PA_KERNELS if coord_type == 'd' else _PA_INT_KERNELS)[ndims]
+            factors = ta_struct.factors
+        ta_struct.pos = kernel(ta_struct.buf, ta_struct.pos, npoints, ta_struct.refpoint, factors, coords, base)
+    except IndexError:
+        raise EOFError("Unexpected end of TWKB data") from None
+    if stats is not None:
+        stats.add_time('coordinates', perf_counter() - started)
+        stats.vertices += npoints
 
     '''
     # calculates the bbox if it hasn't it
@@ -76,13 +325,46 @@ def read_pa(ta_struct : DecoderContext, npoints : int) -> List[float]:
     '''
     return coords
 
+def read_part(ta_struct : DecoderContext, npoints : int, coords = None, kind : int = LINE):
+    """
+    read_pa() for a line or a ring, simplified when the context has a
+    Simplify.  A simplified ring left with fewer than 4 vertices is dropped
+    if it is a hole, and read again in full if it is an outer ring.
+
+    Returns:
+        (coords, count) - the buffer as read_pa() returns it, and the
+                          number of vertices added to it, or None for a
+                          hole dropped by the simplification
+    """
+    simplify = ta_struct.simplify
+    if simplify is None or npoints <= (2 if kind == LINE else 4):
+        return read_pa(ta_struct, npoints, coords), npoints
+    ndims = ta_struct.ndims
+    # buffered up front, so that pos stays valid for reading the ring again
+    ta_struct.fill(npoints * ndims * MAX_VARINT_LEN)
+    pos, refpoint = ta_struct.pos, ta_struct.refpoint[:]
+    kept = simplify_run(ta_struct, npoints, kind != LINE)
+    count = len(kept) // ndims
+    if kind != LINE and count < 4:
+        if kind == INNER_RING:
+            return coords, None
+        ta_struct.pos = pos
+        ta_struct.refpoint[:] = refpoint
+        return read_pa(ta_struct, npoints, coords), npoints
+    values = scale_kept(ta_struct, kept)
+    if coords is None:
+        return values, count
+    if ta_struct.use_numpy:
+        coords.append(values)
+    else:
+        coords.extend(values)
+    return coords, count
+
 
 def read_id_list(ta_struct : DecoderContext, n : int) -> List[int]:
     """
     Reads a list of IDs
     """
-    if DEBUG:
-        print("read_id_list")
     id_list = []
     for _i in range(0, n):
         id_list.append(read_varsint64(ta_struct))
@@ -96,8 +378,6 @@ def parse_point(ta_struct : DecoderContext) -> GeometryShape:
     Returns:
         GeometryShape - coordinates for the single point that was read
     """
-    if DEBUG:
-        print("parse_point")
     return GeometryShape(type = GeometryType.POINT, coordinates = read_pa(ta_struct, 1))
 
 
@@ -108,60 +388,76 @@ def parse_line(ta_struct : DecoderContext) -> GeometryShape:
     Returns:
         GeometryShape - coordinates for a piecewise linear series of points
     """
-    if DEBUG:
-        print("parse_line")
     _type = GeometryType.LINESTRING
     npoints = read_varint64(ta_struct)
-    coords = read_pa(ta_struct, npoints)
-    if DEBUG:
-        print(f"parse_line -> {_type},{coords}")
+    coords, _count = read_part(ta_struct, npoints)
     return GeometryShape(type = _type, coordinates = coords)
 
+def read_rings(ta_struct : DecoderContext, coords, ring_offsets : array):
+    """
+    Reads the rings of one polygon, appending their vertices to `coords`
+    and their ends to `ring_offsets`
+    """
+    nrings = read_varint64(ta_struct)
+    for ring in range(0, nrings):
+        npoints = read_varint64(ta_struct)
+        coords, count = read_part(ta_struct, npoints, coords, INNER_RING if ring else OUTER_RING)
+        if count is not None:
+            ring_offsets.append(ring_offsets[-1] + count)
+    return coords
+
 def parse_polygon(ta_struct : DecoderContext) -> GeometryShape:
     """
     Reads and parses bytes the form a polygon
 
     Returns:
-        GeometryShape - coordinates for a series of polygon rings
+        GeometryShape - vertices of all rings, with ring offsets
     """
-    if DEBUG:
-        print("parse_polygon")
-    coords = []
-    nrings = read_varint64(ta_struct)
-    for _ring in range(0, nrings):
-        coords.append(parse_line(ta_struct))
-    return GeometryShape(type = GeometryType.POLYGON, coordinates = coords)
+    ring_offsets = array('q', [ 0 ])
+    coords = read_rings(ta_struct, new_coord_buffer(ta_struct), ring_offsets)
+    return GeometryShape(type = GeometryType.POLYGON,
+                         coordinates = finish_coord_buffer(ta_struct, coords),
+                         ring_offsets = ring_offsets)
 
-def parse_multi(ta_struct : DecoderContext, 
-                parser : Callable[[DecoderContext], GeometryShape]) -> GeometryShape :
+def parse_multi(ta_struct : DecoderContext) -> GeometryShape :
     """
-    Reads and parses bytes that form a multi-entity geometry
+    Reads and parses bytes that form a multipoint, multilinestring or
+    multipolygon into one vertex buffer with part (and ring) offsets
     """
-    if DEBUG:
-        print("parse_multi")
     if ta_struct.type is None: raise ValueError("Can't parse unknown type")
     _type = ta_struct.type
     ngeoms = read_varint64(ta_struct)
-    geoms : List[GeometryShape] = []
     id_list = []
     if ta_struct.has_idlist:
         id_list = read_id_list(ta_struct, ngeoms)
 
-    for _i in range(0, ngeoms):
-        geo = parser(ta_struct)
-        geoms.append(geo)
+    coords = new_coord_buffer(ta_struct)
+    part_offsets = None
+    ring_offsets = None
+    if _type == GeometryType.MULTIPOINT:
+        coords = read_pa(ta_struct, ngeoms, coords)
+    elif _type == GeometryType.MULTILINESTRING:
+        part_offsets = array('q', [ 0 ])
+        for _i in range(0, ngeoms):
+            npoints = read_varint64(ta_struct)
+            coords, count = read_part(ta_struct, npoints, coords)
+            part_offsets.append(part_offsets[-1] + count)
+    else:
+        part_offsets = array('q', [ 0 ])
+        ring_offsets = array('q', [ 0 ])
+        for _i in range(0, ngeoms):
+            coords = read_rings(ta_struct, coords, ring_offsets)
+            part_offsets.append(len(ring_offsets) - 1)
 
-    if DEBUG:
-        print(f"parse_multi -> {_type},{id_list},{geoms}")
     return GeometryShape(
         type=_type,
         ids=id_list,
-        geoms=geoms
+        coordinates=finish_coord_buffer(ta_struct, coords),
+        part_offsets=part_offsets,
+        ring_offsets=ring_offsets
     )
 
 def parse_collection(ta_struct : DecoderContext) -> GeometryShape:
-    if DEBUG:
-        print("parse_collection")
     if ta_struct.type is None: raise ValueError("Can't parse unknown type")
     geom_type = ta_struct.type
     ngeoms = read_varint64(ta_struct)
@@ -170,9 +466,13 @@ def parse_collection(ta_struct : DecoderContext) -> GeometryShape:
     if ta_struct.has_idlist:
         id_list = read_id_list(ta_struct, ngeoms)
 
+    # every member has its own header, which must not replace the
+    # collection's
+    header = ta_struct.save_header()
     for _i in range(0, ngeoms):
         geo = read_buffer(ta_struct)
         geoms.append(geo)
+    ta_struct.load_header(header)
 
     shape = GeometryShape(
         type = geom_type,
@@ -182,11 +482,73 @@ def parse_collection(ta_struct : DecoderContext) -> GeometryShape:
     )
     return shape
 
+def walk_line(ta_struct : DecoderContext):
+    skip_varints(ta_struct, read_varint64(ta_struct) * ta_struct.ndims)
+
+def walk_polygon(ta_struct : DecoderContext):
+    for _ring in range(0, read_varint64(ta_struct)):
+        walk_line(ta_struct)
+
+def walk_members(ta_struct : DecoderContext, _type : GeometryType, ngeoms : int):
+    """
+    Walks the members of a multi-geometry or collection whose member count
+    and id list have already been read
+    """
+    ndims = ta_struct.ndims
+    if _type == GeometryType.MULTIPOINT:
+        skip_varints(ta_struct, ngeoms * ndims)
+    elif _type == GeometryType.MULTILINESTRING:
+        for _i in range(0, ngeoms):
+            walk_line(ta_struct)
+    elif _type == GeometryType.MULTIPOLYGON:
+        for _i in range(0, ngeoms):
+            walk_polygon(ta_struct)
+    else:
+        header = ta_struct.save_header()
+        for _i in range(0, ngeoms):
+            read_header(ta_struct)
+            skip_body(ta_struct)
+        ta_struct.load_header(header)
+
+def walk_objects(ta_struct : DecoderContext):
+    """
+    Counterpart of read_objects() that only moves the cursor past the body
+    """
+    _type = ta_struct.type
+    if ta_struct.is_empty:
+        return
+    if _type == GeometryType.POINT:
+        skip_varints(ta_struct, ta_struct.ndims)
+    elif _type == GeometryType.LINESTRING:
+        walk_line(ta_struct)
+    elif _type == GeometryType.POLYGON:
+        walk_polygon(ta_struct)
+    elif _type in MULTI_TYPES:
+        ngeoms = read_varint64(ta_struct)
+        if ta_struct.has_idlist:
+            skip_varints(ta_struct, ngeoms)
+        walk_members(ta_struct, _type, ngeoms)
+    else:
+        raise TypeError('Unknown type: %s' % _type)
+
+def empty_shape(_type : GeometryType) -> GeometryShape:
+    """
+    Shape of a record flagged empty, which has no body: coords None, or no
+    members for a collection
+    """
+    if _type == GeometryType.COLLECTION:
+        return GeometryShape(type = _type, ids = [], geoms = [])
+    shape = GeometryShape(type = _type, ids = [] if _type in MULTI_TYPES else None)
+    shape.coords = None
+    return shape
+
 def read_objects(ta_struct : DecoderContext) -> GeometryShape:
-    if DEBUG:
-        print("read_objects")
     type = ta_struct.type
-    for i in range(0, ta_struct.ndims + 1):
+    if ta_struct.stats is not None:
+        ta_struct.stats.add_geometry(type)
+    if ta_struct.is_empty:
+        return empty_shape(type)
+    for i in range(0, ta_struct.ndims):
         ta_struct.refpoint[i] = 0
 
     if type == GeometryType.POINT:
@@ -198,14 +560,9 @@ def read_objects(ta_struct : DecoderContext) -> GeometryShape:
     if type == GeometryType.POLYGON:
         return parse_polygon(ta_struct)
 
-    if type == GeometryType.MULTIPOINT:
-        return parse_multi(ta_struct, parse_point)
-
-    if type == GeometryType.MULTILINESTRING:
-        return parse_multi(ta_struct, parse_line)
-
-    if type == GeometryType.MULTIPOLYGON:
-        return parse_multi(ta_struct, parse_polygon)
+    if type == GeometryType.MULTIPOINT or type == GeometryType.MULTILINESTRING \
+            or type == GeometryType.MULTIPOLYGON:
+        return parse_multi(ta_struct)
 
     if type == GeometryType.COLLECTION:
         return parse_collection(ta_struct)
@@ -213,65 +570,105 @@ def read_objects(ta_struct : DecoderContext) -> GeometryShape:
     raise TypeError('Unknown type: %s' % type)
 
 
-def read_buffer(ta_struct : DecoderContext) -> GeometryShape:
-    if DEBUG:
-        print("read_buffer")
-    has_z = 0
-    has_m = 0
+# GeometryType of every type nibble of the first header byte, None where
+# the value is undefined
+GEOMETRY_TYPES : List[Optional[GeometryType]] = [ { t.value: t for t in GeometryType }.get(value)
+                                                  for value in range(0, 16) ]
 
-    flag = ta_struct.next()
+# precision_xy of every precision nibble
+PRECISIONS_XY = [ unzigzag(nibble) for nibble in range(0, 16) ]
 
-    precision_xy = unzigzag((flag & 0xF0) >> 4)
-    ta_struct.type = GeometryType(flag & 0x0F)
-    ta_struct.factors = [ 0.0 ] * 4
-    precision_xy = math.pow(10, precision_xy)
-    ta_struct.factors[0] = precision_xy
-    ta_struct.factors[1] = precision_xy
+# (has_z, has_m, precision_z, precision_m) of every extended dims byte
+EXTENDED_DIMS = [ ((ext & 0x01) != 0, (ext & 0x02) != 0, (ext & 0x1C) >> 2, (ext & 0xE0) >> 5)
+                  for ext in range(0, 256) ]
 
-    if DEBUG: 
-        print(f" - precision_xy = {precision_xy}")
-        print(f" - type = {ta_struct.type}")
+# ordinate scale factors, keyed by the precision nibble of the first header
+# byte plus the extended dims byte << 8; filled on first use
+_FACTORS : Dict[int, Tuple[float, ...]] = {}
+
+def scale_factors(key : int) -> Tuple[float, ...]:
+    """
+    10 ** precision of every ordinate, for a _FACTORS key.  The tuples are
+    shared between records and must not be modified.
+    """
+    factors = _FACTORS.get(key)
+    if factors is None:
+        xy = math.pow(10, PRECISIONS_XY[(key & 0xF0) >> 4])
+        has_z, has_m, precision_z, precision_m = EXTENDED_DIMS[key >> 8]
+        values = [ xy, xy, 0.0, 0.0 ]
+        if has_z:
+            values[2] = math.pow(10, precision_z)
+        if has_m:
+            values[2 + has_z] = math.pow(10, precision_m)
+        factors = _FACTORS[key] = tuple(values)
+    return factors
+
+def read_header(ta_struct : DecoderContext):
+    """
+    Parses the record header (type and precision, metadata flags, extended
+    dimensions, size and bbox) into the decoder context, leaving the cursor
+    at the start of the geometry body.  Types, precisions and scale factors
+    come from the lookup tables above.
+    """
+    pos = ta_struct.pos
+    if ta_struct.end - pos < 3:
+        ta_struct.fill(3)
+        pos = ta_struct.pos
+        if ta_struct.end - pos < 2:
+            raise EOFError("Unexpected end of TWKB data")
+    buf = ta_struct.buf
+
+    flag = buf[pos]
+    _type = GEOMETRY_TYPES[flag & 0x0F]
+    if _type is None:
+        raise ValueError(f"{flag & 0x0F} is not a valid GeometryType")
+    ta_struct.type = _type
+    ta_struct.precision_xy = PRECISIONS_XY[flag >> 4]
+    key = flag & 0xF0
 
     # Metadata header
-    flag = ta_struct.next()
+    flag = buf[pos + 1]
+    pos += 2
 
     ta_struct.has_bbox = ((flag & 0x01) != 0)
     ta_struct.has_size = ((flag & 0x02) != 0)
     ta_struct.has_idlist = ((flag & 0x04) != 0)
     ta_struct.is_empty = ((flag & 0x10) != 0)
 
-    if DEBUG:
-        print(f" - has_bbox = {ta_struct.has_bbox}")
-        print(f" - has_size = {ta_struct.has_size}")
-        print(f" - has_idlist = {ta_struct.has_idlist}")
-        print(f" - is_empty = {ta_struct.is_empty}")
-
-    extended_dims = (flag & 0x08) != 0
-
     # the geometry has Z and/or M coordinates
-    if extended_dims:
-        extended_dims_flag = ta_struct.next()
-
-        # Strip Z/M presence and precision from ext byte
-        has_z = (extended_dims_flag & 0x01) != 0
-        has_m = (extended_dims_flag & 0x02) != 0
-        precision_z = (extended_dims_flag & 0x1C) >> 2
-        precision_m = (extended_dims_flag & 0xE0) >> 5
-
-        # Convert the precision into factor
-        if has_z:
-            ta_struct.factors[2] = math.pow(10, precision_z)
-        if has_m:
-            ta_struct.factors[2 + has_z] = math.pow(10, precision_m)
-        # store in the struct
-        ta_struct.has_z = has_z
-        ta_struct.has_m = has_m
+    if flag & 0x08:
+        if pos >= ta_struct.end:
+            raise EOFError("Unexpected end of TWKB data")
+        ext = buf[pos]
+        pos += 1
+        has_z, has_m, precision_z, precision_m = EXTENDED_DIMS[ext]
+        key |= ext << 8
+    else:
+        has_z = has_m = False
+        precision_z = precision_m = 0
+    ta_struct.pos = pos
+
+    factors = _FACTORS.get(key)
+    if factors is None:
+        factors = scale_factors(key)
+    ta_struct.factors = factors
+
+    # store in the struct; a reused context must not keep the previous
+    # record's values
+    ta_struct.has_z = has_z
+    ta_struct.has_m = has_m
+    ta_struct.precision_z = precision_z
+    ta_struct.precision_m = precision_m
+    ta_struct.size = 0
+    ta_struct.bbox = None
 
     ndims = 2 + has_z + has_m
     ta_struct.ndims = ndims
 
     if ta_struct.has_size:
         ta_struct.size = read_varint64(ta_struct)
+        # the size counts everything after the size field, bbox included
+        ta_struct.record_end = ta_struct.tell() + ta_struct.size
 
     if ta_struct.has_bbox:
         bbox = [ 0 ] * (ndims * 2)
@@ -282,6 +679,82 @@ def read_buffer(ta_struct : DecoderContext) -> GeometryShape:
             bbox[i + ndims] = max
         ta_struct.bbox = bbox
 
-    gshape = read_objects(ta_struct)
-    gshape.ndims = ta_struct.ndims
+
+def scaled_bbox(ta_struct : DecoderContext) -> Optional[List[float]]:
+    """
+    Header bbox of the current record in coordinate units, laid out as
+    [ min_0 .. min_n, max_0 .. max_n ]
+    """
+    bbox = ta_struct.bbox
+    if bbox is None:
+        return None
+    ndims = ta_struct.ndims
+    factors = ta_struct.factors
+    return [ bbox[i] / factors[i % ndims] for i in range(0, len(bbox)) ]
+
+
+def ordinate_precisions(ta_struct : DecoderContext) -> List[int]:
+    """
+    Decimal digits of every ordinate (x, y[, z][, m]) of the current record
+    """
+    precision = [ ta_struct.precision_xy, ta_struct.precision_xy ]
+    if ta_struct.has_z:
+        precision.append(ta_struct.precision_z)
+    if ta_struct.has_m:
+        precision.append(ta_struct.precision_m)
+    return precision
+
+def read_body(ta_struct : DecoderContext) -> GeometryShape:
+    """
+    Reads the geometry body of a record whose header has just been parsed
+    by read_header()
+    """
+    if ta_struct.lazy and ta_struct.has_size and not ta_struct.is_empty:
+        start = ta_struct.tell()
+        body = ta_struct.read(ta_struct.record_end - start)
+        gshape = LazyGeometryShape(ta_struct.type, ta_struct.ndims, ta_struct.save_header(),
+                                   body, (start, ta_struct.record_end))
+    else:
+        gshape = read_objects(ta_struct)
+        gshape.ndims = ta_struct.ndims
+    transform = ta_struct.transform
+    if transform is None:
+        if ta_struct.has_bbox:
+            gshape.bbox = scaled_bbox(ta_struct)
+        gshape.precision = ordinate_precisions(ta_struct)
+    else:
+        if ta_struct.has_bbox:
+            gshape.bbox = transform.transform_bbox(scaled_bbox(ta_struct), ta_struct.ndims, ta_struct.has_z)
+        gshape.precision = transform.output_precision(ta_struct.ndims)
+    gshape.has_m = bool(ta_struct.has_m)
+    if ta_struct.coord_type != 'd':
+        gshape.scale = tuple(ta_struct.factors[:ta_struct.ndims])
     return gshape
+
+
+def skip_body(ta_struct : DecoderContext, read_ids : bool = False) -> List[int]:
+    """
+    Moves the cursor past the body of a record whose header has just been
+    parsed, without decoding any coordinates.  Sized records are jumped
+    over, others are walked varint by varint.
+
+    Returns:
+        List[int] - the record's id list when read_ids is set, else []
+    """
+    ids : List[int] = []
+    _type = ta_struct.type
+    if read_ids and ta_struct.has_idlist and not ta_struct.is_empty and _type in MULTI_TYPES:
+        ngeoms = read_varint64(ta_struct)
+        ids = read_id_list(ta_struct, ngeoms)
+        if not ta_struct.has_size:
+            walk_members(ta_struct, _type, ngeoms)
+    elif not ta_struct.has_size:
+        walk_objects(ta_struct)
+    if ta_struct.has_size:
+        ta_struct.skip(ta_struct.record_end - ta_struct.tell())
+    return ids
+
+
+def read_buffer(ta_struct : DecoderContext) -> GeometryShape:
+    read_header(ta_struct)
+    return read_body(ta_struct)
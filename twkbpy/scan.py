@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+from dataclasses import dataclass, field
+from typing import Iterator, List, Optional
+
+from .constants import GeometryType
+from .context import create_context
+from .read_buffer import read_header, skip_body, scaled_bbox
+
+@dataclass
+class RecordHeader:
+    """
+    Metadata of one TWKB record, as reported by scan_headers()
+    """
+    offset : int
+    length : int
+    type : GeometryType
+    precision_xy : int
+    precision_z : int
+    precision_m : int
+    has_z : bool
+    has_m : bool
+    is_empty : bool
+    size : Optional[int] = None
+    bbox : Optional[List[float]] = None
+    ids : List[int] = field(default_factory=list)
+
+    @property
+    def ndims(self) -> int:
+        return 2 + self.has_z + self.has_m
+
+
+def scan_headers(stream) -> Iterator[RecordHeader]:
+    """
+    Yields the header of every record in a stream or buffer without
+    decoding any coordinates.  Bodies are jumped over using the size field
+    when present and walked varint by varint otherwise.
+    """
+    ta_struct = create_context(stream)
+    try:
+        while not ta_struct.at_eof():
+            offset = ta_struct.tell()
+            read_header(ta_struct)
+            header = RecordHeader(
+                offset = offset,
+                length = 0,
+                type = ta_struct.type,
+                precision_xy = ta_struct.precision_xy,
+                precision_z = ta_struct.precision_z,
+                precision_m = ta_struct.precision_m,
+                has_z = bool(ta_struct.has_z),
+                has_m = bool(ta_struct.has_m),
+                is_empty = ta_struct.is_empty,
+                size = ta_struct.size if ta_struct.has_size else None,
+                bbox = scaled_bbox(ta_struct)
+            )
+            header.ids = skip_body(ta_struct, read_ids=True)
+            header.length = ta_struct.tell() - offset
+            yield header
+    finally:
+        ta_struct.release()
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+Batch conversion to Shapely 2 geometries.
+
+Records are decoded into a GeometryColumns, and every geometry type in it
+is then built with a single shapely.from_ragged_array() call over
+coordinate and offset arrays gathered with numpy, so no Python code runs
+per geometry or per vertex.  Imported only by twkbpy.to_shapely(), so
+numpy and shapely stay optional dependencies.
+
+Shapely's ragged arrays are XY or XYZ: a third ordinate is taken as Z and
+the M of 4D records is dropped.
+"""
+import numpy as np
+import shapely
+
+from .columnar import GeometryColumns, decode_columns
+from .constants import GeometryType
+
+RAGGED_TYPES = {
+    GeometryType.POINT: shapely.GeometryType.POINT,
+    GeometryType.LINESTRING: shapely.GeometryType.LINESTRING,
+    GeometryType.POLYGON: shapely.GeometryType.POLYGON,
+    GeometryType.MULTIPOINT: shapely.GeometryType.MULTIPOINT,
+    GeometryType.MULTILINESTRING: shapely.GeometryType.MULTILINESTRING,
+    GeometryType.MULTIPOLYGON: shapely.GeometryType.MULTIPOLYGON,
+}
+
+# geometries without parts, and parts without rings
+EMPTY_GEOMETRIES = {
+    GeometryType.POINT: shapely.Point(),
+    GeometryType.LINESTRING: shapely.LineString(),
+    GeometryType.POLYGON: shapely.Polygon(),
+    GeometryType.MULTIPOINT: shapely.MultiPoint(),
+    GeometryType.MULTILINESTRING: shapely.MultiLineString(),
+    GeometryType.MULTIPOLYGON: shapely.MultiPolygon(),
+    GeometryType.COLLECTION: shapely.GeometryCollection(),
+}
+
+# constructors grouping members built one by one
+COLLECTORS = {
+    GeometryType.MULTIPOLYGON: shapely.multipolygons,
+    GeometryType.COLLECTION: shapely.geometrycollections,
+}
+
+def index_ranges(starts : np.ndarray, ends : np.ndarray) -> np.ndarray:
+    """
+    Concatenation of range(starts[i], ends[i]) for every i
+    """
+    counts = ends - starts
+    return np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum(), dtype=np.int64)
+
+def counts_to_offsets(counts : np.ndarray) -> np.ndarray:
+    offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    return offsets
+
+def gather_parts(coords : np.ndarray, part_offsets : np.ndarray, ring_offsets : np.ndarray,
+                 parts : np.ndarray):
+    """
+    Coordinates of the selected parts, with ring and part offsets rebased
+    onto them
+
+    Returns:
+        (coords, ring_offsets, part_offsets)
+    """
+    ring_starts = part_offsets[parts]
+    ring_ends = part_offsets[parts + 1]
+    rings = index_ranges(ring_starts, ring_ends)
+    vertex_starts = ring_offsets[rings]
+    vertex_ends = ring_offsets[rings + 1]
+    vertices = index_ranges(vertex_starts, vertex_ends)
+    return (coords[vertices], counts_to_offsets(vertex_ends - vertex_starts),
+            counts_to_offsets(ring_ends - ring_starts))
+
+def build_geometries(_type : GeometryType, coords : np.ndarray, ring_offsets : np.ndarray,
+                     part_offsets : np.ndarray, geometry_offsets : np.ndarray) -> np.ndarray:
+    """
+    One from_ragged_array() call for gathered geometries of a single type
+    """
+    ragged_type = RAGGED_TYPES[_type]
+    if _type == GeometryType.POINT:
+        return shapely.from_ragged_array(ragged_type, coords)
+    # vertex offsets of every part, for types whose parts have one ring
+    part_vertices = ring_offsets[part_offsets]
+    if _type == GeometryType.LINESTRING or _type == GeometryType.MULTIPOINT:
+        offsets = (part_vertices[geometry_offsets],)
+    elif _type == GeometryType.POLYGON:
+        offsets = (ring_offsets, part_offsets[geometry_offsets])
+    elif _type == GeometryType.MULTILINESTRING:
+        offsets = (part_vertices, geometry_offsets)
+    else:
+        offsets = (ring_offsets, part_offsets, geometry_offsets)
+    return shapely.from_ragged_array(ragged_type, coords, offsets)
+
+def columns_to_shapely(columns : GeometryColumns) -> np.ndarray:
+    """
+    Shapely geometries of every row of a GeometryColumns
+
+    Returns:
+        ndarray of shapely geometries, in record order
+    """
+    n = len(columns)
+    result = np.empty(n, dtype=object)
+    if n == 0:
+        return result
+    ndims = columns.ndims
+    coords = np.frombuffer(columns.coords, dtype=np.float64).reshape(-1, ndims)
+    if ndims > 3:
+        coords = coords[:, :3]
+    geometry_offsets = np.frombuffer(columns.geometry_offsets, dtype=np.int64)
+    part_offsets = np.frombuffer(columns.part_offsets, dtype=np.int64)
+    ring_offsets = np.frombuffer(columns.ring_offsets, dtype=np.int64)
+    types = np.frombuffer(columns.types, dtype=np.uint8)
+    part_types = np.frombuffer(columns.part_types, dtype=np.uint8)
+
+    for value in np.unique(types):
+        _type = GeometryType(int(value))
+        rows = np.flatnonzero(types == value)
+        part_counts = geometry_offsets[rows + 1] - geometry_offsets[rows]
+        # empty geometries have no parts
+        empty = part_counts == 0
+        if empty.any():
+            result[rows[empty]] = EMPTY_GEOMETRIES[_type]
+            rows = rows[~empty]
+            part_counts = part_counts[~empty]
+            if len(rows) == 0:
+                continue
+        parts = index_ranges(geometry_offsets[rows], geometry_offsets[rows + 1])
+        has_rings = part_offsets[parts + 1] > part_offsets[parts]
+        # from_ragged_array() can't take a multipolygon member without rings
+        if _type not in COLLECTORS or _type == GeometryType.MULTIPOLYGON and has_rings.all():
+            xyz, rings, part_rings = gather_parts(coords, part_offsets, ring_offsets, parts)
+            result[rows] = build_geometries(_type, xyz, rings, part_rings, counts_to_offsets(part_counts))
+            continue
+
+        # build the members by type, then group them
+        members = np.empty(len(parts), dtype=object)
+        member_types = part_types[parts]
+        for member_value in np.unique(member_types):
+            member_type = GeometryType(int(member_value))
+            selected = member_types == member_value
+            # empty members, or polygons without rings
+            members[selected & ~has_rings] = EMPTY_GEOMETRIES[member_type]
+            selected &= has_rings
+            if not selected.any():
+                continue
+            xyz, rings, part_rings = gather_parts(coords, part_offsets, ring_offsets, parts[selected])
+            members[selected] = build_geometries(member_type, xyz, rings, part_rings,
+                                                 np.arange(len(part_rings), dtype=np.int64))
+        owners = np.repeat(np.arange(len(rows)), part_counts)
+        result[rows] = COLLECTORS[_type](members, indices=owners)
+    return result
+
+def to_shapely(source) -> np.ndarray:
+    """
+    Shapely geometries from a GeometryColumns, or from anything
+    decode_columns() accepts: a buffer or stream of concatenated records or
+    an iterable of TWKB blobs
+    """
+    if not isinstance(source, GeometryColumns):
+        source = decode_columns(source)
+    return columns_to_shapely(source)
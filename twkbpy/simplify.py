@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+"""
+Level-of-detail decoding.
+
+A Simplify handed to a Decoder thins out linestrings and polygon rings
+while they are decoded:
+
+    decoder = Decoder(simplify=Simplify.for_zoom(6))
+
+The vertices of a run are accumulated from their deltas in the integer
+domain, as written in the record, and a vertex closer than the tolerance
+to the last one kept is dropped on the spot, so only the kept ones are
+stored.  Douglas-Peucker or Visvalingam-Whyatt can then be run on that
+shorter run.  Only what survives is scaled to coordinates (or converted
+to the integer coord_type, or put through the CoordTransform).
+
+The first and last vertex of every run are kept, so lines keep their ends
+and rings stay closed.  A ring left with fewer than 4 vertices is dropped
+when it is a hole, or read again without simplification when it is the
+outer ring, so every ring stays valid.  Points and multipoints are not
+simplified.
+"""
+import math
+from array import array
+from heapq import heapify, heappop, heappush
+from itertools import cycle
+from operator import truediv
+from time import perf_counter
+from typing import List, Optional, Sequence
+
+from .context import DecoderContext, MAX_VARINT_LEN
+from .kernels import ORDINATES, build_kernel
+from .transform import EARTH_RADIUS, transform_values
+
+DOUGLAS_PEUCKER = 'douglas_peucker'
+VISVALINGAM = 'visvalingam'
+METHODS = (None, DOUGLAS_PEUCKER, VISVALINGAM)
+
+METRES = 'm'
+DEGREES = 'deg'
+# width of the world at zoom 0, for Web Mercator metres or degrees
+WORLD_WIDTHS = { METRES: 2.0 * math.pi * EARTH_RADIUS, DEGREES: 360.0 }
+
+# kinds of run, for read_part()
+LINE = 0
+OUTER_RING = 1
+INNER_RING = 2
+
+
+class Simplify:
+    def __init__(self, tolerance : float, method : Optional[str] = None):
+        """
+        tolerance - distance under which vertices are merged, in the
+                    record's coordinate units (before any CoordTransform)
+        method    - None to only merge close vertices, or DOUGLAS_PEUCKER
+                    or VISVALINGAM to simplify the merged run further; for
+                    Visvalingam the tolerance is turned into an area
+                    threshold of tolerance^2 / 2
+        """
+        if tolerance < 0:
+            raise ValueError(f"Tolerance must not be negative, got {tolerance}")
+        if method not in METHODS:
+            raise ValueError(f"Unknown simplification method {method!r}")
+        self.tolerance = float(tolerance)
+        self.method = method
+
+    @classmethod
+    def for_zoom(cls, zoom : float, units : str = METRES, tile_size : int = 256, pixels : float = 1.0,
+                 method : Optional[str] = None) -> 'Simplify':
+        """
+        Simplify for rendering at a web map zoom level: the tolerance is
+        `pixels` pixels of a `tile_size` tile, for data in Web Mercator
+        metres or in degrees
+        """
+        if units not in WORLD_WIDTHS:
+            raise ValueError(f"Unknown units {units!r}")
+        return cls(pixels * WORLD_WIDTHS[units] / (tile_size * 2.0 ** zoom), method)
+
+    def simplify(self, kept : array, ndims : int, tolerance : float, closed : bool) -> array:
+        """
+        Runs the simplification method over a run of quantized vertices,
+        `tolerance` being in the same units
+
+        Returns:
+            array - the vertices left, first and last included
+        """
+        npoints = len(kept) // ndims
+        if self.method is None or npoints <= (4 if closed else 2):
+            return kept
+        xs, ys = kept[0::ndims], kept[1::ndims]
+        if self.method == DOUGLAS_PEUCKER:
+            indexes = douglas_peucker(xs, ys, tolerance * tolerance, closed)
+        else:
+            indexes = visvalingam(xs, ys, tolerance * tolerance, closed)
+        if len(indexes) == npoints:
+            return kept
+        out = array(kept.typecode)
+        for i in indexes:
+            out.extend(kept[i * ndims:(i + 1) * ndims])
+        return out
+
+
+def douglas_peucker(xs : Sequence[int], ys : Sequence[int], tolerance_sq : float, closed : bool) -> List[int]:
+    """
+    Indexes of the vertices kept by Douglas-Peucker.  A closed run is
+    first split at the vertex farthest from its start, so that the ring
+    does not collapse onto its closing segment.
+
+    Returns:
+        List[int] - ascending vertex indexes
+    """
+    last = len(xs) - 1
+    keep = [ False ] * (last + 1)
+    keep[0] = keep[last] = True
+    stack = [ (0, last) ]
+    if closed:
+        x0, y0 = xs[0], ys[0]
+        far = max(range(1, last), key=lambda i: (xs[i] - x0) ** 2 + (ys[i] - y0) ** 2)
+        keep[far] = True
+        stack = [ (0, far), (far, last) ]
+    while stack:
+        first, end = stack.pop()
+        ax, ay = xs[first], ys[first]
+        dx, dy = xs[end] - ax, ys[end] - ay
+        seg = dx * dx + dy * dy
+        best = -1.0
+        index = first
+        for i in range(first + 1, end):
+            px, py = xs[i] - ax, ys[i] - ay
+            t = px * dx + py * dy
+            if seg == 0 or t <= 0:
+                d = px * px + py * py
+            elif t >= seg:
+                d = (px - dx) ** 2 + (py - dy) ** 2
+            else:
+                c = px * dy - py * dx
+                d = c * c / seg
+            if d > best:
+                best, index = d, i
+        if best > tolerance_sq:
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, end))
+    return [ i for i in range(0, last + 1) if keep[i] ]
+
+def visvalingam(xs : Sequence[int], ys : Sequence[int], tolerance_sq : float, closed : bool) -> List[int]:
+    """
+    Indexes of the vertices kept by Visvalingam-Whyatt: the vertex forming
+    the smallest triangle with its neighbours is removed until every
+    triangle is at least tolerance^2 / 2 in area, or a line is down to 2
+    vertices and a ring to 4
+
+    Returns:
+        List[int] - ascending vertex indexes
+    """
+    n = len(xs)
+    last = n - 1
+    prev = list(range(-1, last))
+    nxt = list(range(1, n + 1))
+
+    def area2(i : int) -> float:
+        # twice the area of the triangle of vertex i and its neighbours
+        p, q = prev[i], nxt[i]
+        return abs((xs[p] - xs[i]) * (ys[q] - ys[i]) - (xs[q] - xs[i]) * (ys[p] - ys[i]))
+
+    areas = [ math.inf ] + [ area2(i) for i in range(1, last) ] + [ math.inf ]
+    heap = [ (areas[i], i) for i in range(1, last) ]
+    heapify(heap)
+    removed = [ False ] * n
+    count, least = n, 4 if closed else 2
+    while heap and count > least:
+        area, i = heappop(heap)
+        if removed[i] or area != areas[i]:
+            continue
+        if area >= tolerance_sq:
+            break
+        removed[i] = True
+        count -= 1
+        p, q = prev[i], nxt[i]
+        nxt[p], prev[q] = q, p
+        for j in (p, q):
+            if 0 < j < last:
+                # never below the area just removed, so that the order of
+                # removal stays monotonic
+                areas[j] = max(area2(j), area)
+                heappush(heap, (areas[j], j))
+    return [ i for i in range(0, n) if not removed[i] ]
+
+
+# radial pass kernels: decode `npoints` vertices from `buf` at `pos`,
+# appending to `kept` the first, the last and those at least the tolerance
+# from the previous kept one, update `refpoint` in place and return the new
+# cursor position
+RADIAL_TEMPLATE = """\
+def {name}(buf, pos, npoints, refpoint, tolerance_sq, kept):
+    {ords} = refpoint[0:{ndims}]
+    kx, ky = x, y
+    last = npoints - 1
+    for i in range(0, npoints):
+{deltas}
+{store}
+    refpoint[0:{ndims}] = [{ords}]
+    return pos
+"""
+
+_RADIAL_KERNELS = { ndims: build_kernel(RADIAL_TEMPLATE, f'_radial_{ndims}d', ndims, store=[
+    'dx = x - kx; dy = y - ky\n'
+    'if dx * dx + dy * dy >= tolerance_sq or i == 0 or i == last:\n'
+    '    ' + '; '.join([ f'kept.append({o})' for o in ORDINATES[:ndims] ]) + '\n'
+    '    kx, ky = x, y' ]) for ndims in (2, 3, 4) }
+
+def radial_pass(ta_struct : DecoderContext, npoints : int, tolerance : float) -> array:
+    """
+    Decodes `npoints` vertices keeping only those at least `tolerance`
+    (in quantized units) from the previous kept one, and the last
+
+    Returns:
+        array('q') - the kept quantized vertices
+    """
+    ndims = ta_struct.ndims
+    kept = array('q')
+    ta_struct.fill(npoints * ndims * MAX_VARINT_LEN)
+    try:
+        ta_struct.pos = _RADIAL_KERNELS[ndims](ta_struct.buf, ta_struct.pos, npoints, ta_struct.refpoint,
+                                               tolerance * tolerance, kept)
+    except IndexError:
+        raise EOFError("Unexpected end of TWKB data") from None
+    return kept
+
+def scale_kept(ta_struct : DecoderContext, kept : array):
+    """
+    Coordinates of kept quantized vertices, as read_pa would have returned
+    them
+    """
+    ndims = ta_struct.ndims
+    transform = ta_struct.transform
+    if transform is not None:
+        values = array('d', transform_values(transform.coefficients(ta_struct.factors, ta_struct.has_z),
+                                             kept, ndims))
+    elif ta_struct.coord_type == 'd':
+        values = array('d', map(truediv, kept, cycle(ta_struct.factors[:ndims])))
+    else:
+        values = kept if ta_struct.coord_type == 'q' else array(ta_struct.coord_type, kept)
+    if ta_struct.use_numpy:
+        import numpy as np
+        dtype = { 'd': np.float64, 'q': np.int64, 'i': np.int32 }[values.typecode]
+        return np.frombuffer(values, dtype=dtype).reshape(-1, ndims)
+    return values
+
+def simplify_run(ta_struct : DecoderContext, npoints : int, closed : bool) -> array:
+    """
+    Decodes a line or ring of `npoints` vertices with the context's
+    Simplify applied
+
+    Returns:
+        array('q') - the quantized vertices kept
+    """
+    simplify = ta_struct.simplify
+    stats = ta_struct.stats
+    if stats is not None:
+        started = perf_counter()
+    tolerance = simplify.tolerance * ta_struct.factors[0]
+    kept = simplify.simplify(radial_pass(ta_struct, npoints, tolerance), ta_struct.ndims, tolerance, closed)
+    if stats is not None:
+        stats.add_time('coordinates', perf_counter() - started)
+        stats.vertices += npoints
+    return kept
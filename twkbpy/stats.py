@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+Optional decoder instrumentation.
+
+A DecoderStats handed to a Decoder (or an OgrTransform) collects per-stage
+wall times and counters while records are decoded:
+
+    stats = DecoderStats()
+    for shape in Decoder(stats=stats).iter_decode(stream):
+        ...
+    stats.as_dict()
+
+Timed stages are 'header' (record headers), 'body' (geometry bodies),
+'coordinates' (the varint, delta and scaling kernel of read_pa, which run
+fused), and the transforms 'geojson', 'wkb' and 'ogr'.  Counters cover the
+records decoded and skipped, their bytes, the vertices read and the
+geometries per type, collection members included.
+
+Without a DecoderStats nothing is measured: the decode paths only test
+for one at the start of each record and of each coordinate run.  A
+DecoderStats is not thread-safe; give each thread its own.
+"""
+from collections import defaultdict
+from time import perf_counter
+from typing import Any, Callable, Dict, Optional
+
+
+class DecoderStats:
+    def __init__(self, hook : Optional[Callable[['DecoderStats', Any], None]] = None):
+        """
+        hook - called as hook(stats, shape) after every record; shape is
+               None for a record skipped by a bbox query, and the
+               GeometryColumns being filled by decode_columns()
+        """
+        self.hook = hook
+        self.reset()
+
+    def reset(self):
+        self.records = 0
+        self.skipped = 0
+        self.bytes = 0
+        self.vertices = 0
+        self.geometries : Dict[str, int] = defaultdict(int)
+        self.seconds : Dict[str, float] = defaultdict(float)
+        self.calls : Dict[str, int] = defaultdict(int)
+
+    def add_time(self, stage : str, seconds : float):
+        self.seconds[stage] += seconds
+        self.calls[stage] += 1
+
+    def add_record(self, nbytes : int, shape = None):
+        """
+        Counts one record of `nbytes` bytes, and runs the hook
+        """
+        self.bytes += nbytes
+        if shape is None:
+            self.skipped += 1
+        else:
+            self.records += 1
+        if self.hook is not None:
+            self.hook(self, shape)
+
+    def add_geometry(self, _type):
+        self.geometries[_type.name] += 1
+
+    def as_dict(self) -> Dict[str, Any]:
+        """
+        Snapshot of everything collected so far
+
+        Returns:
+            dict - records, skipped, bytes and vertices counts, geometries
+                   per type name, and seconds and calls per stage
+        """
+        return {
+            'records': self.records,
+            'skipped': self.skipped,
+            'bytes': self.bytes,
+            'vertices': self.vertices,
+            'geometries': dict(self.geometries),
+            'seconds': dict(self.seconds),
+            'calls': dict(self.calls),
+        }
+
+    def timed(self, stage : str, func : Callable, *args):
+        """
+        Calls func(*args), adding its run time to `stage`
+        """
+        start = perf_counter()
+        try:
+            return func(*args)
+        finally:
+            self.add_time(stage, perf_counter() - start)
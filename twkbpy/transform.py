@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+Coordinate transforms applied while vertices are decoded.
+
+A CoordTransform handed to a Decoder maps every vertex with an affine
+transform of x and y, a scale and offset of z and m, and optionally a
+Web Mercator <-> lon/lat projection of the result:
+
+    decoder = Decoder(transform=CoordTransform.tile(14, 8185, 5449, extent=4096, project=TO_LONLAT))
+
+read_pa folds the record's 10^precision factors into the affine
+coefficients (see coefficients()), so the integers accumulated from the
+deltas go to their output values with one multiply-add per ordinate, in
+the loop that decodes them; the coordinates are never walked a second
+time.  Every output (GeoJSON, WKB, OGR, the numpy arrays) then sees the
+transformed coordinates.
+
+Header bboxes of the decoded shapes are transformed too, but bbox query
+windows are tested before decoding and stay in the record's own units.
+"""
+import math
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+EARTH_RADIUS = 6378137.0
+# half the width of the Web Mercator world, in metres
+MERCATOR_EXTENT = math.pi * EARTH_RADIUS
+
+TO_LONLAT = 'to_lonlat'
+TO_MERCATOR = 'to_mercator'
+
+def to_lonlat(x : float, y : float) -> Tuple[float, float]:
+    """
+    Web Mercator metres to WGS84 degrees
+    """
+    return (math.degrees(x / EARTH_RADIUS),
+            math.degrees(2.0 * math.atan(math.exp(y / EARTH_RADIUS)) - math.pi / 2.0))
+
+def to_mercator(lon : float, lat : float) -> Tuple[float, float]:
+    """
+    WGS84 degrees to Web Mercator metres
+    """
+    return (EARTH_RADIUS * math.radians(lon),
+            EARTH_RADIUS * math.log(math.tan(math.pi / 4.0 + math.radians(lat) / 2.0)))
+
+def latitude(v : float) -> float:
+    """
+    Latitude in degrees of a Web Mercator y over EARTH_RADIUS
+    """
+    return math.degrees(2.0 * math.atan(math.exp(v))) - 90.0
+
+def mercator_y(v : float) -> float:
+    """
+    Web Mercator y of a latitude in half radians
+    """
+    return EARTH_RADIUS * math.log(math.tan(math.pi / 4.0 + v))
+
+# Both projections are separable: x' is linear in x and y' a function of y
+# alone.  The linear parts are folded into the affine coefficients, which
+# leaves the kernels one function call per vertex.  Values are (x scale,
+# y scale, y function).
+PROJECTIONS : Dict[str, Tuple[float, float, Callable[[float], float]]] = {
+    TO_LONLAT: (180.0 / MERCATOR_EXTENT, 1.0 / EARTH_RADIUS, latitude),
+    TO_MERCATOR: (MERCATOR_EXTENT / 180.0, math.pi / 360.0, mercator_y),
+}
+
+
+class CoordTransform:
+    def __init__(self, matrix : Sequence[float] = (1.0, 0.0, 0.0, 0.0, 1.0, 0.0),
+                 z : Sequence[float] = (1.0, 0.0), m : Sequence[float] = (1.0, 0.0),
+                 project : Optional[str] = None, precision : Optional[int] = None):
+        """
+        matrix    - (a, b, c, d, e, f) for x' = a*x + b*y + c and
+                    y' = d*x + e*y + f
+        z, m      - (scale, offset) of the z and m ordinates
+        project   - TO_LONLAT or TO_MERCATOR, applied after the affine step
+        precision - decimals of the transformed coordinates in GeoJSON
+                    output; by default they are written in full
+        """
+        if project is not None and project not in PROJECTIONS:
+            raise ValueError(f"Unknown projection {project!r}")
+        self.matrix = tuple([ float(v) for v in matrix ])
+        self.z = tuple([ float(v) for v in z ])
+        self.m = tuple([ float(v) for v in m ])
+        self.project = project
+        self.precision = precision
+        self._coefficients : Dict[tuple, tuple] = {}
+
+    @classmethod
+    def scale_offset(cls, sx : float = 1.0, sy : float = 1.0, ox : float = 0.0, oy : float = 0.0,
+                     **kwargs) -> 'CoordTransform':
+        """
+        x' = sx*x + ox, y' = sy*y + oy
+        """
+        return cls((sx, 0.0, ox, 0.0, sy, oy), **kwargs)
+
+    @classmethod
+    def swap_axes(cls, **kwargs) -> 'CoordTransform':
+        """
+        x' = y, y' = x, e.g. for lat/lon ordered data
+        """
+        return cls((0.0, 1.0, 0.0, 1.0, 0.0, 0.0), **kwargs)
+
+    @classmethod
+    def tile(cls, zoom : int, x : int, y : int, extent : int = 4096, **kwargs) -> 'CoordTransform':
+        """
+        Tile-local coordinates (0 to `extent`, y pointing down) of the XYZ
+        tile zoom/x/y to Web Mercator metres; add project=TO_LONLAT for
+        degrees
+        """
+        size = 2.0 * MERCATOR_EXTENT / (1 << zoom)
+        return cls((size / extent, 0.0, x * size - MERCATOR_EXTENT,
+                    0.0, -size / extent, MERCATOR_EXTENT - y * size), **kwargs)
+
+    def coefficients(self, factors : Sequence[float], has_z : bool) -> tuple:
+        """
+        Coefficients of the read_pa transform kernels for a record with
+        the given scale factors: the affine matrix and the (scale, offset)
+        of ordinates 2 and 3, all divided by the factors, and the y
+        function of the projection (see PROJECTIONS)
+
+        Returns:
+            tuple - (a, b, c, d, e, f, s2, o2, s3, o3, project)
+        """
+        key = (tuple(factors), has_z)
+        coeffs = self._coefficients.get(key)
+        if coeffs is None:
+            a, b, c, d, e, f = self.matrix
+            fx, fy = factors[0], factors[1]
+            third = self.z if has_z else self.m
+            # factors of missing ordinates are 0
+            f2 = factors[2] if len(factors) > 2 and factors[2] else 1.0
+            f3 = factors[3] if len(factors) > 3 and factors[3] else 1.0
+            project = None
+            if self.project is not None:
+                xs, ys, project = PROJECTIONS[self.project]
+                a, b, c, d, e, f = a * xs, b * xs, c * xs, d * ys, e * ys, f * ys
+            coeffs = (a / fx, b / fy, c, d / fx, e / fy, f,
+                      third[0] / f2, third[1], self.m[0] / f3, self.m[1], project)
+            self._coefficients[key] = coeffs
+        return coeffs
+
+    def apply(self, coords : Sequence[float], ndims : int, has_z : bool = False) -> List[float]:
+        """
+        Transformed copy of flat coordinates in coordinate units
+        """
+        return transform_values(self.coefficients((1.0,) * ndims, has_z), coords, ndims)
+
+    def transform_bbox(self, bbox : Sequence[float], ndims : int, has_z : bool = False) -> List[float]:
+        """
+        Bbox, laid out as [ min_0 .. min_n, max_0 .. max_n ], of the
+        transformed `bbox`.  The projections keep each axis monotonic, so
+        transforming the xy corners is enough.
+        """
+        a, b, c, d, e, f, s2, o2, s3, o3, project = self.coefficients((1.0,) * ndims, has_z)
+        xs, ys = [], []
+        for x in (bbox[0], bbox[ndims]):
+            for y in (bbox[1], bbox[ndims + 1]):
+                xs.append(a * x + b * y + c)
+                ys.append(d * x + e * y + f if project is None else project(d * x + e * y + f))
+        low, high = [ min(xs), min(ys) ], [ max(xs), max(ys) ]
+        for i, (scale, offset) in zip(range(2, ndims), ((s2, o2), (s3, o3))):
+            values = (scale * bbox[i] + offset, scale * bbox[ndims + i] + offset)
+            low.append(min(values))
+            high.append(max(values))
+        return low + high
+
+    def output_precision(self, ndims : int) -> Optional[List[int]]:
+        """
+        `precision` of the decoded shapes: None unless one was given
+        """
+        if self.precision is None:
+            return None
+        return [ self.precision ] * ndims
+
+
+def transform_values(coeffs : tuple, values : Sequence[float], ndims : int) -> List[float]:
+    """
+    Applies CoordTransform.coefficients() to flat values, e.g. the
+    quantized vertices kept by a Simplify
+    """
+    a, b, c, d, e, f, s2, o2, s3, o3, project = coeffs
+    out = list(values)
+    for i in range(0, len(out), ndims):
+        x, y = out[i], out[i + 1]
+        out[i] = a * x + b * y + c
+        out[i + 1] = d * x + e * y + f if project is None else project(d * x + e * y + f)
+        if ndims > 2:
+            out[i + 2] = s2 * out[i + 2] + o2
+        if ndims > 3:
+            out[i + 3] = s3 * out[i + 3] + o3
+    return out
@@ -1,11 +1,10 @@
-from .decode import Decoder
+from .decode import thread_decoder
 from .ogr_transform import OgrTransform
 from base64 import b64decode
-from io import BytesIO
 
 class Twkb:
     def __init__(self, stream):
-        self.decoder = Decoder()
+        self.decoder = thread_decoder()
         self.shape = self.decoder.decode(stream)
 
     @classmethod
@@ -14,8 +13,7 @@ class Twkb:
 
     @classmethod
     def from_binary(cls, buf):
-        stream = BytesIO(buf)
-        return cls(stream)
+        return cls(buf)
 
     @classmethod
     def from_b64(cls, b64):
@@ -24,6 +22,12 @@ class Twkb:
     def to_geojson(self):
         return self.decoder.to_geojson(self.shape)
 
+    def to_wkb(self):
+        return self.decoder.to_wkb(self.shape)
+
+    def to_ewkb(self, srid=None):
+        return self.decoder.to_ewkb(self.shape, srid)
+
     def to_ogr(self):
         xform = OgrTransform()
         return xform.convert(self.shape)
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+import mmap
+from array import array
+from typing import Iterator, List, Optional, Union
+from weakref import WeakSet
+
+from .context import BufferDecoderContext
+from .decode import Decoder
+from .index import TwkbIndex
+from .read_buffer import GeometryShape, read_header, skip_body
+
+class TwkbFile:
+    """
+    Random access reader over a memory mapped file of concatenated TWKB
+    records.
+
+    Records are addressed by number: len(reader), reader[i] and
+    reader[start:stop:step].  The record offset table is built lazily, only
+    as far as the highest record requested so far, unless a TwkbIndex for
+    the file is supplied.  Geometries are decoded straight from the mapped
+    pages.
+    """
+    def __init__(self, path : str, decoder : Optional[Decoder] = None, index : Optional[TwkbIndex] = None):
+        self.path = path
+        self.decoder = decoder if decoder is not None else Decoder()
+        with open(path, 'rb') as f:
+            try:
+                self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # empty files can't be mapped
+                self.data = b''
+        self.offsets = array('Q')
+        self._contexts : WeakSet = WeakSet()
+        self._scan_pos = 0
+        self._complete = False
+        if index is not None:
+            self.offsets.extend(index.offsets)
+            self._complete = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        for ta_struct in list(self._contexts):
+            ta_struct.release()
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+
+    def _scan_to(self, i : Optional[int]):
+        """
+        Extends the offset table to cover record `i`, or all records when
+        `i` is None
+        """
+        if self._complete or (i is not None and i < len(self.offsets)):
+            return
+        ta_struct = BufferDecoderContext(self.data, self._scan_pos)
+        try:
+            while i is None or len(self.offsets) <= i:
+                if ta_struct.at_eof():
+                    self._complete = True
+                    break
+                self.offsets.append(ta_struct.tell())
+                read_header(ta_struct)
+                skip_body(ta_struct)
+            self._scan_pos = ta_struct.tell()
+        finally:
+            ta_struct.release()
+
+    def __len__(self) -> int:
+        self._scan_to(None)
+        return len(self.offsets)
+
+    def read(self, i : int) -> GeometryShape:
+        """
+        Decodes record number `i`
+        """
+        offset = self.offsets[i]
+        ta_struct = self.decoder.create_context(BufferDecoderContext(self.data, offset))
+        try:
+            shape = self.decoder.read_record(ta_struct)
+        finally:
+            ta_struct.release()
+        shape.offset = offset
+        return shape
+
+    def __getitem__(self, key : Union[int, slice]) -> Union[GeometryShape, List[GeometryShape]]:
+        if isinstance(key, slice):
+            return [ self.read(i) for i in range(*key.indices(len(self))) ]
+        if key < 0:
+            key += len(self)
+        self._scan_to(key)
+        if not 0 <= key < len(self.offsets):
+            raise IndexError("record number out of range")
+        return self.read(key)
+
+    def __iter__(self) -> Iterator[GeometryShape]:
+        ta_struct = self.decoder.create_context(BufferDecoderContext(self.data))
+        # close() releases the contexts of unfinished iterators
+        self._contexts.add(ta_struct)
+        try:
+            while not ta_struct.at_eof():
+                offset = ta_struct.tell()
+                shape = self.decoder.read_record(ta_struct)
+                shape.offset = offset
+                yield shape
+        finally:
+            ta_struct.release()
+            self._contexts.discard(ta_struct)
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+ISO WKB and PostGIS EWKB output of decoded shapes.
+
+The coordinate runs of a shape are copied into the output as whole
+little-endian double blocks straight from its flat buffer; only the byte
+order marks, type codes and counts are packed one by one.
+"""
+import struct
+import sys
+from array import array
+from typing import Callable, Optional
+
+from .constants import GeometryType
+from .read_buffer import GeometryShape
+
+# byte order mark and type code opening every (sub-)geometry
+WKB_HEADER = struct.Struct('<BI')
+WKB_COUNT = struct.Struct('<I')
+
+WKB_LITTLE_ENDIAN = 1
+
+# EWKB type code flags
+EWKB_Z = 0x80000000
+EWKB_M = 0x40000000
+EWKB_SRID = 0x20000000
+
+BIG_ENDIAN = sys.byteorder == 'big'
+
+def iso_type_code(_type : GeometryType, ndims : int, has_m : bool) -> int:
+    """
+    ISO WKB type code: the geometry type plus 1000 for Z, 2000 for M and
+    3000 for ZM
+    """
+    if ndims == 2:
+        return _type.value
+    if ndims == 4:
+        return _type.value + 3000
+    return _type.value + (2000 if has_m else 1000)
+
+def ewkb_type_code(_type : GeometryType, ndims : int, has_m : bool) -> int:
+    """
+    EWKB type code: the geometry type with the Z and M flag bits
+    """
+    code = _type.value
+    if ndims == 4 or (ndims == 3 and not has_m):
+        code |= EWKB_Z
+    if ndims == 4 or (ndims == 3 and has_m):
+        code |= EWKB_M
+    return code
+
+def write_coords(out : bytearray, coords, start : int, end : int, ndims : int):
+    """
+    Appends vertices [start, end) of a flat or (n, ndims) coordinate buffer
+    as little-endian doubles
+    """
+    if getattr(coords, 'ndim', 1) == 2:
+        out += coords[start:end].astype('<f8', copy=False).tobytes()
+    elif BIG_ENDIAN:
+        values = array('d', coords[start * ndims:end * ndims])
+        values.byteswap()
+        out += values
+    else:
+        with memoryview(coords) as view:
+            out += view[start * ndims:end * ndims]
+
+def write_wkb(out : bytearray, shape : GeometryShape,
+              type_code : Callable[[GeometryType, int, bool], int] = iso_type_code):
+    """
+    Appends the WKB of a shape or view shape to `out`, ISO flavoured or
+    EWKB depending on `type_code`
+    """
+    _type = shape.type
+    ndims = shape.ndims
+    has_m = shape.has_m
+    out += WKB_HEADER.pack(WKB_LITTLE_ENDIAN, type_code(_type, ndims, has_m))
+    write_wkb_body(out, shape, type_code)
+
+def write_wkb_body(out : bytearray, shape : GeometryShape,
+                   type_code : Callable[[GeometryType, int, bool], int] = iso_type_code):
+    """
+    Appends everything of a shape's WKB that follows its type code
+    """
+    _type = shape.type
+    ndims = shape.ndims
+    has_m = shape.has_m
+    if _type == GeometryType.COLLECTION:
+        geoms = shape.geoms
+        out += WKB_COUNT.pack(len(geoms))
+        for geom in geoms:
+            write_wkb(out, geom, type_code)
+        return
+
+    coords = getattr(shape, 'coords', None)
+    if coords is None:
+        # empty geometry; an empty point is written as NaN coordinates
+        if _type == GeometryType.POINT:
+            out += struct.pack('<%dd' % ndims, *[ float('nan') ] * ndims)
+        else:
+            out += WKB_COUNT.pack(0)
+        return
+
+    start = shape.start
+    end = shape.end
+    if end is None:
+        end = len(coords) if getattr(coords, 'ndim', 1) == 2 else len(coords) // ndims
+    if _type == GeometryType.POINT:
+        write_coords(out, coords, start, start + 1, ndims)
+    elif _type == GeometryType.LINESTRING:
+        out += WKB_COUNT.pack(end - start)
+        write_coords(out, coords, start, end, ndims)
+    elif _type == GeometryType.POLYGON:
+        rings = shape.ring_offsets
+        if shape.end is None:
+            end = len(rings) - 1
+        write_rings(out, coords, rings, start, end, ndims)
+    elif _type == GeometryType.MULTIPOINT:
+        out += WKB_COUNT.pack(end)
+        header = WKB_HEADER.pack(WKB_LITTLE_ENDIAN, type_code(GeometryType.POINT, ndims, has_m))
+        for i in range(0, end):
+            out += header
+            write_coords(out, coords, i, i + 1, ndims)
+    elif _type == GeometryType.MULTILINESTRING:
+        parts = shape.part_offsets
+        out += WKB_COUNT.pack(len(parts) - 1)
+        header = WKB_HEADER.pack(WKB_LITTLE_ENDIAN, type_code(GeometryType.LINESTRING, ndims, has_m))
+        for i in range(0, len(parts) - 1):
+            out += header
+            out += WKB_COUNT.pack(parts[i + 1] - parts[i])
+            write_coords(out, coords, parts[i], parts[i + 1], ndims)
+    elif _type == GeometryType.MULTIPOLYGON:
+        parts = shape.part_offsets
+        rings = shape.ring_offsets
+        out += WKB_COUNT.pack(len(parts) - 1)
+        header = WKB_HEADER.pack(WKB_LITTLE_ENDIAN, type_code(GeometryType.POLYGON, ndims, has_m))
+        for i in range(0, len(parts) - 1):
+            out += header
+            write_rings(out, coords, rings, parts[i], parts[i + 1], ndims)
+    else:
+        raise NotImplementedError(f"{_type} not implemented")
+
+def write_rings(out : bytearray, coords, ring_offsets, first : int, last : int, ndims : int):
+    """
+    Appends the ring count and rings [first, last) of a polygon
+    """
+    out += WKB_COUNT.pack(last - first)
+    for r in range(first, last):
+        out += WKB_COUNT.pack(ring_offsets[r + 1] - ring_offsets[r])
+        write_coords(out, coords, ring_offsets[r], ring_offsets[r + 1], ndims)
+
+def to_wkb(shape : GeometryShape) -> bytes:
+    """
+    ISO WKB of a decoded shape
+
+    Returns:
+        bytes - little-endian WKB, with 1000/2000/3000 type codes for Z, M
+                and ZM
+    """
+    out = bytearray()
+    write_wkb(out, shape.dequantize())
+    return bytes(out)
+
+def to_ewkb(shape : GeometryShape, srid : Optional[int] = None) -> bytes:
+    """
+    PostGIS EWKB of a decoded shape, with the SRID embedded when given
+
+    Returns:
+        bytes - little-endian EWKB
+    """
+    shape = shape.dequantize()
+    out = bytearray()
+    code = ewkb_type_code(shape.type, shape.ndims, shape.has_m)
+    if srid is None:
+        out += WKB_HEADER.pack(WKB_LITTLE_ENDIAN, code)
+    else:
+        out += WKB_HEADER.pack(WKB_LITTLE_ENDIAN, code | EWKB_SRID)
+        out += WKB_COUNT.pack(srid)
+    write_wkb_body(out, shape, ewkb_type_code)
+    return bytes(out)